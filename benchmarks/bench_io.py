@@ -0,0 +1,112 @@
+"""
+Compare HDF5 I/O profiles when validating multi-read files.
+
+Each profile validates the same generated file read directly from local disk,
+and through a file object which adds a fixed delay to every read call to
+simulate a high-latency network filesystem.
+
+    python benchmarks/bench_io.py [--reads 200] [--latency-ms 1]
+"""
+from __future__ import print_function, division
+
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from h5_validator.h5file import IO_PROFILES, open_file
+from h5_validator.schema import Schema
+from h5_validator.validator import Validator
+from h5_validator.cli import _find_schema
+from h5_validator.test.multi_read import write_multi_read_file
+
+
+class LatencyFile(io.FileIO):
+    """A file whose reads each wait [latency] seconds before returning."""
+
+    def __init__(self, path, latency):
+        super(LatencyFile, self).__init__(path, "r")
+        self.latency = latency
+        self.reads = 0
+
+    def _wait(self):
+        self.reads += 1
+        time.sleep(self.latency)
+
+    def read(self, size=-1):
+        self._wait()
+        return super(LatencyFile, self).read(size)
+
+    def readinto(self, buffer):
+        self._wait()
+        return super(LatencyFile, self).readinto(buffer)
+
+
+def _time_validation(schema, open_source, profile, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        with open_file(open_source(), profile) as f:
+            v = Validator()
+            v.validate_file(schema, f)
+        elapsed = time.time() - start
+        assert v.is_valid, [str(e) for e in v.errors]
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# File space layouts to benchmark; page buffering only applies to paged files
+LAYOUTS = [
+    ("default", None),
+    ("paged", {'fs_strategy': 'page', 'fs_page_size': 64 * 1024,
+               'libver': 'latest'}),
+]
+
+
+def _compare_profiles(schema, path, args):
+    print("{:<10} {:>12} {:>20} {:>12}".format(
+        "profile", "local (s)",
+        "{}ms latency (s)".format(args.latency_ms), "read calls"))
+    for profile in IO_PROFILES:
+        local = _time_validation(schema, lambda: path, profile, args.repeat)
+
+        sources = []
+
+        def latent():
+            sources.append(LatencyFile(path, args.latency_ms / 1000))
+            return sources[-1]
+        remote = _time_validation(schema, latent, profile, args.repeat)
+        for source in sources:
+            source.close()
+
+        print("{:<10} {:>12.3f} {:>20.3f} {:>12}".format(
+            profile, local, remote, sources[-1].reads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument('--reads', type=int, default=200)
+    parser.add_argument('--signal-length', type=int, default=4000)
+    parser.add_argument('--latency-ms', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    schema = Schema(_find_schema("multi_read_fast5.yaml"))
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for layout, file_options in LAYOUTS:
+            path = os.path.join(tmp_dir, layout + ".fast5")
+            write_multi_read_file(path, reads=args.reads,
+                                  signal_length=args.signal_length,
+                                  file_options=file_options)
+            print("\n{} layout: {} reads, {:.1f} MB".format(
+                layout, args.reads, os.path.getsize(path) / 1e6))
+            _compare_profiles(schema, path, args)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Static analysis of schemas, run when they are loaded."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+from h5_validator.matcher import build_key_matchers, overlapping_matchers
+
+
+class SchemaWarning():
+    """A possible problem found in a schema without validating a file."""
+
+    def __init__(self, path, message, matchers=()):
+        """
+        Create a new warning.
+
+        :param path: Location of the problem in the schema, ie: 'file/Raw'
+        :param message: Description of the problem
+        :param matchers: The KeyMatchers involved
+        """
+        self.path = path
+        self.message = message
+        self.matchers = list(matchers)
+
+    def __str__(self):
+        """Format this warning for display."""
+        return "Warning at {}: \n    {}\n".format(self.path, self.message)
+
+
+def _levels(level, path):
+    # Yield each group level of a schema, with its path and matchers
+    matchers = build_key_matchers(level)
+    yield path, matchers
+    for m in matchers:
+        if m.data["type"] == "group":
+            for sub_level in _levels(m.data, path + "/" + m.data["name"]):
+                yield sub_level
+
+
+def analyse_schema(data):
+    """
+    Find matchers in a schema which could accept the same object.
+
+    validate_group keeps only the last matcher accepting each child, so a
+    child accepted by two matchers is validated against only one of them,
+    while both count it. Matchers of different types, different exact
+    names, and regexes with different literal prefixes are proven mutually
+    exclusive; every other pair is reported.
+
+    :param data: The loaded schema data
+    :return: List of SchemaWarnings
+    """
+    warnings = []
+    for path, matchers in _levels(data["file"], "file"):
+        for i, j in overlapping_matchers(matchers):
+            warnings.append(SchemaWarning(
+                path,
+                "Matchers '{}' and '{}' can both match the same {}, which "
+                "is then only validated against '{}'"
+                "".format(matchers[i].data["name"], matchers[j].data["name"],
+                          matchers[i].data["type"], matchers[j].data["name"]),
+                [matchers[i], matchers[j]]))
+    return warnings
@@ -0,0 +1,172 @@
+"""Validate files inside tar and zip archives without extracting them."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+import io
+import os
+import struct
+import tarfile
+import zipfile
+
+from h5_validator.fileobj import FileSection
+
+# Separates the archive path from the member name, ie: run.tar::read.fast5
+MEMBER_SEPARATOR = "::"
+
+ARCHIVE_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2',
+                      '.tar.xz', '.txz', '.zip')
+
+# Archives kept open in each process, so members are found without
+# re-reading the archive index (or, for compressed tars, the whole stream)
+_OPEN_ARCHIVES = 4
+_archives = collections.OrderedDict()
+
+# An open archive, the modification time and size it was opened at, and
+# for tars the members read so far by name
+_OpenArchive = collections.namedtuple('_OpenArchive',
+                                      ['handle', 'stamp', 'members'])
+
+# Size of the fixed part of a zip local file header
+_ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+
+def is_archive(path):
+    """
+    Find if [path] names a tar or zip archive.
+
+    :param path: The path to test
+    :return: If the extension of [path] is one of ARCHIVE_EXTENSIONS
+    """
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def member_name(archive, member):
+    """
+    Name a member of an archive as a single path.
+
+    :param archive: Path of the archive
+    :param member: Name of the member within the archive
+    :return: A string of the form 'archive::member'
+    """
+    return archive + MEMBER_SEPARATOR + member
+
+
+def split_member(name):
+    """
+    Split a name created by member_name.
+
+    :param name: A path, possibly naming an archive member
+    :return: Tuple of (archive, member), or None if [name] is not a member
+    """
+    archive, sep, member = name.partition(MEMBER_SEPARATOR)
+    if not sep or not is_archive(archive):
+        return None
+    return archive, member
+
+
+def list_members(archive, extension=".fast5"):
+    """
+    List the members of an archive ending with [extension].
+
+    :param archive: Path of the archive
+    :param extension: Extension of members to list
+    :return: List of names created by member_name, in archive order
+    """
+    if archive.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive) as zf:
+            names = [info.filename for info in zf.infolist()
+                     if not info.is_dir()]
+    else:
+        with tarfile.open(archive, "r:*") as tf:
+            names = [info.name for info in tf if info.isfile()]
+    return [member_name(archive, name) for name in names
+            if name.endswith(extension)]
+
+
+def close_archives():
+    """
+    Close the archives open_member keeps open.
+
+    Archives stay open between members, so members read in archive order
+    are found without reading the archive again from the start.
+    """
+    while _archives:
+        _archives.popitem()[1].handle.close()
+
+
+def _open_archive(archive):
+    st = os.stat(archive)
+    stamp = (st.st_mtime, st.st_size)
+    opened = _archives.pop(archive, None)
+    if opened is not None and opened.stamp != stamp:
+        # Rewritten since it was opened, so its index is stale
+        opened.handle.close()
+        opened = None
+    if opened is None:
+        if archive.lower().endswith(".zip"):
+            opened = _OpenArchive(zipfile.ZipFile(archive), stamp, None)
+        else:
+            opened = _OpenArchive(tarfile.open(archive, "r:*"), stamp, {})
+    _archives[archive] = opened
+    while len(_archives) > _OPEN_ARCHIVES:
+        _archives.popitem(last=False)[1].handle.close()
+    return opened
+
+
+def _zip_data_offset(zf, info):
+    zf.fp.seek(info.header_offset)
+    header = _ZIP_LOCAL_HEADER.unpack(zf.fp.read(_ZIP_LOCAL_HEADER.size))
+    name_length, extra_length = header[-2:]
+    return info.header_offset + _ZIP_LOCAL_HEADER.size + \
+        name_length + extra_length
+
+
+def _tar_member(opened, member):
+    # Scan forward from the last member read rather than loading the whole
+    # index, so members requested in archive order are found without
+    # decompressing compressed tars from the start each time. Members
+    # already read are found by name
+    info = opened.members.get(member)
+    while info is None:
+        info = opened.handle.next()
+        if info is None:
+            raise KeyError("Member '{}' not found in archive".format(member))
+        opened.members[info.name] = info
+        if info.name != member:
+            info = None
+    return info
+
+
+def open_member(name):
+    """
+    Open an archive member for reading.
+
+    Members stored without compression (in plain tars, or stored in zips)
+    are read in place through a FileSection of the archive. Compressed
+    members are decompressed into memory.
+
+    :param name: A name created by member_name
+    :return: A seekable binary file-like object
+    """
+    archive, member = split_member(name)
+    opened = _open_archive(archive)
+    handle = opened.handle
+
+    if isinstance(handle, zipfile.ZipFile):
+        info = handle.getinfo(member)
+        if info.compress_type == zipfile.ZIP_STORED:
+            return FileSection(open(archive, "rb"),
+                               _zip_data_offset(handle, info),
+                               info.file_size, name)
+        return io.BytesIO(handle.read(info))
+
+    info = _tar_member(opened, member)
+    if not isinstance(handle.fileobj, io.BufferedReader):
+        # gzip, bz2 and lzma tars can only be read by decompressing
+        return io.BytesIO(handle.extractfile(info).read())
+    return FileSection(open(archive, "rb"), info.offset_data, info.size,
+                       name)
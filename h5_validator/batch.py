@@ -0,0 +1,831 @@
+"""Validate many files on a worker pool and report results as JSON lines."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+from multiprocessing import connection
+
+from h5_validator.archive import close_archives, is_archive, \
+    list_members
+from h5_validator.fileobj import BlockCache
+from h5_validator.h5file import open_file, open_source
+from h5_validator.metrics import count_reads, open_objects
+from h5_validator.prefetch import Prefetcher, warm_file
+from h5_validator.precheck import FileCheckError, check_superblock
+from h5_validator.schedule import DEFAULT_SPLIT_SIZE, PartCollector, plan
+from h5_validator.validator import Validator
+
+logger = logging.getLogger("h5_validate.batch")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def discover_files(paths, extension=".fast5"):
+    """
+    Find the files to validate under [paths].
+
+    Directories are searched recursively for files ending in [extension], in
+    sorted order. Paths to files are used as given, whatever their extension.
+    Tar and zip archives, given or found in directories, are replaced by
+    names for each of their members ending in [extension].
+
+    :param paths: Files and directories to search
+    :param extension: Extension of files to find in directories
+    :return: Generator of file paths and archive member names
+    """
+    for path in paths:
+        if is_archive(path) and os.path.isfile(path):
+            for member in list_members(path, extension):
+                yield member
+            continue
+
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(extension):
+                    yield os.path.join(root, name)
+                elif is_archive(name):
+                    for member in list_members(os.path.join(root, name),
+                                               extension):
+                        yield member
+
+
+def read_file_list(stream, chunk_size=64 * 1024):
+    """
+    Read filenames from a binary stream, such as the output of find.
+
+    Names may be separated by newlines or, as written by find -print0, by
+    NUL characters. The separator is chosen from the first data read which
+    contains either, preferring NUL, and is used throughout.
+    The stream is read incrementally, so names are yielded while the
+    producer is still writing them.
+
+    :param stream: A binary file-like object
+    :param chunk_size: Maximum number of bytes to read at once
+    :return: Generator of filenames
+    """
+    read = stream.read1 if hasattr(stream, "read1") else stream.read
+    separator = None
+    pending = b""
+    while True:
+        data = read(chunk_size)
+        pending += data
+        if separator is None:
+            if b"\0" in pending:
+                separator = b"\0"
+            elif b"\n" in pending:
+                separator = b"\n"
+        if separator is not None:
+            names = pending.split(separator)
+            pending = names.pop()
+            for name in names:
+                if name:
+                    yield os.fsdecode(name)
+        if not data:
+            break
+    if pending.strip(b"\n"):
+        yield os.fsdecode(pending.rstrip(b"\n"))
+
+
+def parse_shard(value):
+    """
+    Parse a shard specification of the form 'K/N'.
+
+    :param value: The specification, where 1 <= K <= N
+    :return: Tuple of (K, N)
+    """
+    try:
+        index, count = (int(v) for v in value.split("/"))
+    except ValueError:
+        raise ValueError("Expected shard as K/N, got '{}'".format(value))
+    if not 1 <= index <= count:
+        raise ValueError("Shard {} is not between 1 and {}"
+                         "".format(index, count))
+    return index, count
+
+
+def in_shard(filename, index, count):
+    """
+    Find if [filename] belongs to shard [index] of [count].
+
+    Files are assigned by a hash of their path, so every node which is given
+    the same paths agrees on the partition without coordination.
+
+    :param filename: The path of the file, as discovered
+    :param index: The shard to test for, from 1 to [count]
+    :param count: The total number of shards
+    :return: If the file is part of the shard
+    """
+    digest = hashlib.md5(os.path.normpath(filename).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count == index - 1
+
+
+def read_results(paths):
+    """
+    Read results from JSON line files.
+
+    Where a file appears more than once, the last result for it is used.
+    Lines which cannot be parsed, such as a final line left incomplete by a
+    crash, are skipped.
+
+    :param paths: The result files to read
+    :return: List of result dictionaries
+    """
+    results = collections.OrderedDict()
+    for path in paths:
+        with open(path, "r") as fh:
+            for number, line in enumerate(fh, 1):
+                if not line.strip():
+                    continue
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping unreadable result at %s:%d",
+                                   path, number)
+                    continue
+                results[result['filename']] = result
+    return list(results.values())
+
+
+class Summary():
+    """Running totals and an error histogram over validation results."""
+
+    def __init__(self):
+        """Create an empty summary."""
+        self.files = 0
+        self.errors = 0
+        self.statuses = collections.Counter()
+        self.error_kinds = collections.Counter()
+        self.storage = None
+        self.structures = collections.Counter()
+
+    def add(self, result):
+        """
+        Include a result in the summary.
+
+        :param result: A result dictionary, as returned by check_file
+        """
+        self.files += 1
+        self.errors += result['error_count']
+        self.statuses[result['status']] += 1
+        for e in result['errors']:
+            # Aggregated errors stand for 'count' errors each
+            self.error_kinds[e.get('kind', 'error')] += e.get('count', 1)
+        if 'storage' in result:
+            if self.storage is None:
+                self.storage = collections.Counter()
+            for key in ('datasets', 'logical_bytes', 'stored_bytes'):
+                self.storage[key] += result['storage'][key]
+        if 'structure' in result:
+            self.structures[result['structure']] += 1
+
+    def to_dict(self):
+        """
+        Convert this summary to plain data.
+
+        :return: Summary dictionary with 'files', 'errors', 'statuses'
+                 and 'error_kinds' keys, 'storage' totals when results
+                 include them, and 'structures' counting the files of each
+                 structure hash when results have one
+        """
+        summary = {
+            'files': self.files,
+            'errors': self.errors,
+            'statuses': dict(self.statuses),
+            'error_kinds': dict(self.error_kinds),
+        }
+        if self.storage is not None:
+            summary['storage'] = dict(self.storage)
+        if self.structures:
+            summary['structures'] = dict(self.structures)
+        return summary
+
+
+def summarise(results):
+    """
+    Combine results into totals and an error histogram.
+
+    :param results: Iterable of result dictionaries
+    :return: Summary dictionary, as returned by Summary.to_dict
+    """
+    summary = Summary()
+    for result in results:
+        summary.add(result)
+    return summary.to_dict()
+
+
+def format_summary(summary):
+    """
+    Format a summary for reading.
+
+    :param summary: A summary dictionary, as returned by summarise
+    :return: A multi-line string
+    """
+    lines = ["Validated {} files, {} errors"
+             "".format(summary['files'], summary['errors'])]
+    for status, count in sorted(summary['statuses'].items()):
+        lines.append("    {}: {}".format(status, count))
+    if summary['error_kinds']:
+        lines.append("Errors by kind:")
+        for kind, count in sorted(summary['error_kinds'].items(),
+                                  key=lambda item: (-item[1], item[0])):
+            lines.append("    {}: {}".format(kind, count))
+    if 'scheduler' in summary:
+        lines.append("Workers busy {utilisation:.1%} of {wall_time}s on "
+                     "{workers} workers, {tasks} tasks"
+                     "".format(**summary['scheduler']))
+    if 'storage' in summary:
+        lines.append("Stored {stored_bytes} bytes for {logical_bytes} bytes "
+                     "of data in {datasets} datasets"
+                     "".format(**summary['storage']))
+    if 'structures' in summary:
+        lines.append("{} structure classes:".format(
+            len(summary['structures'])))
+        for structure, count in sorted(summary['structures'].items(),
+                                       key=lambda item: (-item[1], item[0])):
+            lines.append("    {}: {} files".format(structure, count))
+    return "\n".join(lines) + "\n"
+
+
+def check_file(filename, schema, io_profile='default', cache_options=None,
+               aggregate=False, columnar=False, integrity=False,
+               integrity_threads=None, storage_summary=False, inventory=None,
+               part=None, metrics=False, structure_classes=None):
+    """
+    Validate a single file and summarise the outcome as plain data.
+
+    :param filename: Path, http(s) URL or archive member name of the HDF5
+                     file to validate
+    :param schema: The loaded Schema to validate against
+    :param io_profile: How to open the file, one of h5file.IO_PROFILES
+    :param cache_options: Options for the BlockCache used for URLs
+    :param aggregate: Report each distinct problem once, as an ErrorGroup
+                      with a count and example paths
+    :param columnar: Check scalar attributes a column at a time
+    :param integrity: Check every stored chunk of matched datasets decodes
+    :param integrity_threads: Threads decoding chunks for integrity checks
+    :param storage_summary: Include a 'storage' key totalling the logical
+                            and stored bytes of validated datasets
+    :param inventory: Names of attributes to collect into an 'inventory'
+                      key, or None for no inventory
+    :param part: Tuple of (index, count) to validate only one part of the
+                 file, see Validator.validate_part
+    :param metrics: Include a 'metrics' key measuring the validation
+    :param structure_classes: StructureClasses to validate files of a
+                              structure seen before by value only, adding
+                              a 'structure' key, or None. Not used for
+                              parts or with an inventory
+    :return: A result dictionary with 'filename', 'status',
+             'error_count' and 'errors' keys, an 'io' key with cache
+             statistics for URLs, 'storage' and 'inventory' keys when
+             requested, a 'part' key for parts and a 'metrics' key of
+             'elapsed' seconds, 'reads', 'metadata_bytes' and the
+             'open_objects' HDF5 still holds once the file is closed
+    """
+    started = time.time()
+    measure = {} if metrics else None
+    classes = structure_classes if part is None and inventory is None \
+        else None
+    source = None
+    try:
+        source = open_source(filename, cache_options)
+        result = _check_source(filename, source, schema, io_profile,
+                               Validator(aggregate=aggregate,
+                                         columnar=columnar,
+                                         integrity=integrity,
+                                         integrity_threads=integrity_threads,
+                                         storage_summary=storage_summary,
+                                         inventory=inventory,
+                                         record_values=classes is not None),
+                               part, measure, classes)
+    except (KeyError, IOError, OSError) as e:
+        result = failed_result(filename, 'error', str(e), kind='unreadable')
+    finally:
+        if source is not None and source is not filename:
+            source.close()
+    if part is not None:
+        result['part'] = list(part)
+    if measure is not None:
+        measure['elapsed'] = round(time.time() - started, 6)
+        measure['open_objects'] = open_objects()
+        result['metrics'] = measure
+    return result
+
+
+def _check_source(filename, source, schema, io_profile, v, part=None,
+                  measure=None, classes=None):
+    try:
+        check_superblock(source)
+    except FileCheckError as e:
+        return failed_result(filename, e.kind, str(e))
+
+    try:
+        structure = None
+        with open_file(source, io_profile) as f:
+            if classes is not None:
+                structure, errors, error_count = classes.validate(v, schema,
+                                                                  f)
+            else:
+                if part is None:
+                    v.validate_file(schema, f)
+                else:
+                    v.validate_part(schema, f, *part)
+                errors = v.error_dicts()
+                error_count = v.error_count
+            if measure is not None:
+                measure['reads'] = count_reads(f)
+                # Bytes held in the metadata cache, for local files
+                measure['metadata_bytes'] = f.id.get_mdc_size()[2]
+    except MemoryError:
+        return failed_result(filename, 'oom', "Ran out of memory")
+    except Exception as e:
+        logger.debug("Failed to validate %s", filename, exc_info=True)
+        return failed_result(filename, 'error', str(e), kind='unreadable')
+
+    result = {
+        'filename': filename,
+        'status': 'valid' if not errors else 'invalid',
+        'error_count': error_count,
+        'errors': errors,
+    }
+    if structure is not None:
+        result['structure'] = structure
+    if isinstance(source, BlockCache):
+        result['io'] = source.stats()
+        if measure is not None:
+            measure['metadata_bytes'] = source.bytes_fetched
+    if v.storage is not None:
+        result['storage'] = v.storage.to_dict()
+    if v.inventory is not None:
+        result['inventory'] = v.inventory.to_dict()
+    return result
+
+
+def failed_result(filename, status, message, kind=None):
+    """
+    Create the result for a file which could not be validated.
+
+    :param filename: Path of the file
+    :param status: The status of the result, such as 'error' or 'timeout'
+    :param message: Description of the failure
+    :param kind: The kind of the error, defaults to [status]
+    :return: A result dictionary, as returned by check_file
+    """
+    return {
+        'filename': filename,
+        'status': status,
+        'error_count': 1,
+        'errors': [{'kind': kind or status, 'object': '/', 'error': message}],
+    }
+
+
+class ResultWriter():
+    """Write validation results to a stream, one JSON document per line."""
+
+    def __init__(self, stream):
+        """
+        Create a new writer.
+
+        :param stream: A text stream to write results to
+        """
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, result):
+        """
+        Write a single result and flush it to the stream.
+
+        :param result: A result dictionary, as returned by check_file
+        """
+        line = json.dumps(result, sort_keys=True)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+
+class Journal(ResultWriter):
+    """
+    Append-only record of completed files, used to resume a batch.
+
+    Each result is written and flushed as it completes, but the journal is
+    only synced to disk every sync_every results or sync_interval seconds,
+    so that syncing does not limit throughput. After a crash, at most the
+    results since the last sync are lost, and those files are validated
+    again on resume.
+    """
+
+    def __init__(self, path, sync_every=100, sync_interval=5.0):
+        """
+        Open a journal for appending.
+
+        :param path: The journal file, created if it does not exist
+        :param sync_every: Sync after this many results
+        :param sync_interval: Sync when this many seconds have passed
+                              since the last sync
+        """
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._unsynced = 0
+        self._last_sync = time.time()
+        super(Journal, self).__init__(open(path, "a"))
+
+    @staticmethod
+    def completed(path):
+        """
+        Find the files already recorded in a journal.
+
+        :param path: The journal file
+        :return: Set of filenames, empty if the journal does not exist
+        """
+        if not os.path.exists(path):
+            return set()
+        return set(r['filename'] for r in read_results([path]))
+
+    def write(self, result):
+        """
+        Append a result, syncing the journal if a sync is due.
+
+        :param result: A result dictionary, as returned by check_file
+        """
+        super(Journal, self).write(result)
+        with self._lock:
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every or \
+                    time.time() - self._last_sync >= self.sync_interval:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._stream.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def sync(self):
+        """Sync all results written so far to disk."""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        """Sync and close the journal."""
+        self.sync()
+        self._stream.close()
+
+    def __enter__(self):
+        """Use the journal as a context manager."""
+        return self
+
+    def __exit__(self, *exc):
+        """Close the journal."""
+        self.close()
+
+
+def _rss(pid):
+    """Find the resident set size of process [pid] in bytes, if possible."""
+    try:
+        with open("/proc/{}/statm".format(pid), "r") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+
+
+def _worker_main(conn, schema, check_options):
+    # Interrupts are handled by the pool, which stops workers cleanly
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            filename, part = _task(task)
+            if part is None:
+                conn.send(check_file(filename, schema, **check_options))
+            else:
+                conn.send(check_file(filename, schema, part=part,
+                                     **check_options))
+    finally:
+        close_archives()
+
+
+def _task(task):
+    # Tasks are a filename, or a tuple of (filename, part) for one part
+    return task if isinstance(task, tuple) else (task, None)
+
+
+def _failed_task(task, status, message):
+    filename, part = _task(task)
+    result = failed_result(filename, status, message)
+    if part is not None:
+        result['part'] = list(part)
+    return result
+
+
+class _Worker():
+    """A worker process and the task it is currently validating."""
+
+    def __init__(self, schema, check_options):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker_main, args=(child_conn, schema, check_options))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.started = None
+        self.busy_time = 0.0
+
+    def start(self, task):
+        self.task = task
+        self.started = time.time()
+        self.conn.send(task)
+
+    def finish(self):
+        task = self.task
+        self.busy_time += time.time() - self.started
+        self.task = None
+        self.started = None
+        return task
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (IOError, OSError):
+                pass
+        self.process.join(1 if not kill else None)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ValidationPool():
+    """
+    Validate files on a pool of worker processes.
+
+    Each worker loads the schema once and reuses it for every file it is
+    given. Up to max_pending files wait in a queue for a worker; submit
+    blocks while the queue is full, so a fast producer cannot run ahead of
+    the workers.
+
+    Every file is validated in a separate process from the caller. A worker
+    which exceeds the timeout or memory limit, or which dies, is killed and
+    replaced, and the file is reported with the status 'timeout', 'oom' or
+    'crashed' while the remaining workers carry on.
+    """
+
+    poll_interval = 0.1
+
+    def __init__(self, schema, callback, jobs=None, max_pending=None,
+                 timeout=None, max_rss=None, check_options=None,
+                 metrics=None):
+        """
+        Create a new pool.
+
+        :param schema: The loaded Schema to validate against
+        :param callback: Called with each result dictionary as files
+                         complete, from a thread owned by the pool
+        :param jobs: Number of worker processes, defaults to the CPU count
+        :param max_pending: Maximum number of files waiting for a worker,
+                            defaults to twice the number of workers
+        :param timeout: Seconds a worker may spend on one file, or None
+        :param max_rss: Bytes of resident memory a worker may use, or None
+        :param check_options: Keyword arguments for check_file, such as
+                              io_profile
+        :param metrics: Metrics to give the queue depth and busy workers
+                        to, which are written until the pool is closed,
+                        or None. Files are measured for the caller to
+                        observe their results
+        """
+        jobs = jobs or multiprocessing.cpu_count()
+        self._schema = schema
+        self._check_options = check_options or {}
+        if metrics is not None:
+            self._check_options = dict(self._check_options, metrics=True)
+        self._callback = callback
+        self._timeout = timeout
+        self._max_rss = max_rss
+        self._queue = queue.Queue(max_pending or 2 * jobs)
+        self._workers = [_Worker(schema, self._check_options)
+                         for _ in range(jobs)]
+        self.tasks = 0
+        self._started = time.time()
+        self._finished = None
+        self._metrics = metrics
+        if metrics is not None:
+            metrics.gauges['queue_depth'] = self._queue.qsize
+            metrics.gauges['busy_workers'] = self.busy_workers
+            metrics.start()
+        self._thread = threading.Thread(target=self._run,
+                                        name="h5_validate.batch.pool")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, task):
+        """
+        Queue a file for validation, blocking while the queue is full.
+
+        :param task: Path of the HDF5 file to validate, or a tuple of
+                     (path, part) to validate one part of it, see
+                     check_file
+        """
+        self._queue.put(task)
+
+    def _deliver(self, result):
+        try:
+            self._callback(result)
+        except Exception:
+            logger.exception("Failed to record result for %s",
+                             result['filename'])
+
+    def _replace(self, worker):
+        index = self._workers.index(worker)
+        worker.stop(kill=True)
+        self._workers[index] = _Worker(self._schema, self._check_options)
+        self._workers[index].busy_time = worker.busy_time
+        return self._workers[index]
+
+    def _exceeded_limit(self, worker, now):
+        if self._timeout and now - worker.started > self._timeout:
+            return 'timeout', "Validation did not complete within {}s" \
+                "".format(self._timeout)
+        if self._max_rss:
+            rss = _rss(worker.process.pid)
+            if rss is not None and rss > self._max_rss:
+                return 'oom', "Worker memory use {} bytes exceeded limit " \
+                    "of {} bytes".format(rss, self._max_rss)
+        return None
+
+    def _run(self):
+        idle = list(self._workers)
+        busy = {}
+        closing = False
+        while busy or not closing:
+            # Hand out work, waiting for it only if nothing is in progress
+            while idle and not closing:
+                try:
+                    task = self._queue.get(block=not busy)
+                except queue.Empty:
+                    break
+                if task is None:
+                    closing = True
+                    break
+                worker = idle.pop()
+                worker.start(task)
+                self.tasks += 1
+                busy[worker.conn] = worker
+
+            if not busy:
+                continue
+
+            for conn in connection.wait(list(busy), self.poll_interval):
+                worker = busy.pop(conn)
+                try:
+                    result = conn.recv()
+                    worker.finish()
+                except (EOFError, IOError, OSError):
+                    worker.process.join(1)
+                    result = _failed_task(
+                        worker.finish(), 'crashed',
+                        "Worker exited with code {}"
+                        "".format(worker.process.exitcode))
+                    worker = self._replace(worker)
+                idle.append(worker)
+                self._deliver(result)
+
+            now = time.time()
+            for conn, worker in list(busy.items()):
+                exceeded = self._exceeded_limit(worker, now)
+                if exceeded:
+                    del busy[conn]
+                    result = _failed_task(worker.finish(), *exceeded)
+                    idle.append(self._replace(worker))
+                    self._deliver(result)
+
+    def close(self):
+        """Wait for all submitted files to complete and stop the workers."""
+        self._queue.put(None)
+        self._thread.join()
+        self._finished = time.time()
+        for worker in self._workers:
+            worker.stop()
+        if self._metrics is not None:
+            self._metrics.close()
+
+    def busy_workers(self):
+        """
+        Count the workers validating a file.
+
+        :return: Number of busy workers
+        """
+        return sum(1 for worker in self._workers if worker.task is not None)
+
+    def stats(self):
+        """
+        Measure how busy the workers have been.
+
+        :return: Dictionary with 'workers', 'tasks', 'wall_time',
+                 'busy_time' listing the seconds each worker spent
+                 validating, and 'utilisation', the fraction of the
+                 workers' time spent validating
+        """
+        wall_time = (self._finished or time.time()) - self._started
+        busy_time = [round(worker.busy_time, 3) for worker in self._workers]
+        capacity = wall_time * len(self._workers)
+        return {
+            'workers': len(self._workers),
+            'tasks': self.tasks,
+            'wall_time': round(wall_time, 3),
+            'busy_time': busy_time,
+            'utilisation': round(sum(busy_time) / capacity, 3)
+            if capacity else 0.0,
+        }
+
+    def __enter__(self):
+        """Use the pool as a context manager."""
+        return self
+
+    def __exit__(self, *exc):
+        """Drain and stop the pool."""
+        self.close()
+
+
+def run_batch(filenames, schema, writer, journal=None, prefetch=0,
+              schedule=False, split_size=DEFAULT_SPLIT_SIZE, metrics=None,
+              **options):
+    """
+    Validate [filenames] on a worker pool, writing each result.
+
+    :param filenames: Iterable of files to validate
+    :param schema: The loaded Schema to validate against
+    :param writer: A ResultWriter to report results to
+    :param journal: A Journal to also record results to, or None
+    :param prefetch: Number of files to warm the page cache for ahead of
+                     the worker pool's queue, or 0 to not prefetch
+    :param schedule: Stat every file first and validate the largest first,
+                     splitting files larger than [split_size], see
+                     schedule.plan
+    :param split_size: Bytes above which scheduled files are split, or
+                       None to not split files
+    :param metrics: Metrics to observe each file's result in, or None
+    :param options: Options for the ValidationPool, such as jobs, timeout
+                    and max_rss
+    :return: Summary dictionary of the results, including any results
+             recorded in [journal] by earlier runs, and the pool's stats
+             under 'scheduler' when scheduling
+    """
+    summary = Summary()
+
+    def record(result):
+        if metrics is not None:
+            metrics.observe(result)
+            result.pop('metrics', None)
+        writer.write(result)
+        if journal:
+            journal.write(result)
+        else:
+            summary.add(result)
+
+    tasks = filenames
+    if schedule:
+        tasks = [task[:2] if task.part else task.filename
+                 for task in plan(filenames, schema, split_size)]
+    if prefetch:
+        tasks = Prefetcher(tasks, prefetch,
+                           warm=lambda task: warm_file(_task(task)[0]))
+
+    collector = PartCollector(record)
+    with ValidationPool(schema, collector.add, metrics=metrics,
+                        **options) as pool:
+        for task in tasks:
+            pool.submit(task)
+
+    if journal:
+        journal.sync()
+        result = summarise(read_results([journal.path]))
+    else:
+        result = summary.to_dict()
+    if schedule:
+        result['scheduler'] = pool.stats()
+    return result
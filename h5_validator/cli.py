@@ -6,14 +6,34 @@ from __future__ import \
     division
 
 import argparse
+import contextlib
+import io
+import itertools
+import json
 import logging
 import os
 import sys
 import h5py
 import pkg_resources
 
+from h5_validator.archive import close_archives, is_archive, \
+    list_members, open_member, split_member
+from h5_validator.batch import Journal, ResultWriter, discover_files, \
+    format_summary, in_shard, parse_shard, read_file_list, read_results, \
+    run_batch, summarise
+from h5_validator.fileobj import DEFAULT_BLOCK_SIZE, DEFAULT_CAPACITY, \
+    DEFAULT_READAHEAD, BlockCache, is_url, open_url
+from h5_validator.h5file import IO_PROFILES, open_file
+from h5_validator.integrity import DEFAULT_THREADS
+from h5_validator.inventory import write_inventory_table
+from h5_validator.metrics import DEFAULT_INTERVAL, Metrics, \
+    PrometheusTextfile, StatsdExporter
+from h5_validator.precheck import FileCheckError, check_superblock
+from h5_validator.schedule import DEFAULT_SPLIT_SIZE
 from h5_validator.schema import Schema
+from h5_validator.structure import StructureClasses
 from h5_validator.validator import Validator
+from h5_validator.watch import watch
 
 
 def _find_schema(schema):
@@ -27,44 +47,517 @@ def _find_schema(schema):
                   "".format(schema))
 
 
-def validate(f, schema, verbose=True, reporter=sys.stdout):
+def _load_schema(schema):
+    if isinstance(schema, Schema):
+        return schema
+    return Schema(_find_schema(schema))
+
+
+@contextlib.contextmanager
+def _opened(f, io_profile, cache_options, pool):
+    # Open [f] for validation, yielding the h5py.File, the BlockCache it is
+    # read through or None, and the name to report or None. Everything
+    # opened here is closed on exit, while files from [pool] stay open
+    if isinstance(f, h5py.File):
+        yield f, None, None
+        return
+    if pool is not None and isinstance(f, str):
+        yield pool.open(f), None, f if split_member(f) else None
+        return
+
+    cache = None
+    filename = None
+    source = f
+    if is_url(f):
+        source = cache = open_url(f, **(cache_options or {}))
+    elif isinstance(f, str) and split_member(f):
+        filename = f
+        source = open_member(f)
+    elif not isinstance(f, str):
+        # The caller's file-like object is left open
+        cache = f if isinstance(f, BlockCache) else \
+            BlockCache(f, **(cache_options or {}))
+        source = cache
+
+    try:
+        check_superblock(source)
+        with open_file(source, io_profile) as h5:
+            yield h5, cache, filename
+    finally:
+        if isinstance(f, str) and source is not f:
+            source.close()
+
+
+def validate(f, schema, verbose=True, reporter=sys.stdout,
+             io_profile='default', cache_options=None, aggregate=False,
+             columnar=False, integrity=False, integrity_threads=None,
+             storage_summary=False, inventory=None, paths=None, pool=None):
     """
     Validate a file against a schema.
 
+    Files can be given as an open h5py.File, a filename, an http(s) URL,
+    an archive member name (archive::member) or a seekable file-like
+    object. URLs and file-like objects are read through a BlockCache, and
+    the amount fetched is reported.
+
+    Files opened here are closed before returning, so validating many
+    files in one process does not leak HDF5 objects or file descriptors.
+    Open h5py.Files and file-like objects are left open for the caller,
+    and archives are kept open for their next members until
+    archive.close_archives is called.
+
     :param filename: Filename to open
-    :param schema: URI to a schema to find and use
+    :param schema: URI to a schema to find and use, or a loaded Schema
+    :param io_profile: How to open the file, one of h5file.IO_PROFILES
+    :param cache_options: Options for the BlockCache used for URLs and
+                          file-like objects
+    :param aggregate: Report each distinct error once, with a count and
+                      example paths
+    :param columnar: Check scalar attributes a column at a time
+    :param integrity: Check every stored chunk of matched datasets decodes
+    :param integrity_threads: Threads decoding chunks for integrity checks
+    :param storage_summary: Report the logical and stored bytes of the
+                            validated datasets
+    :param inventory: Names of attributes to collect into an inventory of
+                      the file, written as JSON after the report, or None
+                      for no inventory
+    :param paths: Validate only the objects at these HDF5 paths, see
+                  Validator.validate_paths
+    :param pool: A FilePool to take files given by name from, keeping them
+                 open to validate again, or None. The pool's io_profile
+                 and cache_options are used for them
     :return: If the validation was successful
     """
-    sch = Schema(_find_schema(schema))
+    sch = _load_schema(schema)
+    name = f if isinstance(f, str) else getattr(f, "name", f)
 
-    if not isinstance(f, h5py.File):
-        f = h5py.File(f, "r")
+    try:
+        with _opened(f, io_profile, cache_options, pool) as \
+                (h5, cache, filename):
+            v = Validator(aggregate=aggregate, columnar=columnar,
+                          integrity=integrity,
+                          integrity_threads=integrity_threads,
+                          storage_summary=storage_summary,
+                          inventory=inventory)
+            if paths:
+                v.validate_paths(sch, h5, paths)
+            else:
+                v.validate_file(sch, h5)
+            if cache is not None:
+                filename = cache.name
+            v.print_report(reporter, h5, verbose, filename=filename)
+            if cache is not None:
+                reporter.write("\nFetched {bytes_fetched} of {size} bytes "
+                               "in {fetches} reads, cache hit rate "
+                               "{hit_rate:.1%}\n".format(**cache.stats()))
+    except FileCheckError as e:
+        reporter.write("Validation failed, {} is {}: {}\n"
+                       "".format(name, e.kind.replace("_", " "), e))
+        return False
 
-    v = Validator()
-    v.validate_file(sch, f)
-    v.print_report(reporter, f, verbose)
+    if v.storage is not None:
+        reporter.write("\n" + str(v.storage))
+    if v.inventory is not None:
+        reporter.write("\n" + json.dumps(v.inventory.to_dict(), indent=4,
+                                         sort_keys=True) + "\n")
     return v.is_valid
 
 
-def main():
+def read_id_paths(read_ids):
+    """
+    Find the groups of reads in multi-read files.
+
+    :param read_ids: Iterable of read IDs, with or without a 'read_' prefix
+    :return: Generator of HDF5 paths, ie: '/read_<uuid>'
+    """
+    for read_id in read_ids:
+        read_id = read_id.strip()
+        if read_id:
+            yield "/" + (read_id if read_id.startswith("read_")
+                         else "read_" + read_id)
+
+
+def _target_paths(args):
+    paths = list(args.path or [])
+    if args.read_id_file:
+        with open(args.read_id_file, "rb") as f:
+            paths.extend(read_id_paths(read_file_list(f)))
+    return paths
+
+
+def _setup_logging(debug, stream=sys.stdout):
+    logging.basicConfig(stream=stream,
+                        level=logging.DEBUG if debug else logging.INFO)
+
+
+def _add_check_arguments(parser):
+    parser.add_argument('--io', choices=IO_PROFILES, default='default',
+                        help='How files are read: core reads each file into '
+                             'memory in one pass, tuned enlarges HDF5 caches, '
+                             'auto chooses by file size (default: default)')
+    parser.add_argument('--block-size', type=int,
+                        default=DEFAULT_BLOCK_SIZE // 1024, metavar='KB',
+                        help='Block size of the cache used for URLs '
+                             '(default: %(default)s)')
+    parser.add_argument('--cache-blocks', type=int, default=DEFAULT_CAPACITY,
+                        help='Number of blocks held by the cache used for '
+                             'URLs (default: %(default)s)')
+    parser.add_argument('--readahead', type=int, default=DEFAULT_READAHEAD,
+                        metavar='BLOCKS',
+                        help='Blocks fetched ahead of each cache miss '
+                             '(default: %(default)s)')
+    parser.add_argument('--aggregate', action='store_true',
+                        help='Report each distinct error once, with a count '
+                             'and example paths, instead of once per object')
+    parser.add_argument('--columnar', action='store_true',
+                        help='Check each schema attribute across all objects '
+                             'at once, which is faster for multi-read files')
+    parser.add_argument('--integrity', action='store_true',
+                        help='Check every stored chunk of matched datasets '
+                             'decompresses and matches its checksum')
+    parser.add_argument('--integrity-threads', type=int, default=None,
+                        metavar='N',
+                        help='Threads decompressing chunks for --integrity '
+                             '(default: {})'.format(DEFAULT_THREADS))
+    parser.add_argument('--storage-summary', action='store_true',
+                        help='Report the logical and stored bytes of the '
+                             'validated datasets')
+    parser.add_argument('--inventory', action='store_true',
+                        help='Report the objects matched by each schema node '
+                             'and the sizes of datasets')
+    parser.add_argument('--inventory-attribute', action='append',
+                        metavar='NAME',
+                        help='Also collect the values of attributes with '
+                             'this name, may be repeated')
+
+
+def _check_options(args):
+    return {
+        'io_profile': args.io,
+        'cache_options': {
+            'block_size': args.block_size * 1024,
+            'capacity': args.cache_blocks,
+            'readahead': args.readahead,
+        },
+        'aggregate': args.aggregate,
+        'columnar': args.columnar,
+        'integrity': args.integrity,
+        'integrity_threads': args.integrity_threads,
+        'storage_summary': args.storage_summary,
+        'inventory': (args.inventory_attribute or [])
+        if args.inventory else None,
+    }
+
+
+def _add_pool_arguments(parser):
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Number of worker processes '
+                             '(default: CPU count)')
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help='Maximum number of files waiting for a worker '
+                             '(default: twice the number of workers)')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Seconds a worker may spend on one file before '
+                             'it is killed and the file reported as timeout')
+    parser.add_argument('--max-rss', type=float, default=None,
+                        metavar='MB',
+                        help='Resident memory a worker may use before it is '
+                             'killed and the file reported as oom')
+    parser.add_argument('--structure-classes', action='store_true',
+                        help='Group files by a hash of their structure, and '
+                             'fully validate only the first file of each '
+                             'structure in each worker, checking only '
+                             'values in the rest')
+    parser.add_argument('--metrics-file', default=None,
+                        help='Write throughput, latency and error metrics '
+                             'to this file for the Prometheus node '
+                             'exporter\'s textfile collector')
+    parser.add_argument('--statsd', default=None, metavar='HOST:PORT',
+                        help='Push throughput, latency and error metrics '
+                             'to this StatsD daemon')
+    parser.add_argument('--metrics-interval', type=float,
+                        default=DEFAULT_INTERVAL,
+                        help='Seconds between metrics updates '
+                             '(default: {})'.format(DEFAULT_INTERVAL))
+    _add_check_arguments(parser)
+
+
+def _pool_options(args):
+    return {
+        'jobs': args.jobs,
+        'max_pending': args.queue_size,
+        'timeout': args.timeout,
+        'max_rss': int(args.max_rss * 1024 * 1024) if args.max_rss else None,
+        'check_options': dict(_check_options(args),
+                              structure_classes=StructureClasses()
+                              if args.structure_classes else None),
+        'metrics': _metrics(args),
+    }
+
+
+def _metrics(args):
+    exporters = []
+    if args.metrics_file:
+        exporters.append(PrometheusTextfile(args.metrics_file))
+    if args.statsd:
+        exporters.append(StatsdExporter(args.statsd))
+    return Metrics(exporters, args.metrics_interval) if exporters else None
+
+
+def _watch_command(argv):
+    parser = argparse.ArgumentParser(
+        prog='h5_validate watch',
+        description='Validate new HDF5 files as they appear in directories')
+    parser.add_argument('schema',
+                        help='The schema URI to use for validation')
+    parser.add_argument('directories', nargs='+', metavar='directory',
+                        help='Directories to watch for new files')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Append JSON line results to this file '
+                             '(default: stdout)')
+    _add_pool_arguments(parser)
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help='Seconds between directory scans')
+    parser.add_argument('--settle', type=float, default=10.0,
+                        help='Seconds a file must be unchanged before it '
+                             'is validated')
+    parser.add_argument('--state', default=None,
+                        help='File recording validated files, so a '
+                             'restarted watch skips them')
+    parser.add_argument('--debug', action='store_true',
+                        help='Enable debug logging')
+
+    args = parser.parse_args(argv)
+    _setup_logging(args.debug, sys.stderr)
+
+    schema = _load_schema(args.schema)
+    output = open(args.output, "a") if args.output else sys.stdout
+    try:
+        watch(args.directories, schema, ResultWriter(output),
+              interval=args.interval,
+              settle_time=args.settle,
+              state_file=args.state,
+              **_pool_options(args))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def _shard_argument(value):
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _batch_command(argv):
+    parser = argparse.ArgumentParser(
+        prog='h5_validate batch',
+        description='Validate many HDF5 files, writing JSON line results')
+    parser.add_argument('schema',
+                        help='The schema URI to use for validation')
+    parser.add_argument('paths', nargs='*', metavar='path',
+                        help='Files, or directories to search for .fast5 '
+                             'files')
+    parser.add_argument('--files-from', default=None, metavar='FILE',
+                        help='Also validate the paths listed in this file, '
+                             'one per line or NUL separated ("-" for stdin)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Write JSON line results to this file '
+                             '(default: stdout)')
+    _add_pool_arguments(parser)
+    parser.add_argument('--prefetch', type=int, default=0, metavar='N',
+                        help='Warm the page cache for up to N files ahead of '
+                             'the workers (default: 0, no prefetching)')
+    parser.add_argument('--schedule', action='store_true',
+                        help='Find the size of every file first, validate '
+                             'the largest first and split large multi-read '
+                             'files between workers')
+    parser.add_argument('--split-size', type=float,
+                        default=DEFAULT_SPLIT_SIZE // (1024 * 1024),
+                        metavar='MB',
+                        help='Size above which --schedule splits files, 0 to '
+                             'not split files (default: %(default)s)')
+    parser.add_argument('--shard', type=_shard_argument, default=None,
+                        metavar='K/N',
+                        help='Only validate the K-th of N partitions of the '
+                             'discovered files')
+    journal_args = parser.add_mutually_exclusive_group()
+    journal_args.add_argument('--journal', default=None,
+                              help='Record completed files in this journal, '
+                                   'so the run can be resumed')
+    journal_args.add_argument('--resume', default=None, metavar='JOURNAL',
+                              help='Skip files recorded in this journal, '
+                                   'and continue recording to it')
+    parser.add_argument('--debug', action='store_true',
+                        help='Enable debug logging')
+
+    args = parser.parse_args(argv)
+    _setup_logging(args.debug, sys.stderr)
+
+    if args.journal and os.path.exists(args.journal):
+        parser.error("Journal '{}' already exists, use --resume to continue "
+                     "it".format(args.journal))
+    if not args.paths and not args.files_from:
+        parser.error("No paths given, pass paths or --files-from")
+
+    schema = _load_schema(args.schema)
+    paths = args.paths
+    files_from = None
+    if args.files_from == '-':
+        # Read stdin unbuffered: forked workers close sys.stdin on start,
+        # which would block on the buffer's lock while a read is waiting
+        files_from = io.FileIO(sys.stdin.fileno(), closefd=False)
+    elif args.files_from:
+        files_from = open(args.files_from, "rb")
+    if files_from:
+        paths = itertools.chain(paths, read_file_list(files_from))
+    filenames = discover_files(paths)
+    if args.shard:
+        filenames = (f for f in filenames if in_shard(f, *args.shard))
+    if args.resume:
+        completed = Journal.completed(args.resume)
+        filenames = (f for f in filenames if f not in completed)
+
+    journal_path = args.journal or args.resume
+    journal = Journal(journal_path) if journal_path else None
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        summary = run_batch(filenames, schema, ResultWriter(output),
+                            journal=journal, prefetch=args.prefetch,
+                            schedule=args.schedule,
+                            split_size=int(args.split_size * 1024 * 1024)
+                            or None,
+                            **_pool_options(args))
+    finally:
+        if files_from:
+            files_from.close()
+        if output is not sys.stdout:
+            output.close()
+        if journal:
+            journal.close()
+
+    sys.stderr.write(format_summary(summary))
+    return 0 if summary['files'] == summary['statuses'].get('valid', 0) \
+        else 1
+
+
+def _merge_command(argv):
+    parser = argparse.ArgumentParser(
+        prog='h5_validate merge',
+        description='Combine JSON line results into a single summary')
+    parser.add_argument('results', nargs='+', metavar='result',
+                        help='JSON line result files to combine')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Write the JSON summary to this file '
+                             '(default: stdout)')
+
+    args = parser.parse_args(argv)
+    summary = summarise(read_results(args.results))
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        json.dump(summary, output, indent=4, sort_keys=True)
+        output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    sys.stderr.write(format_summary(summary))
+
+
+def _inventory_command(argv):
+    parser = argparse.ArgumentParser(
+        prog='h5_validate inventory',
+        description='Write the inventories in JSON line results as one tab '
+                    'separated table')
+    parser.add_argument('results', nargs='+', metavar='result',
+                        help='JSON line result files, written with '
+                             '--inventory')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Write the table to this file (default: stdout)')
+
+    args = parser.parse_args(argv)
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        rows = write_inventory_table(read_results(args.results), output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    sys.stderr.write("Wrote {} rows\n".format(rows))
+
+
+def _lint_command(argv):
+    parser = argparse.ArgumentParser(
+        prog='h5_validate lint',
+        description='Report matchers in a schema which can match the same '
+                    'object')
+    parser.add_argument('schema',
+                        help='The schema URI to check')
+
+    args = parser.parse_args(argv)
+    schema = _load_schema(args.schema)
+    for warning in schema.warnings:
+        sys.stdout.write(str(warning))
+    sys.stdout.write("{} warnings in {}\n".format(len(schema.warnings),
+                                                  args.schema))
+    return 1 if schema.warnings else 0
+
+
+_COMMANDS = {
+    'batch': _batch_command,
+    'inventory': _inventory_command,
+    'lint': _lint_command,
+    'merge': _merge_command,
+    'watch': _watch_command,
+}
+
+
+def main(argv=None):
     """Invoke validation from command line."""
-    parser = argparse.ArgumentParser(description='Validate HDF5 file')
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv and argv[0] in _COMMANDS:
+        return _COMMANDS[argv[0]](argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description='Validate HDF5 file',
+        epilog='Other commands: {} (see "h5_validate <command> --help")'
+               ''.format(', '.join(sorted(_COMMANDS))))
     parser.add_argument('schema',
                         help='The schema URI to use for validation')
     parser.add_argument('filename',
-                        help='The file to validate')
+                        help='The file to validate, or a tar or zip archive '
+                             'of files to validate')
     parser.add_argument('-v', '--verbose', required=False, default=False,
                         action='store_true', help='Show verbose output')
+    _add_check_arguments(parser)
+    parser.add_argument('--path', action='append', metavar='PATH',
+                        help='Validate only the object at this HDF5 path and '
+                             'everything below it, may be repeated')
+    parser.add_argument('--read-id-file', metavar='FILE',
+                        help='Validate only the reads listed in this file, '
+                             'one read ID per line, in multi-read files')
     parser.add_argument('--debug', action='store_true',
                         help='Enable debug logging')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-    logging.basicConfig(stream=sys.stdout,
-                        level=logging.DEBUG if args.debug else logging.INFO)
+    _setup_logging(args.debug)
 
-    validate(args.filename, args.schema, args.verbose)
+    if is_archive(args.filename):
+        filenames = list_members(args.filename)
+    else:
+        filenames = [args.filename]
+    paths = _target_paths(args)
+    try:
+        for filename in filenames:
+            validate(filename, args.schema, args.verbose, paths=paths,
+                     **_check_options(args))
+    finally:
+        close_archives()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
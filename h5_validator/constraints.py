@@ -0,0 +1,222 @@
+"""Consistency constraints between objects, checked after traversal."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import re
+
+import numpy
+
+CONSTRAINT_TYPES = ('equal', 'unique', 'same')
+
+# A template embeds selectors in text, ie: 'read_{Raw@read_id}'
+_TEMPLATE_FIELD = re.compile(r"\{([^{}]+)\}")
+_LENGTH = re.compile(r"^len\((.*)\)$")
+
+
+def _decode(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
+
+
+class Selector():
+    """
+    Selects a value from a group, relative to the group.
+
+    Selectors are written as:
+        $name: the group's own name
+        path@attribute: an attribute of the group's member at path, or of
+                        the group itself when path is empty
+        len(path): the length of the dataset at path
+
+    Text containing {selector} fields is a template: the fields are
+    replaced by their values and the result is a string.
+    """
+
+    def __init__(self, text):
+        """
+        Parse a selector.
+
+        :param text: The selector, as written in the schema
+        """
+        self.text = text
+        self._fields = _TEMPLATE_FIELD.split(text)
+        if len(self._fields) == 1:
+            self._fields = ["", text, ""]
+            self.is_template = False
+        else:
+            self.is_template = True
+
+        # Fields alternate between literal text and selectors
+        self._readers = [self._reader(field)
+                         for field in self._fields[1::2]]
+
+    @staticmethod
+    def _reader(field):
+        if field == "$name":
+            return lambda group: group.name.rsplit("/", 1)[1]
+
+        length = _LENGTH.match(field)
+        if length:
+            path = length.group(1)
+            return lambda group: len(group[path])
+
+        if "@" not in field:
+            raise Exception("Invalid selector '{}', expected $name, "
+                            "path@attribute or len(path)".format(field))
+        path, attribute = field.rsplit("@", 1)
+        if not path:
+            return lambda group: group.attrs[attribute]
+        return lambda group: group[path].attrs[attribute]
+
+    def select(self, group):
+        """
+        Find the value of this selector for [group].
+
+        :param group: The HDF5 group to select from
+        :return: The value, or None if an object or attribute is missing
+        """
+        try:
+            values = [_decode(read(group)) for read in self._readers]
+        except (KeyError, TypeError):
+            return None
+        if not self.is_template:
+            return values[0]
+
+        parts = list(self._fields)
+        parts[1::2] = [str(value) for value in values]
+        return "".join(parts)
+
+    def __str__(self):
+        """Format this selector as written in the schema."""
+        return self.text
+
+
+def _column(values):
+    # Numbers are compared as numbers, everything else as text
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool)
+           for v in values):
+        return numpy.array(values, dtype=float)
+    return numpy.array([str(v) for v in values])
+
+
+class ConstraintSet():
+    """
+    The constraints of one schema level, with the values they select.
+
+    Values are gathered from each group matched by the level as it is
+    validated. Once the whole file has been walked, check evaluates each
+    constraint over the gathered columns with vectorised comparisons.
+
+    Constraints are given in the schema as a list under 'constraints':
+        equal: [a, b]: a equals b within each group
+        unique: a: a differs between all groups matched by the level
+        same: a: a is the same for all groups matched by the level
+    """
+
+    def __init__(self, constraints):
+        """
+        Parse the constraints of a level.
+
+        :param constraints: The list given under 'constraints' in the schema
+        """
+        self.constraints = []
+        self.selectors = []
+        for constraint in constraints:
+            if not isinstance(constraint, dict) or len(constraint) != 1:
+                raise Exception("Expected constraint to be a dictionary with "
+                                "one key, got {}".format(constraint))
+            (type, arguments), = constraint.items()
+            if type not in CONSTRAINT_TYPES:
+                raise Exception("Unknown constraint type {}".format(type))
+            if isinstance(arguments, str):
+                arguments = [arguments]
+            if len(arguments) != (2 if type == 'equal' else 1):
+                raise Exception("Wrong number of selectors for {} constraint "
+                                "{}".format(type, arguments))
+
+            indices = []
+            for text in arguments:
+                indices.append(len(self.selectors))
+                self.selectors.append(Selector(text))
+            self.constraints.append((type, indices))
+
+        self.groups = []
+        self.columns = [[] for _ in self.selectors]
+
+    def add(self, group):
+        """
+        Gather the selected values of [group].
+
+        :param group: An HDF5 group matched by this level
+        """
+        self.groups.append(group)
+        for selector, column in zip(self.selectors, self.columns):
+            column.append(selector.select(group))
+
+    def _present(self, indices):
+        present = numpy.ones(len(self.groups), dtype=bool)
+        for i in indices:
+            present &= numpy.array([v is not None for v in self.columns[i]],
+                                   dtype=bool)
+        return numpy.flatnonzero(present)
+
+    def check(self):
+        """
+        Evaluate every constraint over the gathered values.
+
+        Groups where a selected value is missing are skipped; missing
+        objects and attributes are reported by the structural checks.
+
+        :return: Generator of failures, as tuples of (kind, message, group)
+        """
+        for type, indices in self.constraints:
+            rows = self._present(indices)
+            if not len(rows):
+                continue
+            values = [_column([self.columns[i][r] for r in rows])
+                      for i in indices]
+            selectors = [self.selectors[i] for i in indices]
+
+            if type == 'equal':
+                first, second = values
+                if first.dtype != second.dtype:
+                    # A number against text, which may hold a number
+                    try:
+                        first = first.astype(float)
+                        second = second.astype(float)
+                    except ValueError:
+                        first, second = first.astype(str), second.astype(str)
+                for r in numpy.flatnonzero(first != second):
+                    yield ("constraint_equal",
+                           "{} ({}) does not equal {} ({})".format(
+                               selectors[0], first[r], selectors[1],
+                               second[r]),
+                           self.groups[rows[r]])
+
+            elif type == 'unique':
+                column, = values
+                unique, inverse, counts = numpy.unique(
+                    column, return_inverse=True, return_counts=True)
+                for r in numpy.flatnonzero(counts[inverse] > 1):
+                    yield ("constraint_unique",
+                           "{} ({}) is not unique".format(selectors[0],
+                                                          column[r]),
+                           self.groups[rows[r]])
+
+            elif type == 'same':
+                column, = values
+                unique, inverse, counts = numpy.unique(
+                    column, return_inverse=True, return_counts=True)
+                # Report the groups which differ from the most common value
+                common = numpy.argmax(counts)
+                for r in numpy.flatnonzero(inverse != common):
+                    yield ("constraint_same",
+                           "{} ({}) differs from other groups ({})".format(
+                               selectors[0], column[r], unique[common]),
+                           self.groups[rows[r]])
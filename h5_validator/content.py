@@ -0,0 +1,187 @@
+"""Check the values held by datasets, a block of chunks at a time."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import numpy
+
+# Schema keys of dataset content rules
+CONTENT_RULES = ('minimum', 'maximum', 'allowed_values', 'no_nan',
+                 'non_empty', 'monotonic')
+
+MONOTONIC = {
+    'increasing': numpy.greater_equal,
+    'strictly_increasing': numpy.greater,
+    'decreasing': numpy.less_equal,
+    'strictly_decreasing': numpy.less,
+}
+
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def has_content_rules(dataset):
+    """
+    Find if a dataset schema has any content rules.
+
+    :param dataset: The expanded dataset schema
+    :return: If any of CONTENT_RULES are given
+    """
+    return any(rule in dataset for rule in CONTENT_RULES)
+
+
+class _Block():
+    """Running state of a scan, updated a block of values at a time."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.below = 0
+        self.above = 0
+        self.smallest = None
+        self.largest = None
+        self.disallowed = 0
+        self.first_disallowed = None
+        self.nans = 0
+        self.unordered = 0
+        self.previous = None
+
+    def update(self, values):
+        rules = self.rules
+        if not values.size:
+            return
+
+        flat = values.reshape(-1)
+        if 'minimum' in rules or 'maximum' in rules:
+            low, high = flat.min(), flat.max()
+            self.smallest = low if self.smallest is None \
+                else min(self.smallest, low)
+            self.largest = high if self.largest is None \
+                else max(self.largest, high)
+            if 'minimum' in rules:
+                self.below += numpy.count_nonzero(flat < rules['minimum'])
+            if 'maximum' in rules:
+                self.above += numpy.count_nonzero(flat > rules['maximum'])
+
+        if 'allowed_values' in rules:
+            bad = ~numpy.isin(flat, rules['allowed_values'])
+            count = numpy.count_nonzero(bad)
+            if count and self.first_disallowed is None:
+                self.first_disallowed = flat[numpy.argmax(bad)]
+            self.disallowed += count
+
+        if rules.get('no_nan') and flat.dtype.kind in 'fc':
+            self.nans += numpy.count_nonzero(numpy.isnan(flat))
+
+        if 'monotonic' in rules:
+            compare = MONOTONIC[rules['monotonic']]
+            if self.previous is not None:
+                self.unordered += not compare(flat[0], self.previous)
+            self.unordered += numpy.count_nonzero(
+                ~compare(flat[1:], flat[:-1]))
+            self.previous = flat[-1]
+
+    def failures(self, size):
+        rules = self.rules
+        if rules.get('non_empty') and size == 0:
+            yield "empty", "Dataset is empty", "non-empty", size
+        if self.below:
+            yield ("value_range", "{} values below minimum".format(
+                self.below), rules['minimum'], self.smallest)
+        if self.above:
+            yield ("value_range", "{} values above maximum".format(
+                self.above), rules['maximum'], self.largest)
+        if self.disallowed:
+            yield ("allowed_values", "{} values not allowed".format(
+                self.disallowed), rules['allowed_values'],
+                self.first_disallowed)
+        if self.nans:
+            yield "nan", "{} NaN values".format(self.nans), "no NaN", \
+                self.nans
+        if self.unordered:
+            yield ("monotonic", "{} values out of order".format(
+                self.unordered), rules['monotonic'], self.unordered)
+
+
+class ContentScanner():
+    """
+    Checks the values of datasets against content rules.
+
+    Datasets are read along their first dimension in blocks of whole
+    HDF5 chunks, with read_direct into one preallocated buffer which is
+    reused for every block and every dataset. Each block is checked with
+    numpy reductions and then discarded, so memory use is bounded by the
+    buffer size however long the dataset is.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Create a new scanner.
+
+        :param buffer_size: Bytes in the read buffer. Grown if a single
+                            chunk, or row of a contiguous dataset, is larger
+        """
+        self._buffer = bytearray(buffer_size)
+        self.blocks_read = 0
+
+    def _rows_per_block(self, dataset):
+        row_bytes = dataset.dtype.itemsize * \
+            int(numpy.prod(dataset.shape[1:], dtype=numpy.int64))
+        step = dataset.chunks[0] if dataset.chunks else 1
+        rows = max(1, len(self._buffer) // max(1, row_bytes * step)) * step
+        rows = min(rows, dataset.shape[0])
+        if rows * row_bytes > len(self._buffer):
+            self._buffer = bytearray(rows * row_bytes)
+        return rows
+
+    def blocks(self, dataset):
+        """
+        Read [dataset] a block at a time.
+
+        :param dataset: The HDF5 dataset to read
+        :return: Generator of arrays, views of the shared buffer which are
+                 only valid until the next block is read
+        """
+        if dataset.shape == ():
+            yield numpy.asarray(dataset[()])
+            return
+        if not dataset.size:
+            return
+
+        rows = self._rows_per_block(dataset)
+        count = rows * int(numpy.prod(dataset.shape[1:], dtype=numpy.int64))
+        buffer = numpy.frombuffer(self._buffer, dtype=dataset.dtype,
+                                  count=count).reshape(
+                                      (rows,) + dataset.shape[1:])
+        for start in range(0, dataset.shape[0], rows):
+            stop = min(start + rows, dataset.shape[0])
+            dataset.read_direct(buffer, numpy.s_[start:stop],
+                                numpy.s_[0:stop - start])
+            self.blocks_read += 1
+            yield buffer[:stop - start]
+
+    def check(self, rules, dataset):
+        """
+        Check the values of [dataset] against [rules].
+
+        :param rules: The dataset schema holding CONTENT_RULES
+        :param dataset: The HDF5 dataset to check
+        :return: List of failures, as tuples of (kind, message, expected,
+                 actual)
+        """
+        if dataset.dtype.fields is not None or \
+                dataset.dtype.kind not in 'biufc':
+            scanned = [r for r in CONTENT_RULES
+                       if r in rules and r != 'non_empty']
+            if scanned:
+                return [("content", "Content rules {} need a numeric dataset"
+                         "".format(", ".join(scanned)), "numeric",
+                         dataset.dtype)]
+            return list(_Block(rules).failures(dataset.size))
+
+        state = _Block(rules)
+        if not any(r in rules for r in CONTENT_RULES if r != 'non_empty'):
+            return list(state.failures(dataset.size))
+        for block in self.blocks(dataset):
+            state.update(block)
+        return list(state.failures(dataset.size))
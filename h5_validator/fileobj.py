@@ -0,0 +1,328 @@
+"""File-like objects for validating files without a local copy."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+import io
+import logging
+
+from urllib.request import Request, urlopen
+
+logger = logging.getLogger("h5_validate.fileobj")
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+DEFAULT_CAPACITY = 256
+DEFAULT_READAHEAD = 1
+
+
+def is_url(filename):
+    """
+    Find if [filename] should be fetched over HTTP.
+
+    :param filename: A path or URL
+    :return: If [filename] is an http or https URL
+    """
+    return isinstance(filename, str) and \
+        filename.startswith(("http://", "https://"))
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    A read-only file served over HTTP, fetched with range requests.
+
+    Works with any server supporting byte ranges, including S3 compatible
+    object stores through pre-signed URLs.
+    """
+
+    def __init__(self, url, timeout=60):
+        """
+        Open a remote file.
+
+        :param url: The http or https URL of the file
+        :param timeout: Seconds to wait for each request
+        """
+        super(HTTPRangeFile, self).__init__()
+        self.url = url
+        self.timeout = timeout
+        self.requests = 0
+        self._position = 0
+
+        response = urlopen(Request(url, method="HEAD"), timeout=timeout)
+        with response:
+            self.size = int(response.headers["Content-Length"])
+
+    @property
+    def name(self):
+        """The URL of this file."""
+        return self.url
+
+    def readable(self):
+        """Find if this file can be read."""
+        return True
+
+    def seekable(self):
+        """Find if this file supports random access."""
+        return True
+
+    def tell(self):
+        """Find the current position in this file."""
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """Move to a new position in this file."""
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, buffer):
+        """
+        Read bytes at the current position into [buffer].
+
+        :param buffer: A writable buffer
+        :return: Number of bytes read
+        """
+        length = min(len(buffer), self.size - self._position)
+        if length <= 0:
+            return 0
+
+        request = Request(self.url, headers={
+            'Range': "bytes={}-{}".format(self._position,
+                                          self._position + length - 1)})
+        self.requests += 1
+        with urlopen(request, timeout=self.timeout) as response:
+            data = response.read()
+            if response.status != 206 and len(data) != length:
+                # The server ignored the range and sent the whole file
+                data = data[self._position:self._position + length]
+
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class FileSection(io.RawIOBase):
+    """A read-only view of a byte range of another seekable file."""
+
+    def __init__(self, fh, offset, size, name=None):
+        """
+        Create a new view.
+
+        :param fh: The seekable binary file to read from
+        :param offset: Position in [fh] where the view starts
+        :param size: Number of bytes in the view
+        :param name: Name to report for the view
+        """
+        super(FileSection, self).__init__()
+        self._fh = fh
+        self._offset = offset
+        self._size = size
+        self._position = 0
+        self._name = name
+
+    @property
+    def name(self):
+        """The name of this view."""
+        return self._name or repr(self)
+
+    def readable(self):
+        """Find if this file can be read."""
+        return True
+
+    def seekable(self):
+        """Find if this file supports random access."""
+        return True
+
+    def tell(self):
+        """Find the current position in this view."""
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """Move to a new position in this view."""
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, buffer):
+        """
+        Read bytes at the current position into [buffer].
+
+        :param buffer: A writable buffer
+        :return: Number of bytes read
+        """
+        view = memoryview(buffer).cast("B")
+        length = min(len(view), self._size - self._position)
+        if length <= 0:
+            return 0
+        self._fh.seek(self._offset + self._position)
+        count = self._fh.readinto(view[:length])
+        self._position += count
+        return count
+
+    def close(self):
+        """Close this view and the file it reads from."""
+        if not self.closed:
+            self._fh.close()
+        super(FileSection, self).close()
+
+
+class BlockCache(io.RawIOBase):
+    """
+    A read-only, block-aligned LRU cache over a seekable file-like object.
+
+    Reads are rounded out to whole blocks. On a miss, up to readahead
+    following blocks are fetched in the same read. Structural validation
+    only touches metadata, so usually only a small fraction of a file is
+    fetched; bytes_fetched and hit_rate report how much.
+    """
+
+    def __init__(self, raw, block_size=DEFAULT_BLOCK_SIZE,
+                 capacity=DEFAULT_CAPACITY, readahead=DEFAULT_READAHEAD):
+        """
+        Create a new cache.
+
+        :param raw: The seekable file-like object to read from
+        :param block_size: Bytes in each cached block
+        :param capacity: Maximum number of blocks held in the cache
+        :param readahead: Blocks to fetch after each missed block, up to
+                          capacity - 1
+        """
+        super(BlockCache, self).__init__()
+        if block_size <= 0 or capacity <= 0 or readahead < 0:
+            raise ValueError("Invalid block cache configuration")
+
+        self.raw = raw
+        self.block_size = block_size
+        self.capacity = capacity
+        self.readahead = readahead
+        self.bytes_fetched = 0
+        self.fetches = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._blocks = collections.OrderedDict()
+        self._position = 0
+        self._size = raw.seek(0, io.SEEK_END)
+
+    @property
+    def name(self):
+        """The name of the underlying file."""
+        return getattr(self.raw, "name", repr(self.raw))
+
+    @property
+    def hit_rate(self):
+        """Fraction of block lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """
+        Report how much of the file has been fetched.
+
+        :return: Dictionary of cache statistics
+        """
+        return {
+            'size': self._size,
+            'bytes_fetched': self.bytes_fetched,
+            'fetches': self.fetches,
+            'hit_rate': round(self.hit_rate, 4),
+        }
+
+    def close(self):
+        """Close this cache and the file it reads from."""
+        if not self.closed:
+            self._blocks.clear()
+            self.raw.close()
+        super(BlockCache, self).close()
+
+    def readable(self):
+        """Find if this file can be read."""
+        return True
+
+    def seekable(self):
+        """Find if this file supports random access."""
+        return True
+
+    def tell(self):
+        """Find the current position in this file."""
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """Move to a new position in this file."""
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(0, offset)
+        return self._position
+
+    def _fetch(self, index):
+        # Fetch [index] and any uncached blocks following it, in one read,
+        # fetching no more than the cache holds
+        count = 1
+        readahead = min(self.readahead, self.capacity - 1)
+        last_block = (self._size - 1) // self.block_size
+        while count <= readahead and index + count <= last_block and \
+                index + count not in self._blocks:
+            count += 1
+
+        self.raw.seek(index * self.block_size)
+        data = self.raw.read(count * self.block_size)
+        self.fetches += 1
+        self.bytes_fetched += len(data)
+
+        for i in range(count):
+            self._blocks[index + i] = \
+                data[i * self.block_size:(i + 1) * self.block_size]
+        while len(self._blocks) > self.capacity:
+            self._blocks.popitem(last=False)
+        return data[:self.block_size]
+
+    def _block(self, index):
+        block = self._blocks.get(index)
+        if block is None:
+            self.misses += 1
+            return self._fetch(index)
+        self.hits += 1
+        self._blocks.move_to_end(index)
+        return block
+
+    def readinto(self, buffer):
+        """
+        Read bytes at the current position into [buffer].
+
+        :param buffer: A writable buffer
+        :return: Number of bytes read
+        """
+        view = memoryview(buffer).cast("B")
+        length = min(len(view), self._size - self._position)
+        done = 0
+        while done < length:
+            index, offset = divmod(self._position, self.block_size)
+            block = self._block(index)
+            count = min(length - done, len(block) - offset)
+            if count <= 0:
+                break
+            view[done:done + count] = block[offset:offset + count]
+            done += count
+            self._position += count
+        return done
+
+
+def open_url(url, **cache_options):
+    """
+    Open a remote file for validation through a block cache.
+
+    :param url: The http or https URL of the file
+    :param cache_options: Options for the BlockCache
+    :return: A BlockCache over the remote file
+    """
+    return BlockCache(HTTPRangeFile(url), **cache_options)
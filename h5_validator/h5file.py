@@ -0,0 +1,220 @@
+"""Open HDF5 files with an I/O strategy suited to the storage they are on."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+import io
+import logging
+import os
+import h5py
+
+from h5_validator.archive import open_member, split_member
+from h5_validator.fileobj import is_url, open_url
+from h5_validator.precheck import check_superblock
+
+logger = logging.getLogger("h5_validate.h5file")
+
+IO_PROFILES = ('default', 'core', 'tuned', 'auto')
+
+# Files up to this size are read into memory by the 'auto' profile
+AUTO_CORE_LIMIT = 32 * 1024 * 1024
+
+# Settings used by the 'tuned' profile
+TUNED_PAGE_BUFFER = 4 * 1024 * 1024
+TUNED_CHUNK_CACHE = 16 * 1024 * 1024
+TUNED_METADATA_CACHE = 32 * 1024 * 1024
+
+# Files kept open by a FilePool
+DEFAULT_POOL_SIZE = 16
+
+
+def _size(source):
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    position = source.tell()
+    try:
+        return source.seek(0, io.SEEK_END)
+    finally:
+        source.seek(position)
+
+
+def open_source(filename, cache_options=None):
+    """
+    Find what to open for [filename].
+
+    :param filename: A path, an http(s) URL or an archive member name
+    :param cache_options: Options for the BlockCache used for URLs
+    :return: [filename] itself for plain paths, otherwise a seekable
+             file-like object which the caller should close
+    """
+    if is_url(filename):
+        return open_url(filename, **(cache_options or {}))
+    if split_member(filename):
+        return open_member(filename)
+    return filename
+
+
+def choose_profile(source):
+    """
+    Choose an I/O profile for [source] from its size.
+
+    :param source: Path or seekable file-like object
+    :return: 'core' for files up to AUTO_CORE_LIMIT bytes, otherwise 'tuned'
+    """
+    return 'core' if _size(source) <= AUTO_CORE_LIMIT else 'tuned'
+
+
+def _open_tuned(source):
+    kwargs = {'rdcc_nbytes': TUNED_CHUNK_CACHE}
+    try:
+        f = h5py.File(source, "r", page_buf_size=TUNED_PAGE_BUFFER, **kwargs)
+    except (OSError, ValueError):
+        # Some HDF5 versions refuse page buffering for files not written
+        # with the paged file space strategy
+        logger.debug("Page buffering unavailable for %s", source)
+        f = h5py.File(source, "r", **kwargs)
+
+    config = f.id.get_mdc_config()
+    config.set_initial_size = True
+    config.initial_size = TUNED_METADATA_CACHE
+    config.max_size = max(config.max_size, TUNED_METADATA_CACHE)
+    config.min_size = min(config.min_size, TUNED_METADATA_CACHE)
+    f.id.set_mdc_config(config)
+    return f
+
+
+def open_file(source, io_profile='default'):
+    """
+    Open an HDF5 file for reading using an I/O profile.
+
+    Profiles are:
+        default: HDF5's standard settings
+        core: read the whole file into memory with a single sequential read,
+              then validate without touching storage again
+        tuned: a larger metadata cache, chunk cache and page buffer, so
+               fewer small reads reach storage
+        auto: core for files up to AUTO_CORE_LIMIT bytes, otherwise tuned
+
+    :param source: Path or seekable file-like object to open
+    :param io_profile: One of IO_PROFILES
+    :return: An open h5py.File
+    """
+    if io_profile not in IO_PROFILES:
+        raise ValueError("Unknown I/O profile '{}', expected one of {}"
+                         "".format(io_profile, ", ".join(IO_PROFILES)))
+
+    if io_profile == 'auto':
+        io_profile = choose_profile(source)
+
+    if io_profile == 'core':
+        if isinstance(source, str):
+            return h5py.File(source, "r", driver="core", backing_store=False)
+        source.seek(0)
+        return h5py.File(io.BytesIO(source.read()), "r")
+
+    if io_profile == 'tuned':
+        return _open_tuned(source)
+
+    return h5py.File(source, "r")
+
+
+class FilePool():
+    """
+    Open HDF5 files, kept for reuse and closed least recently used first.
+
+    Validating the same files again, against several schemas or for
+    targeted paths, reuses each open file and its warm metadata cache
+    instead of reopening it. At most [capacity] files are open at once,
+    and every file is closed when the pool is.
+    """
+
+    def __init__(self, capacity=DEFAULT_POOL_SIZE, io_profile='default',
+                 cache_options=None):
+        """
+        Create an empty pool.
+
+        :param capacity: Maximum number of files kept open
+        :param io_profile: How to open files, one of IO_PROFILES
+        :param cache_options: Options for the BlockCache used for URLs
+        """
+        if capacity < 1:
+            raise ValueError("File pool capacity must be at least 1")
+        self.capacity = capacity
+        self.io_profile = io_profile
+        self.cache_options = cache_options
+        self.hits = 0
+        self.misses = 0
+        # (h5py.File, source) for each filename, least recently used first
+        self._files = collections.OrderedDict()
+
+    def __len__(self):
+        """Count the open files."""
+        return len(self._files)
+
+    def __contains__(self, filename):
+        """Find if [filename] is open in this pool."""
+        return filename in self._files
+
+    def open(self, filename):
+        """
+        Find the open file for [filename], opening it when needed.
+
+        :param filename: Path, http(s) URL or archive member name
+        :return: An open h5py.File, owned by the pool
+        :raises FileCheckError: If the file is truncated or not HDF5
+        """
+        entry = self._files.pop(filename, None)
+        if entry is not None and entry[0].id.valid:
+            self.hits += 1
+        else:
+            if entry is not None:
+                self._close(entry)
+            self.misses += 1
+            entry = self._open(filename)
+            while len(self._files) >= self.capacity:
+                self._close(self._files.popitem(last=False)[1])
+        self._files[filename] = entry
+        return entry[0]
+
+    def _open(self, filename):
+        source = open_source(filename, self.cache_options)
+        try:
+            check_superblock(source)
+            return open_file(source, self.io_profile), source
+        except BaseException:
+            if source is not filename:
+                source.close()
+            raise
+
+    @staticmethod
+    def _close(entry):
+        file, source = entry
+        file.close()
+        if not isinstance(source, str):
+            source.close()
+
+    def discard(self, filename):
+        """
+        Close [filename] if it is open, ie: after it was modified.
+
+        :param filename: The file to close
+        """
+        entry = self._files.pop(filename, None)
+        if entry is not None:
+            self._close(entry)
+
+    def close(self):
+        """Close every open file."""
+        while self._files:
+            self._close(self._files.popitem(last=False)[1])
+
+    def __enter__(self):
+        """Use the pool as a context manager."""
+        return self
+
+    def __exit__(self, *exc):
+        """Close every open file."""
+        self.close()
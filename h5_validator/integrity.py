@@ -0,0 +1,333 @@
+"""Check the stored chunks of datasets decode, without HDF5's read path."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+import logging
+import multiprocessing.pool
+import os
+import zlib
+
+import numpy
+
+try:
+    import lzf
+except ImportError:
+    # Optional, without it lzf chunks are read through HDF5
+    lzf = None
+
+try:
+    import blosc
+except ImportError:
+    # Optional, without it blosc chunks are read through HDF5
+    blosc = None
+
+logger = logging.getLogger("h5_validate.integrity")
+
+FILTER_DEFLATE = 1
+FILTER_SHUFFLE = 2
+FILTER_FLETCHER32 = 3
+FILTER_LZF = 32000
+FILTER_BLOSC = 32001
+
+DEFAULT_THREADS = min(4, os.cpu_count() or 1) \
+    if hasattr(os, "cpu_count") else 1
+DEFAULT_MAX_PENDING = 64 * 1024 * 1024
+
+
+class ChunkError(Exception):
+    """A stored chunk which does not decode to a whole chunk."""
+
+
+_weights = numpy.zeros(0)
+
+
+def _fletcher_weights(count):
+    # Positions of words modulo 65535, as floats so the dot product uses
+    # BLAS, shared between threads and only ever replaced by a longer copy
+    global _weights
+    weights = _weights
+    if len(weights) < count:
+        weights = numpy.arange(count, dtype=numpy.int64) % 65535
+        _weights = weights = weights.astype(numpy.float64)
+    return weights[:count]
+
+
+def fletcher32(data, block=1 << 20):
+    """
+    Compute the Fletcher-32 checksum HDF5 stores with each chunk.
+
+    :param data: The bytes to checksum
+    :param block: Words summed at once, small enough that sums of float
+                  products stay exact
+    :return: The checksum, as an int
+    """
+    data = numpy.frombuffer(data, dtype=numpy.uint8)
+    if len(data) % 2:
+        data = numpy.append(data, numpy.uint8(0))
+    words = data.view(">u2")
+    count = len(words)
+
+    # Word i is added to the second sum once for each word from it to the
+    # end, so sum2 = count * sum1 - sum(i * word[i])
+    sum1 = weighted = 0
+    for start in range(0, count, block):
+        part = words[start:start + block].astype(numpy.float64)
+        sum1 += int(part.sum())
+        weighted += int(numpy.dot(part, _fletcher_weights(len(part)))) + \
+            start % 65535 * int(part.sum())
+    if not sum1:
+        return 0
+
+    # HDF5 folds carries back in, giving 65535 rather than 0 for any
+    # non-zero multiple of 65535
+    sum2 = (count * sum1 - weighted) % 65535
+    return ((sum2 - 1) % 65535 + 1) << 16 | ((sum1 - 1) % 65535 + 1)
+
+
+def _check_fletcher32(data, values):
+    if len(data) < 4:
+        raise ChunkError("Chunk is too short to hold a checksum")
+    data = memoryview(data)
+    stored = int(numpy.frombuffer(data[-4:], dtype="<u4")[0])
+    computed = fletcher32(data[:-4])
+    # Files written by HDF5 1.6 swap the bytes of each half
+    swapped = ((computed & 0x00ff00ff) << 8) | ((computed >> 8) & 0x00ff00ff)
+    if stored not in (computed, swapped):
+        raise ChunkError("Checksum mismatch, stored {:08x} but data has "
+                         "{:08x}".format(stored, computed))
+    return data[:-4]
+
+
+def _inflate(data, values):
+    try:
+        return zlib.decompress(data)
+    except zlib.error as e:
+        raise ChunkError("Failed to inflate: {}".format(e))
+
+
+def _shuffled(data, values):
+    # Shuffling reorders bytes without changing their number and cannot
+    # fail, so the bytes are left shuffled
+    return data
+
+
+def _lzf_decompress(data, values, chunk_bytes):
+    try:
+        return lzf.decompress(bytes(data), chunk_bytes + 1)
+    except ValueError as e:
+        raise ChunkError("Failed to decompress lzf: {}".format(e))
+
+
+def _blosc_decompress(data, values):
+    try:
+        return blosc.decompress(bytes(data))
+    except Exception as e:
+        raise ChunkError("Failed to decompress blosc: {}".format(e))
+
+
+def _decoders():
+    decoders = {
+        FILTER_DEFLATE: _inflate,
+        FILTER_SHUFFLE: _shuffled,
+        FILTER_FLETCHER32: _check_fletcher32,
+    }
+    if lzf is not None:
+        decoders[FILTER_LZF] = _lzf_decompress
+    if blosc is not None:
+        decoders[FILTER_BLOSC] = _blosc_decompress
+    return decoders
+
+
+# Filters this module can decode, by HDF5 filter code
+DECODERS = _decoders()
+
+
+def filter_pipeline(dataset):
+    """
+    Find the filters applied to the chunks of [dataset].
+
+    :param dataset: An HDF5 dataset
+    :return: List of (code, values) tuples, in the order they are applied
+             when writing
+    """
+    plist = dataset.id.get_create_plist()
+    return [plist.get_filter(i)[:3:2] for i in range(plist.get_nfilters())]
+
+
+def decode_chunk(pipeline, filter_mask, data, chunk_bytes):
+    """
+    Undo the filters applied to a stored chunk.
+
+    Checksums are verified and compression undone. Shuffled bytes are
+    not put back in order, as only the size of the result is checked.
+
+    :param pipeline: The filters of the dataset, from filter_pipeline
+    :param filter_mask: The chunk's mask, each bit set skips a filter
+    :param data: The stored bytes of the chunk
+    :param chunk_bytes: Size of a whole chunk once decoded
+    :return: The decoded bytes
+    """
+    for i in reversed(range(len(pipeline))):
+        if filter_mask & (1 << i):
+            continue
+        code, values = pipeline[i]
+        if code == FILTER_LZF:
+            data = DECODERS[code](data, values, chunk_bytes)
+        else:
+            data = DECODERS[code](data, values)
+    if len(data) != chunk_bytes:
+        raise ChunkError("Decoded to {} bytes, expected {}".format(
+            len(data), chunk_bytes))
+    return data
+
+
+def _check_chunk(pipeline, filter_mask, data, chunk_bytes):
+    # Run in the thread pool, zlib and numpy release the GIL while working
+    try:
+        decode_chunk(pipeline, filter_mask, data, chunk_bytes)
+    except ChunkError as e:
+        return str(e)
+    except Exception as e:
+        return "Failed to decode: {}".format(e)
+    return None
+
+
+def chunk_infos(dataset):
+    """
+    List the stored chunks of [dataset].
+
+    Uses a single pass over the chunk index where HDF5 supports it, as
+    looking chunks up by number walks the index from its start each time.
+
+    :param dataset: A chunked HDF5 dataset
+    :return: List of StoreInfo tuples of (chunk_offset, filter_mask,
+             byte_offset, size)
+    """
+    dsid = dataset.id
+    infos = []
+    if hasattr(dsid, "chunk_iter"):
+        try:
+            dsid.chunk_iter(infos.append)
+            return infos
+        except (AttributeError, NotImplementedError, RuntimeError):
+            # h5py built against an HDF5 without H5Dchunk_iter
+            del infos[:]
+    return [dsid.get_chunk_info(i) for i in range(dsid.get_num_chunks())]
+
+
+_pool = None
+_pool_key = None
+
+
+def _thread_pool(threads):
+    # Shared between scanners, and recreated in forked batch workers as
+    # the threads of a pool do not survive a fork
+    global _pool, _pool_key
+    if _pool_key != (os.getpid(), threads):
+        if _pool_key is not None and _pool_key[0] == os.getpid():
+            # Only a pool of this process has threads to stop
+            _pool.terminate()
+            _pool.join()
+        _pool = multiprocessing.pool.ThreadPool(threads)
+        _pool_key = (os.getpid(), threads)
+    return _pool
+
+
+class ChunkScanner():
+    """
+    Checks every stored chunk of datasets can be decoded.
+
+    Chunks are enumerated through the chunk index and their stored bytes
+    read with read_direct_chunk, bypassing HDF5's filter pipeline and
+    chunk cache. Chunks are handed to a pool of threads as they are read,
+    where they are decompressed and checksummed in parallel, with at most
+    max_pending bytes waiting. Chunks using a filter without a decoder
+    here are read through HDF5 instead, one at a time.
+    """
+
+    def __init__(self, threads=None, max_pending=DEFAULT_MAX_PENDING):
+        """
+        Create a new scanner.
+
+        :param threads: Threads decoding chunks, defaults to DEFAULT_THREADS
+        :param max_pending: Stored bytes read ahead of the decoding threads
+        """
+        self.threads = threads or DEFAULT_THREADS
+        self.max_pending = max_pending
+        self.chunks_read = 0
+
+    def scan(self, dataset):
+        """
+        Check every stored chunk of [dataset].
+
+        :param dataset: The HDF5 dataset to check
+        :return: List of failures, as tuples of (chunk_offset, message)
+        """
+        if dataset.chunks is None:
+            return []
+
+        pipeline = filter_pipeline(dataset)
+        chunk_bytes = dataset.id.get_type().get_size() * \
+            int(numpy.prod(dataset.chunks, dtype=numpy.int64))
+        file_size = dataset.file.id.get_filesize()
+        pool = _thread_pool(self.threads)
+        undecodable = [code for code, values in pipeline
+                       if code not in DECODERS]
+        if undecodable:
+            logger.debug("Reading chunks of %s through HDF5, no decoder "
+                         "for filters %s", dataset.name, undecodable)
+
+        failures = []
+        pending = collections.deque()
+        pending_bytes = 0
+        for info in chunk_infos(dataset):
+            offset = tuple(info.chunk_offset)
+            self.chunks_read += 1
+            if info.byte_offset is None or \
+                    info.byte_offset + info.size > file_size:
+                failures.append((offset, "Chunk ends beyond the end of "
+                                         "the file"))
+                continue
+
+            if undecodable:
+                failures.extend(self._read_through_hdf5(dataset, offset))
+                continue
+
+            try:
+                filter_mask, data = dataset.id.read_direct_chunk(offset)
+            except (IOError, OSError, RuntimeError) as e:
+                failures.append((offset, "Failed to read: {}".format(e)))
+                continue
+
+            pending.append((offset, len(data), pool.apply_async(
+                _check_chunk, (pipeline, filter_mask, data, chunk_bytes))))
+            pending_bytes += len(data)
+            while pending_bytes > self.max_pending:
+                pending_bytes -= self._collect(pending, failures)
+
+        while pending:
+            self._collect(pending, failures)
+        return sorted(failures)
+
+    @staticmethod
+    def _collect(pending, failures):
+        offset, size, result = pending.popleft()
+        error = result.get()
+        if error is not None:
+            failures.append((offset, error))
+        return size
+
+    @staticmethod
+    def _read_through_hdf5(dataset, offset):
+        selection = tuple(slice(start, min(start + size, length))
+                          for start, size, length in
+                          zip(offset, dataset.chunks, dataset.shape))
+        try:
+            dataset[selection]
+        except (IOError, OSError, RuntimeError, ValueError) as e:
+            return [(offset, "Failed to read: {}".format(e))]
+        return []
@@ -0,0 +1,150 @@
+"""Inventories of what files hold, gathered while they are validated."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+import csv
+
+import numpy
+
+# Columns of the table written by write_inventory_table
+INVENTORY_COLUMNS = ('filename', 'schema_path', 'field', 'value')
+
+
+def _value(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    if isinstance(value, numpy.generic):
+        return value.item()
+    if isinstance(value, numpy.ndarray):
+        return str(value.tolist())
+    return value
+
+
+class Inventory():
+    """
+    What a file holds, by schema node.
+
+    Validator fills an inventory as it walks the file, so counting reads,
+    summing signal lengths or collecting run ids needs no second pass.
+    For each schema node it keeps the number of objects matched, for
+    datasets their total elements, bytes and range of lengths, and for
+    each selected attribute name a count of each value seen.
+    """
+
+    def __init__(self, attributes=()):
+        """
+        Create an empty inventory.
+
+        :param attributes: Names of attributes whose values are collected,
+                           ie: ['run_id', 'flow_cell_id']
+        """
+        self.attributes = frozenset(attributes)
+        self.nodes = collections.OrderedDict()
+        self.values = collections.OrderedDict()
+
+    def _node(self, schema_path):
+        node = self.nodes.get(schema_path)
+        if node is None:
+            node = self.nodes[schema_path] = collections.OrderedDict(
+                matched=0)
+        return node
+
+    def count(self, schema_path, matched):
+        """
+        Count objects matched by a schema node.
+
+        :param schema_path: The schema node, ie: 'file/read_.*/Raw'
+        :param matched: Objects the node's matcher accepted in one group
+        """
+        self._node(schema_path)['matched'] += matched
+
+    def add_dataset(self, schema_path, dataset):
+        """
+        Include a dataset's size, from its metadata.
+
+        :param schema_path: The schema node matching the dataset
+        :param dataset: The HDF5 dataset
+        """
+        node = self._node(schema_path)
+        length = dataset.shape[0] if dataset.shape else 1
+        if 'elements' not in node:
+            node.update(elements=0, bytes=0, min_length=length,
+                        max_length=length)
+        node['elements'] += dataset.size
+        node['bytes'] += dataset.size * dataset.dtype.itemsize
+        node['min_length'] = min(node['min_length'], length)
+        node['max_length'] = max(node['max_length'], length)
+
+    def add_attributes(self, schema_path, attrs):
+        """
+        Collect the values of the selected attributes of a group.
+
+        :param schema_path: The schema node matching the group
+        :param attrs: Dictionary of the group's attributes
+        """
+        for name in self.attributes.intersection(attrs):
+            key = "{}@{}".format(schema_path, name)
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = collections.Counter()
+            counts[_value(attrs[name])] += 1
+
+    def to_dict(self):
+        """
+        Convert this inventory to plain data.
+
+        :return: Dictionary with 'nodes', mapping schema paths to their
+                 counts and sizes, and 'attributes', mapping
+                 'schema_path@name' to the number of times each value was
+                 seen
+        """
+        return {
+            'nodes': {path: dict(node) for path, node in self.nodes.items()},
+            'attributes': {key: {str(value): count
+                                 for value, count in counts.items()}
+                           for key, counts in self.values.items()},
+        }
+
+
+def inventory_rows(result):
+    """
+    Flatten the inventory of a result into table rows.
+
+    :param result: A result dictionary with an 'inventory' key
+    :return: Generator of (filename, schema_path, field, value) tuples,
+             attribute values having the field 'value:<value>' and their
+             count as the value
+    """
+    inventory = result.get('inventory') or {}
+    filename = result['filename']
+    for path, node in sorted(inventory.get('nodes', {}).items()):
+        for field, value in sorted(node.items()):
+            yield filename, path, field, value
+    for key, counts in sorted(inventory.get('attributes', {}).items()):
+        for value, count in sorted(counts.items()):
+            yield filename, key, "value:" + value, count
+
+
+def write_inventory_table(results, stream):
+    """
+    Write the inventories of results as one tab separated table.
+
+    The table has a row for each field of each schema node of each file,
+    so it can be loaded as columns and filtered or grouped by any of them.
+
+    :param results: Iterable of result dictionaries
+    :param stream: Text stream to write to
+    :return: Number of rows written
+    """
+    writer = csv.writer(stream, delimiter="\t", lineterminator="\n")
+    writer.writerow(INVENTORY_COLUMNS)
+    rows = 0
+    for result in results:
+        for row in inventory_rows(result):
+            writer.writerow(row)
+            rows += 1
+    return rows
@@ -74,7 +74,7 @@ class KeyMatcher():
 
         return True
 
-    def try_match(self, obj, name=None, type=None):
+    def try_match(self, obj, name=None, type=None, name_matched=False):
         """
         Try to match this key against this matcher.
 
@@ -83,6 +83,9 @@ class KeyMatcher():
                      accessible on [obj] (ie: an attribute)
         :param type: A forcible type for the attribute, if the type
                      is not accessible (ie: an attribute)
+        :param name_matched: If the name is already known to match, for
+                             example by a NameClassifier, so only the
+                             type and count are checked
         :return: If the match was successful
         """
         full_name = name
@@ -120,7 +123,9 @@ class KeyMatcher():
 
         name_type = self.data.get("name_type", "exact")
 
-        if name_type == "exact":
+        if name_matched:
+            accepted = True
+        elif name_type == "exact":
             accepted = name == self.data["name"]
         elif name_type == "regex":
             regex = re.compile(self.data["name"])
@@ -148,6 +153,234 @@ class KeyMatcher():
                     self.count)
 
 
+# Schema sections holding each type of KeyMatcher
+MATCHER_TYPES = (
+    ("groups", "group"),
+    ("attributes", "attribute"),
+    ("datasets", "dataset"),
+)
+
+
+def build_key_matchers(level):
+    """
+    Create KeyMatchers for each group, attribute and dataset of a level.
+
+    :param level: A group in the schema
+    :return: List of KeyMatchers, in schema order
+    """
+    matchers = []
+    for section, type in MATCHER_TYPES:
+        items = level.get(section, {})
+        for k in items:
+            data = {}
+            if items[k] is None:
+                raise Exception("Found empty element at {}".format(k))
+            if isinstance(items[k], dict):
+                data = dict(items[k])
+            data["name"] = k
+            data["type"] = type
+            matchers.append(KeyMatcher(items[k], **data))
+    return matchers
+
+
+def literal_prefix(pattern):
+    """
+    Find the literal text every match of a regex must start with.
+
+    :param pattern: A regular expression, as used with re.match
+    :return: The longest prefix found, which may be empty
+    """
+    if "|" in pattern:
+        # Alternatives may start differently
+        return ""
+
+    prefix = []
+    i = 1 if pattern.startswith("^") else 0
+    while i < len(pattern):
+        c = pattern[i]
+        step = 1
+        if c == "\\":
+            c = pattern[i + 1:i + 2]
+            step = 2
+            if not c or c.isalnum():
+                # A character class, anchor or backreference
+                break
+        elif c in ".^$*+?{}[]()":
+            break
+        if pattern[i + step:i + step + 1] in ("*", "?", "{"):
+            # The character may be repeated zero times
+            break
+        prefix.append(c)
+        i += step
+    return "".join(prefix)
+
+
+def names_may_overlap(a, b):
+    """
+    Find if one name could be accepted by the name patterns of two matchers.
+
+    Exact names overlap if they are equal, or if a regex accepts them.
+    Two regexes are proven disjoint only when their literal prefixes
+    differ; otherwise they are assumed to overlap.
+
+    :param a: The first KeyMatcher
+    :param b: The second KeyMatcher
+    :return: False if no name can be accepted by both
+    """
+    exact = [m.data["name"] for m in (a, b)
+             if m.data.get("name_type", "exact") == "exact"]
+    regex = [m.data["name"] for m in (a, b)
+             if m.data.get("name_type", "exact") == "regex"]
+    if len(exact) == 2:
+        return exact[0] == exact[1]
+    if len(regex) == 1:
+        return re.match(regex[0], exact[0]) is not None
+
+    first, second = [literal_prefix(r) for r in regex]
+    return first.startswith(second) or second.startswith(first)
+
+
+def may_overlap(a, b):
+    """
+    Find if one object could be accepted by two matchers.
+
+    :param a: The first KeyMatcher
+    :param b: The second KeyMatcher
+    :return: False if the matchers are proven mutually exclusive
+    """
+    if a.data.get("type", "group") != b.data.get("type", "group"):
+        return False
+    return names_may_overlap(a, b)
+
+
+def overlapping_matchers(matchers):
+    """
+    Find the pairs of matchers which are not proven mutually exclusive.
+
+    :param matchers: KeyMatchers for one level of a schema
+    :return: List of (index, index) pairs into [matchers]
+    """
+    return [(i, j)
+            for i in range(len(matchers))
+            for j in range(i + 1, len(matchers))
+            if may_overlap(matchers[i], matchers[j])]
+
+
+# Patterns containing these can not be merged into a single expression:
+# backreferences and conditionals refer to groups by position or name,
+# and before python 3.11 inline flags anywhere apply to the whole
+# expression, so would apply to every merged pattern
+_UNMERGEABLE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(|\(\?[aiLmsux-]")
+
+
+class NameClassifier():
+    """
+    Classifies names against the name patterns of several KeyMatchers.
+
+    Exact names are found with a dictionary lookup, and the regex patterns
+    are merged into a single expression with one optional lookahead per
+    pattern, so each name is tested against every pattern in one scan.
+    A name may match any number of patterns.
+
+    When the patterns are proven to accept no name in common (see
+    names_may_overlap), they are instead merged into a plain alternation,
+    and the first pattern to match is the only one which can. Matchers of
+    different types are not exclusive by name, as a group and an attribute
+    may share one.
+    """
+
+    def __init__(self, matchers):
+        """
+        Compile a classifier for [matchers].
+
+        :param matchers: The KeyMatchers to classify names for
+        """
+        self.exclusive = not overlapping_matchers(matchers)
+        self._exact = {}
+        self._separate = []
+        merged = []
+        for index, matcher in enumerate(matchers):
+            name = matcher.data["name"]
+            name_type = matcher.data.get("name_type", "exact")
+            if name_type == "exact":
+                self._exact.setdefault(name, []).append(index)
+            elif name_type == "regex":
+                regex = re.compile(name)
+                if regex.groupindex or _UNMERGEABLE.search(name):
+                    self._separate.append((index, regex))
+                else:
+                    merged.append((index, name))
+            else:
+                raise Exception("Unknown name match type {}"
+                                .format(name_type))
+
+        self._merged = None
+        self._groups = []
+        self._alternation = False
+        if merged:
+            if not any(names_may_overlap(matchers[i], matchers[j])
+                       for n, (i, _) in enumerate(merged)
+                       for j, _ in merged[n + 1:]):
+                self._merged = re.compile("|".join(
+                    "(?P<m{}>{})".format(index, name)
+                    for index, name in merged))
+                self._alternation = True
+            else:
+                self._merged = re.compile("".join(
+                    "(?:(?=(?P<m{}>{}))|)".format(index, name)
+                    for index, name in merged))
+            self._groups = [(index, "m{}".format(index))
+                            for index, name in merged]
+
+    def classify(self, name):
+        """
+        Find the matchers whose name pattern accepts [name].
+
+        :param name: The leaf name of an object or attribute
+        :return: Sorted list of indices into the matchers classified
+        """
+        indices = list(self._exact.get(name, ()))
+        if self._alternation:
+            match = self._merged.match(name)
+            if match is not None:
+                indices.append(int(match.lastgroup[1:]))
+        elif self._merged is not None:
+            groups = self._merged.match(name)
+            indices.extend(index for index, group in self._groups
+                           if groups.group(group) is not None)
+        indices.extend(index for index, regex in self._separate
+                       if regex.match(name) is not None)
+        indices.sort()
+        return indices
+
+
+def field_dtype(field):
+    """
+    Find the numpy dtype of a field.
+
+    :param field: Tuple of (name, type), the type as a dtype string or a
+                  tuple starting with one
+    :return: The numpy dtype
+    """
+    type = field[1]
+    if not isinstance(type, str):
+        type = type[0]
+    return numpy.dtype(type)
+
+
+def dtype_fields(dtype):
+    """
+    List the fields of a dataset's dtype, as FieldMatchers expect them.
+
+    :param dtype: The numpy dtype of a dataset
+    :return: List of (name, dtype string) tuples, a single one named ''
+             for dtypes which are not compound
+    """
+    if dtype.fields is None:
+        return [('', dtype.str)]
+    return [(name, field[0].str) for name, field in dtype.fields.items()]
+
+
 class FieldMatcher():
     """
     FieldMatcher tests if a field correctly meets a schema definition.
@@ -237,22 +470,7 @@ class FieldMatcher():
                                         field, self)
                 return False
 
-        type = field[1]
-        if not isinstance(type, str):
-            type = type[0]
-        act_type = numpy.dtype(type)
-
-        is_varlen_string_exc = act_type == "object" and self._type == "S"
-        is_string_length_mismatch_exc = False
-        if (self._type == "S"):
-            type_as_str = str(act_type)
-            if len(type_as_str) > 1:
-                # String checking should just check string are strings, ignore
-                # length.
-                is_string_length_mismatch_exc = type_as_str[1] == "S"
-        is_exception = is_varlen_string_exc or is_string_length_mismatch_exc
-
-        if act_type != self._type and not is_exception:
+        if not self.matches_type(field_dtype(field)):
             self.error_logger.debug("Not matching %s, matcher %s"
                                     " failed to find type",
                                     field, self)
@@ -261,6 +479,23 @@ class FieldMatcher():
         self._matched = True
         return True
 
+    def matches_type(self, act_type):
+        """
+        Find if a field of type [act_type] has this matcher's type.
+
+        :param act_type: The numpy dtype of the field
+        :return: If the types match, strings of any length matching 'S'
+        """
+        if act_type == self._type:
+            return True
+        if self._type != "S":
+            return False
+        # String checking should just check string are strings, ignore
+        # length, and accept variable length strings
+        type_as_str = str(act_type)
+        return act_type == "object" or \
+            (len(type_as_str) > 1 and type_as_str[1] == "S")
+
     def __str__(self):
         """Format this matcher as a string."""
         return "<'{}' type={} optional={}>" \
@@ -269,6 +504,72 @@ class FieldMatcher():
                     self._is_optional)
 
 
+class FieldTable():
+    """
+    The field matchers of a dataset schema, compiled once.
+
+    Matchers are indexed by field name with their dtypes already parsed,
+    so each field is only compared with the matchers which name it, or
+    accept any name. The outcome for each distinct dataset dtype is
+    memoised, so datasets sharing a layout, such as the event tables of
+    every read, are checked with one dictionary lookup.
+    """
+
+    def __init__(self, datatype):
+        """
+        Compile the field matchers of a dataset schema.
+
+        :param datatype: The dataset's 'datatype', as accepted by
+                         FieldMatcher.expand_field_matchers
+        """
+        self.matchers = FieldMatcher.expand_field_matchers(datatype)
+        self._named = {}
+        self._unnamed = []
+        for index, m in enumerate(self.matchers):
+            if m._name:
+                self._named.setdefault(m._name, []).append(index)
+            else:
+                self._unnamed.append(index)
+        self._verdicts = {}
+
+    def check(self, dtype):
+        """
+        Match the fields of a dataset's dtype against the matchers.
+
+        Gives the same outcome as trying every matcher which can accept
+        more against each field in turn.
+
+        :param dtype: The numpy dtype of the dataset
+        :return: Tuple of (fields, matchers), the fields which no matcher
+                 accepted and the matchers left unsatisfied
+        """
+        verdict = self._verdicts.get(dtype)
+        if verdict is None:
+            verdict = self._verdicts[dtype] = self._check(dtype)
+        return verdict
+
+    def _check(self, dtype):
+        matched = [False] * len(self.matchers)
+        unexpected = []
+        for field in dtype_fields(dtype):
+            act_type = field_dtype(field)
+            candidates = self._named.get(field[0], [])
+            if self._unnamed:
+                candidates = sorted(candidates + self._unnamed)
+
+            found = False
+            for index in candidates:
+                if not matched[index] and \
+                        self.matchers[index].matches_type(act_type):
+                    matched[index] = found = True
+            if not found:
+                unexpected.append(field)
+
+        unsatisfied = [m for index, m in enumerate(self.matchers)
+                       if not matched[index] and not m._is_optional]
+        return tuple(unexpected), tuple(unsatisfied)
+
+
 class AttributeMatcher():
     """
     AttributeMatcher tests if an attribute correctly meets a schema definition.
@@ -279,8 +580,17 @@ class AttributeMatcher():
     def __init__(self, obj):
         """Create a new attribute matcher from schema data."""
         self._type = obj
+        self._minimum = None
+        self._maximum = None
         if not isinstance(obj, str):
             self._type = obj['datatype']
+            self._minimum = obj.get('minimum')
+            self._maximum = obj.get('maximum')
+
+    @property
+    def has_range(self):
+        """Find if this matcher limits the values of attributes."""
+        return self._minimum is not None or self._maximum is not None
 
     def try_match(self, obj):
         """
@@ -295,3 +605,51 @@ class AttributeMatcher():
             return True
         except ValueError:
             return False
+
+    def in_range(self, obj):
+        """
+        Find if [obj] is within this matcher's minimum and maximum.
+
+        :param obj: An attribute which matches this matcher's type
+        :return: If [obj] is in range, or this matcher has no range
+        """
+        return bool(self._range_mask(
+            numpy.array([obj], dtype='S').astype(self._type))[0])
+
+    def _range_mask(self, values):
+        mask = numpy.ones(len(values), dtype=bool)
+        if self._minimum is not None:
+            mask &= values >= self._minimum
+        if self._maximum is not None:
+            mask &= values <= self._maximum
+        return mask
+
+    def match_column(self, values):
+        """
+        Attempt to match this matcher against many attributes at once.
+
+        The values are converted to one array and cast in a single
+        operation. Only if that fails is each value tried on its own, to
+        find which failed.
+
+        :param values: List of scalar attributes
+        :return: Tuple of boolean arrays (type_matched, in_range), True for
+                 each value which matches this matcher's type, and each
+                 value which also is within its range
+        """
+        column = numpy.array(values, dtype='S')
+        try:
+            cast = column.astype(self._type)
+            matched = numpy.ones(len(values), dtype=bool)
+        except ValueError:
+            matched = numpy.array([self.try_match(v) for v in values],
+                                  dtype=bool)
+            cast = column[matched].astype(self._type)
+
+        in_range = numpy.zeros(len(values), dtype=bool)
+        in_range[matched] = self._range_mask(cast)
+        return matched, in_range
+
+    def __str__(self):
+        """Format this matcher as a string."""
+        return "<type={}>".format(self._type)
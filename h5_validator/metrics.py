@@ -0,0 +1,327 @@
+"""Live metrics of long running validation, for Prometheus or StatsD."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import h5py
+
+logger = logging.getLogger("h5_validate.metrics")
+
+# Upper bounds of the file latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                   30.0, 60.0, 300.0)
+
+DEFAULT_INTERVAL = 10.0
+
+
+def count_reads(file):
+    """
+    Count the reads in a fast5 file.
+
+    :param file: An open HDF5 file
+    :return: The number of read_ groups of a multi-read file, or 1
+    """
+    return sum(1 for name in file if name.startswith("read_")) or 1
+
+
+def open_objects():
+    """
+    Count the HDF5 files, groups, datasets and attributes open in-process.
+
+    Datatypes are not counted, as h5py holds some open for its lifetime.
+
+    :return: Number of open HDF5 objects, which after every file has been
+             closed is the number leaked
+    """
+    return h5py.h5f.get_obj_count(
+        h5py.h5f.OBJ_ALL, h5py.h5f.OBJ_FILE | h5py.h5f.OBJ_GROUP |
+        h5py.h5f.OBJ_DATASET | h5py.h5f.OBJ_ATTR)
+
+
+class Metrics():
+    """
+    Counters, gauges and a latency histogram of validated files.
+
+    Results are observed as workers complete them, from the pool's
+    thread, while a background thread writes the metrics to each exporter
+    every [interval] seconds. Gauges are sampled from callables, so they
+    read the current queue depth or number of busy workers when written.
+    """
+
+    def __init__(self, exporters, interval=DEFAULT_INTERVAL):
+        """
+        Create new metrics.
+
+        :param exporters: Objects with observe(status, kinds, stats) and
+                          write(metrics, gauges) methods, such as
+                          PrometheusTextfile and StatsdExporter
+        :param interval: Seconds between writes to the exporters
+        """
+        self.exporters = list(exporters)
+        self.interval = interval
+        self.gauges = collections.OrderedDict()
+        self.started = time.time()
+        self.files = collections.Counter()
+        self.errors = collections.Counter()
+        self.reads = 0
+        self.metadata_bytes = 0
+        self.open_objects = 0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self._lock = threading.Lock()
+        self._last = (self.started, 0, 0)
+        self._rates = (0.0, 0.0)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def observe(self, result):
+        """
+        Count a validated file.
+
+        :param result: A result dictionary, with a 'metrics' key of
+                       'elapsed', 'reads', 'metadata_bytes' and
+                       'open_objects' when check_file measured it
+        """
+        stats = result.get('metrics', {})
+        kinds = collections.Counter()
+        for e in result.get('errors', []):
+            kinds[e.get('kind', 'error')] += e.get('count', 1)
+
+        with self._lock:
+            self.files[result['status']] += 1
+            self.errors.update(kinds)
+            self.reads += stats.get('reads', 0)
+            self.metadata_bytes += stats.get('metadata_bytes', 0)
+            if 'open_objects' in stats:
+                self.open_objects = stats['open_objects']
+            if 'elapsed' in stats:
+                self.latency_sum += stats['elapsed']
+                self.latency_count += 1
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    if stats['elapsed'] <= bound:
+                        self.latency_buckets[i] += 1
+                        break
+
+        for exporter in self.exporters:
+            try:
+                exporter.observe(result['status'], kinds, stats)
+            except (IOError, OSError) as e:
+                logger.warning("Failed to export metrics: %s", e)
+
+    def sample(self):
+        """
+        Read the gauges, and the rates since the previous sample.
+
+        :return: Dictionary of gauge values, including 'files_per_second'
+                 and 'reads_per_second'
+        """
+        now = time.time()
+        with self._lock:
+            files = sum(self.files.values())
+            then, last_files, last_reads = self._last
+            if now > then:
+                self._rates = ((files - last_files) / (now - then),
+                               (self.reads - last_reads) / (now - then))
+            self._last = (now, files, self.reads)
+            values = collections.OrderedDict([
+                ('uptime_seconds', now - self.started),
+                ('files_per_second', self._rates[0]),
+                ('reads_per_second', self._rates[1]),
+                ('open_hdf5_objects', self.open_objects),
+            ])
+        for name, read in self.gauges.items():
+            values[name] = read()
+        return values
+
+    def prometheus(self, gauges=None):
+        """
+        Format the metrics in the Prometheus text exposition format.
+
+        :param gauges: Gauge values from sample(), or None to sample now
+        :return: The metrics, as text
+        """
+        if gauges is None:
+            gauges = self.sample()
+        lines = []
+
+        def metric(name, type, help, samples):
+            lines.append("# HELP h5_validate_{} {}".format(name, help))
+            lines.append("# TYPE h5_validate_{} {}".format(name, type))
+            for labels, value in samples:
+                lines.append("h5_validate_{}{} {}".format(name, labels,
+                                                          value))
+
+        with self._lock:
+            metric("files_total", "counter", "Files validated, by status",
+                   [('{{status="{}"}}'.format(status), count)
+                    for status, count in sorted(self.files.items())])
+            metric("errors_total", "counter", "Validation errors, by kind",
+                   [('{{kind="{}"}}'.format(kind), count)
+                    for kind, count in sorted(self.errors.items())])
+            metric("reads_total", "counter", "Reads in validated files",
+                   [("", self.reads)])
+            metric("metadata_bytes_total", "counter",
+                   "Bytes read for validation, or held in the metadata "
+                   "cache for local files", [("", self.metadata_bytes)])
+
+            buckets, total = [], 0
+            for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+                total += count
+                buckets.append(('_bucket{{le="{}"}}'.format(bound), total))
+            buckets.append(('_bucket{le="+Inf"}', self.latency_count))
+            buckets.append(("_sum", round(self.latency_sum, 6)))
+            buckets.append(("_count", self.latency_count))
+            metric("file_duration_seconds", "histogram",
+                   "Seconds taken to validate each file", buckets)
+
+        for name, value in gauges.items():
+            metric(name, "gauge", name.replace("_", " ").capitalize(),
+                   [("", round(value, 6))])
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """
+        Write the metrics to every exporter.
+
+        The gauges are sampled once, so every exporter is given the same
+        rates over the same interval.
+        """
+        gauges = self.sample()
+        for exporter in self.exporters:
+            try:
+                exporter.write(self, gauges)
+            except (IOError, OSError) as e:
+                logger.warning("Failed to export metrics: %s", e)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self):
+        """Start writing the metrics every interval."""
+        self._thread = threading.Thread(target=self._run,
+                                        name="h5_validate.metrics")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        """Stop writing the metrics, after writing them a last time."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.write()
+        for exporter in self.exporters:
+            exporter.close()
+
+
+class PrometheusTextfile():
+    """
+    Writes metrics to a file for the node exporter's textfile collector.
+
+    The file is replaced atomically, so it is never read half written.
+    """
+
+    def __init__(self, path):
+        """
+        Create a new exporter.
+
+        :param path: The file to write, ending in .prom
+        """
+        self.path = path
+
+    def observe(self, status, kinds, stats):
+        """Ignore a single file, the textfile is written periodically."""
+
+    def write(self, metrics, gauges):
+        """
+        Replace the file with the current metrics.
+
+        :param metrics: The Metrics to write
+        :param gauges: The gauge values sampled from [metrics]
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=".h5_validate.")
+        try:
+            with os.fdopen(fd, "w") as fh:
+                fh.write(metrics.prometheus(gauges))
+            # mkstemp creates the file readable only by its owner, but the
+            # node exporter usually runs as another user
+            os.chmod(temp, 0o644)
+            os.rename(temp, self.path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    def close(self):
+        """Nothing to release."""
+
+
+class StatsdExporter():
+    """
+    Pushes metrics to a StatsD daemon over UDP.
+
+    Counters and latencies are sent as each file completes, and gauges
+    every interval.
+    """
+
+    def __init__(self, address, prefix="h5_validate"):
+        """
+        Create a new exporter.
+
+        :param address: The daemon's 'host:port'
+        :param prefix: Prefix of every metric name
+        """
+        host, _, port = address.rpartition(":")
+        self.address = (host or "localhost", int(port))
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, lines):
+        if lines:
+            self._socket.sendto("\n".join(
+                "{}.{}".format(self.prefix, line) for line in lines)
+                .encode("utf-8"), self.address)
+
+    def observe(self, status, kinds, stats):
+        """
+        Send the counters and latency of one file.
+
+        :param status: The file's status
+        :param kinds: Counter of the file's error kinds
+        :param stats: The 'metrics' of the file's result
+        """
+        lines = ["files.{}:1|c".format(status)]
+        lines.extend("errors.{}:{}|c".format(kind, count)
+                     for kind, count in sorted(kinds.items()))
+        for name in ('reads', 'metadata_bytes'):
+            if stats.get(name):
+                lines.append("{}:{}|c".format(name, stats[name]))
+        if 'elapsed' in stats:
+            lines.append("file_duration:{:.3f}|ms".format(
+                stats['elapsed'] * 1000))
+        self._send(lines)
+
+    def write(self, metrics, gauges):
+        """
+        Send the current gauges.
+
+        :param metrics: The Metrics the gauges were sampled from
+        :param gauges: The gauge values sampled from [metrics]
+        """
+        self._send(["{}:{}|g".format(name, round(value, 6))
+                    for name, value in gauges.items()])
+
+    def close(self):
+        """Close the socket."""
+        self._socket.close()
@@ -0,0 +1,115 @@
+"""Cheap checks which reject broken files before HDF5 opens them."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import io
+import os
+import struct
+
+HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+
+# Byte offset of the first address field, for each superblock version
+_ADDRESS_OFFSETS = {0: 24, 1: 28, 2: 12, 3: 12}
+# Position of the end of file address among the address fields
+_EOF_ADDRESS_INDEX = 2
+# Offset of the 'size of offsets' field, for each superblock version
+_OFFSET_SIZE_OFFSETS = {0: 13, 1: 13, 2: 9, 3: 9}
+
+
+class FileCheckError(Exception):
+    """A file which is clearly not a readable HDF5 file."""
+
+    def __init__(self, kind, message):
+        """
+        Create new error.
+
+        :param kind: Either 'not_hdf5' or 'truncated'
+        :param message: Description of the problem
+        """
+        super(FileCheckError, self).__init__(message)
+        self.kind = kind
+
+
+def _find_superblock(fh, size):
+    # The superblock is at 0, or after a user block of 512, 1024, 2048... bytes
+    offset = 0
+    while offset + len(HDF5_SIGNATURE) <= size:
+        fh.seek(offset)
+        if fh.read(len(HDF5_SIGNATURE)) == HDF5_SIGNATURE:
+            return offset
+        offset = 512 if offset == 0 else offset * 2
+    return None
+
+
+def check_superblock(source):
+    """
+    Check [source] has an HDF5 superblock and is as long as it claims.
+
+    Only the signature and superblock are read. Files which pass may still
+    fail to open, but files which fail would certainly not open.
+
+    :param source: Path or seekable file-like object to check
+    :raises FileCheckError: If the file is not HDF5 or is truncated
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as fh:
+            return _check_superblock(fh, os.path.getsize(source))
+
+    position = source.tell()
+    try:
+        return _check_superblock(source, source.seek(0, io.SEEK_END))
+    finally:
+        source.seek(position)
+
+
+def _check_superblock(fh, size):
+    if size == 0:
+        raise FileCheckError("truncated", "File is empty")
+
+    superblock = _find_superblock(fh, size)
+    if superblock is None:
+        if size < len(HDF5_SIGNATURE):
+            raise FileCheckError(
+                "truncated",
+                "File is {} bytes, too short for an HDF5 signature"
+                "".format(size))
+        raise FileCheckError("not_hdf5", "No HDF5 signature found")
+
+    fh.seek(superblock + len(HDF5_SIGNATURE))
+    header = fh.read(1)
+    if not header:
+        raise FileCheckError("truncated", "Superblock is incomplete")
+    version = bytearray(header)[0]
+    if version not in _ADDRESS_OFFSETS:
+        # Leave newer superblock versions to the HDF5 library
+        return
+
+    fh.seek(superblock + _OFFSET_SIZE_OFFSETS[version])
+    offset_size = bytearray(fh.read(1) or b"\0")[0]
+    if offset_size not in (2, 4, 8):
+        raise FileCheckError(
+            "not_hdf5",
+            "Invalid superblock address size {}".format(offset_size))
+
+    fh.seek(superblock + _ADDRESS_OFFSETS[version])
+    count = _EOF_ADDRESS_INDEX + 1
+    addresses = fh.read(count * offset_size)
+    if len(addresses) < count * offset_size:
+        raise FileCheckError("truncated", "Superblock is incomplete")
+
+    # The stored end of file includes any user block, as HDF5 compares it
+    # directly with the file size when opening
+    eof = struct.unpack(
+        "<" + {2: "H", 4: "I", 8: "Q"}[offset_size] * count,
+        addresses)[_EOF_ADDRESS_INDEX]
+    if eof == 2 ** (8 * offset_size) - 1:
+        # Undefined address, nothing to compare against
+        return
+    if eof > size:
+        raise FileCheckError(
+            "truncated",
+            "File is {} bytes, but its superblock records {} bytes"
+            "".format(size, eof))
@@ -0,0 +1,127 @@
+"""Warm the page cache for files shortly before they are validated."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import logging
+import os
+import queue
+import threading
+
+from h5_validator.archive import split_member
+from h5_validator.fileobj import is_url
+
+logger = logging.getLogger("h5_validate.prefetch")
+
+# Size of reads used to warm the page cache where posix_fadvise is missing
+_READ_SIZE = 1024 * 1024
+
+
+def warm_file(filename):
+    """
+    Ask the operating system to start reading [filename] into memory.
+
+    Where available, posix_fadvise(WILLNEED) starts asynchronous readahead of
+    the whole file and returns immediately. Elsewhere the file is read
+    through once. URLs and archive members are left alone.
+
+    :param filename: Path of the file to warm
+    :return: If the file was warmed
+    """
+    if is_url(filename) or split_member(filename) or \
+            not os.path.isfile(filename):
+        return False
+
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        else:
+            while os.read(fd, _READ_SIZE):
+                pass
+    finally:
+        os.close(fd)
+    return True
+
+
+class _Failure():
+    def __init__(self, error):
+        self.error = error
+
+
+_DONE = object()
+
+
+class Prefetcher():
+    """
+    Iterate over filenames, warming each one ahead of its use.
+
+    A background thread takes filenames from the source iterable, warms the
+    page cache for each with warm_file, and hands them on in order through
+    a queue holding at most depth files. Reading the next files from
+    storage so overlaps validating the current ones, while the queue bounds
+    how much is read ahead of the consumer.
+    """
+
+    def __init__(self, filenames, depth, warm=warm_file):
+        """
+        Start prefetching.
+
+        :param filenames: Iterable of files, consumed by a background thread
+        :param depth: Maximum number of warmed files waiting to be used
+        :param warm: Called with each filename to warm it
+        """
+        if depth <= 0:
+            raise ValueError("Prefetch depth must be positive")
+        self._filenames = filenames
+        self._warm = warm
+        self._queue = queue.Queue(depth)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        name="h5_validate.prefetch")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self):
+        try:
+            for filename in self._filenames:
+                try:
+                    self._warm(filename)
+                except (IOError, OSError):
+                    # The file will be reported when it is validated
+                    logger.debug("Failed to prefetch %s", filename,
+                                 exc_info=True)
+                if not self._put(filename):
+                    return
+        except Exception as e:
+            self._put(_Failure(e))
+            return
+        self._put(_DONE)
+
+    def __iter__(self):
+        """Yield each filename once it has been warmed."""
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop prefetching further files."""
+        self._stopped.set()
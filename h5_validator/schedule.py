@@ -0,0 +1,241 @@
+"""Order and split batch work so the workers finish together."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+import logging
+import os
+
+import h5py
+
+from h5_validator.archive import split_member
+from h5_validator.fileobj import is_url
+
+logger = logging.getLogger("h5_validate.schedule")
+
+DEFAULT_SPLIT_SIZE = 1024 * 1024 * 1024
+
+# A file, or one part of it, to validate, and its estimated size in bytes
+Task = collections.namedtuple('Task', ['filename', 'part', 'size'])
+
+
+def file_size(filename):
+    """
+    Find the size of a file, without opening it.
+
+    :param filename: A path, URL or archive member name
+    :return: Size in bytes, or 0 for URLs, archive members and files which
+             cannot be found
+    """
+    if is_url(filename) or split_member(filename):
+        return 0
+    try:
+        return os.path.getsize(filename)
+    except (IOError, OSError):
+        return 0
+
+
+def has_constraints(level):
+    """
+    Find if a schema level, or any level below it, has constraints.
+
+    :param level: A group level of a schema
+    :return: If any level has 'constraints'
+    """
+    if 'constraints' in level:
+        return True
+    return any(isinstance(child, dict) and has_constraints(child)
+               for child in level.get('groups', {}).values())
+
+
+def _member_count(filename):
+    try:
+        with h5py.File(filename, "r") as f:
+            return len(f)
+    except (IOError, OSError):
+        # Validated whole, and reported unreadable by its worker
+        return 0
+
+
+def plan(filenames, schema, split_size=DEFAULT_SPLIT_SIZE):
+    """
+    Order files largest first, splitting the largest into parts.
+
+    Every file is stat'ed up front. Files larger than [split_size] are
+    split into parts of about [split_size] bytes, each a range of the
+    members of the root group, which any worker can take, so one huge
+    multi-read file does not leave a single worker busy while the others
+    are idle. Files are not split when the schema has constraints, as
+    constraints are only checked between the members of one part.
+
+    :param filenames: Iterable of files to validate
+    :param schema: The loaded Schema files are validated against
+    :param split_size: Bytes above which files are split, or None to not
+                       split files
+    :return: List of Tasks, largest first
+    """
+    splittable = split_size and not has_constraints(schema.data["file"])
+    tasks = []
+    for filename in filenames:
+        size = file_size(filename)
+        parts = 1
+        if splittable and size > split_size:
+            parts = min(_member_count(filename), -(-size // split_size))
+        if parts > 1:
+            logger.debug("Splitting %s into %d parts", filename, parts)
+            tasks.extend(Task(filename, (index, parts), size // parts)
+                         for index in range(parts))
+        else:
+            tasks.append(Task(filename, None, size))
+    tasks.sort(key=lambda task: -task.size)
+    return tasks
+
+
+def _merge_errors(errors, max_examples):
+    # Aggregated errors are merged into one group per key, as the
+    # Validator of a whole file would have kept them
+    groups = collections.OrderedDict()
+    merged = []
+    for error in errors:
+        if 'count' not in error:
+            merged.append(error)
+            continue
+        key = (error.get('schema_path'), error['kind'],
+               error.get('expected'), error.get('actual'))
+        group = groups.get(key)
+        if group is None:
+            groups[key] = dict(error, examples=list(error['examples']))
+            merged.append(groups[key])
+            continue
+        group['count'] += error['count']
+        group['examples'] = (group['examples'] +
+                             error['examples'])[:max_examples]
+    return merged
+
+
+def _merge_storage(parts):
+    paths = collections.OrderedDict()
+    for part in parts:
+        for path, totals in part['paths'].items():
+            merged = paths.setdefault(path, {'datasets': 0,
+                                             'logical_bytes': 0,
+                                             'stored_bytes': 0})
+            for key in merged:
+                merged[key] += totals[key]
+
+    def ratio(totals):
+        stored = totals['stored_bytes']
+        return round(totals['logical_bytes'] / stored, 3) if stored else None
+
+    for totals in paths.values():
+        totals['ratio'] = ratio(totals)
+    storage = {key: sum(totals[key] for totals in paths.values())
+               for key in ('datasets', 'logical_bytes', 'stored_bytes')}
+    storage['ratio'] = ratio(storage)
+    storage['paths'] = paths
+    return storage
+
+
+def _merge_inventory(parts):
+    nodes = collections.OrderedDict()
+    attributes = collections.OrderedDict()
+    for part in parts:
+        for path, node in part['nodes'].items():
+            merged = nodes.get(path)
+            if merged is None:
+                nodes[path] = dict(node)
+                continue
+            for key, value in node.items():
+                if key == 'min_length':
+                    merged[key] = min(merged.get(key, value), value)
+                elif key == 'max_length':
+                    merged[key] = max(merged.get(key, value), value)
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        for key, counts in part['attributes'].items():
+            attributes.setdefault(key, collections.Counter()).update(counts)
+    return {'nodes': nodes,
+            'attributes': {key: dict(counts)
+                           for key, counts in attributes.items()}}
+
+
+def _merge_metrics(parts):
+    # A file's elapsed time is the work of all its parts, and each part
+    # counts the reads of the whole file
+    metrics = {}
+    for part in parts:
+        for key, value in part.items():
+            if key in ('reads', 'open_objects'):
+                metrics[key] = max(metrics.get(key, 0), value)
+            else:
+                metrics[key] = metrics.get(key, 0) + value
+    return metrics
+
+
+def merge_results(results, max_examples=5):
+    """
+    Combine the results of the parts of a file into one result.
+
+    :param results: The result dictionaries of every part of one file
+    :param max_examples: HDF5 paths kept for each aggregated error, as
+                         given to the Validator
+    :return: A result dictionary, as check_file returns for a whole file
+    """
+    results = sorted(results, key=lambda result: result['part'][0])
+    failed = [r for r in results if r['status'] not in ('valid', 'invalid')]
+    if failed:
+        # A part which could not be validated fails the whole file
+        result = dict(failed[0])
+        index, count = result.pop('part')
+        error = dict(result['errors'][0])
+        error['error'] = "Part {} of {}: {}".format(index + 1, count,
+                                                    error['error'])
+        result['errors'] = [error] + result['errors'][1:]
+        return result
+
+    result = {
+        'filename': results[0]['filename'],
+        'error_count': sum(r['error_count'] for r in results),
+        'errors': _merge_errors((e for r in results for e in r['errors']),
+                                max_examples),
+    }
+    result['status'] = 'invalid' if result['error_count'] else 'valid'
+    if 'storage' in results[0]:
+        result['storage'] = _merge_storage(r['storage'] for r in results)
+    if 'inventory' in results[0]:
+        result['inventory'] = _merge_inventory(r['inventory']
+                                               for r in results)
+    if 'metrics' in results[0]:
+        result['metrics'] = _merge_metrics(r['metrics'] for r in results)
+    return result
+
+
+class PartCollector():
+    """Passes on results, combining the parts of split files."""
+
+    def __init__(self, callback):
+        """
+        Create a new collector.
+
+        :param callback: Called with each whole file's result
+        """
+        self._callback = callback
+        self._parts = {}
+
+    def add(self, result):
+        """
+        Pass on a result, or hold it until every part of its file is done.
+
+        :param result: A result dictionary, with a 'part' key for parts
+        """
+        if 'part' not in result:
+            self._callback(result)
+            return
+        parts = self._parts.setdefault(result['filename'], [])
+        parts.append(result)
+        if len(parts) == result['part'][1]:
+            del self._parts[result['filename']]
+            self._callback(merge_results(parts))
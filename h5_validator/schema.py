@@ -6,6 +6,7 @@ from __future__ import \
     absolute_import, \
     division
 
+import logging
 import yaml
 
 try:
@@ -14,6 +15,112 @@ except ImportError:
     # python 2 compatibility
     from urllib2 import urlopen
 
+from h5_validator.analysis import analyse_schema
+
+logger = logging.getLogger("h5_validate.schema")
+
+REF_PREFIX = "#/definitions/"
+
+
+def resolve_refs(data):
+    """
+    Replace references to definitions in a schema with the definitions.
+
+    Any node may be {'$ref': '#/definitions/<name>'}, naming an entry of
+    the schema's top level 'definitions'. Other keys beside '$ref' are
+    added to the definition, replacing its own, so a shared block can be
+    reused with, ie: a different count. Definitions may refer to others.
+
+    :param data: The loaded schema data
+    :return: The schema data without 'definitions', with every reference
+             replaced
+    :raises Exception: If a reference is unknown or refers to itself
+    """
+    definitions = data.get("definitions") or {}
+    resolved = {}
+    resolving = []
+
+    def definition(ref):
+        if not isinstance(ref, str) or not ref.startswith(REF_PREFIX):
+            raise Exception("Unsupported $ref '{}', expected '{}<name>'"
+                            "".format(ref, REF_PREFIX))
+        name = ref[len(REF_PREFIX):]
+        if name not in resolved:
+            if name not in definitions:
+                raise Exception("Unknown schema definition '{}'"
+                                "".format(name))
+            if name in resolving:
+                raise Exception("Schema definition '{}' refers to itself "
+                                "through {}".format(name,
+                                                    " -> ".join(resolving)))
+            resolving.append(name)
+            resolved[name] = resolve(definitions[name])
+            resolving.pop()
+        return resolved[name]
+
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                target = definition(node["$ref"])
+                if len(node) == 1:
+                    return target
+                if not isinstance(target, dict):
+                    raise Exception("Schema definition '{}' is not a mapping,"
+                                    " so other keys cannot be added to it"
+                                    "".format(node["$ref"]))
+                merged = dict(target)
+                merged.update((k, resolve(v)) for k, v in node.items()
+                              if k != "$ref")
+                return merged
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+
+    return resolve({k: v for k, v in data.items() if k != "definitions"})
+
+
+def share_subtrees(data):
+    """
+    Make structurally identical subtrees of a schema one shared object.
+
+    Validator compiles and caches matchers, classifiers and field tables
+    by schema node, so every use of a repeated block (from a definition,
+    or copied by hand) then shares one compiled node, and the schema is
+    held in memory once per distinct block. Subtrees are compared bottom
+    up, by their keys in order and the identity of their already shared
+    children, so each node is only visited once.
+
+    :param data: The schema data
+    :return: Equal schema data, with identical subtrees shared
+    """
+    nodes = {}
+
+    def share(node):
+        if isinstance(node, dict):
+            items = [(k, share(v)) for k, v in node.items()]
+            key = ("dict", tuple((k, _identity(v)) for k, v in items))
+            if key not in nodes:
+                nodes[key] = dict(items)
+            return nodes[key]
+        if isinstance(node, list):
+            items = [share(v) for v in node]
+            key = ("list", tuple(_identity(v) for v in items))
+            if key not in nodes:
+                nodes[key] = items
+            return nodes[key]
+        return node
+
+    return share(data)
+
+
+def _identity(value):
+    # Shared containers are identified by object, scalars by value and
+    # type, so 1, 1.0 and True stay distinct
+    if isinstance(value, (dict, list)):
+        return id(value)
+    return type(value), value
+
 
 class Schema():
     """An HDF5 schema object."""
@@ -23,15 +130,20 @@ class Schema():
         Create a new schema.
 
         The schema object can be provided directly, or a filename or URI can be
-        given.
+        given. References to 'definitions' are resolved, see resolve_refs,
+        and identical subtrees shared, see share_subtrees.
 
         :param uri: The URI to create from.
         """
         if isinstance(obj, str):
             # The schema given is some kind of handle which we try to open
-            self.data = self._get_schema_content(obj)
-        else:
-            self.data = obj
+            obj = self._get_schema_content(obj)
+        self.data = share_subtrees(resolve_refs(obj))
+
+        self.warnings = analyse_schema(self.data) \
+            if "file" in self.data else []
+        for warning in self.warnings:
+            logger.debug("%s", warning)
 
     def _get_schema_content(self, uri):
         try:
@@ -40,4 +152,4 @@ class Schema():
         except IOError:
             with urlopen(uri) as response:
                 contents = response.read()
-        return yaml.load(contents)
+        return yaml.load(contents, Loader=yaml.SafeLoader)
@@ -0,0 +1,189 @@
+"""Check how datasets are stored, from their creation property lists."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+
+import h5py
+
+from h5_validator.integrity import FILTER_SHUFFLE, filter_pipeline
+
+# Keys of the 'storage' dictionary of a dataset schema
+STORAGE_RULES = ('layout', 'chunks', 'filters', 'shuffle')
+
+LAYOUTS = {
+    h5py.h5d.COMPACT: 'compact',
+    h5py.h5d.CONTIGUOUS: 'contiguous',
+    h5py.h5d.CHUNKED: 'chunked',
+}
+if hasattr(h5py.h5d, 'VIRTUAL'):
+    LAYOUTS[h5py.h5d.VIRTUAL] = 'virtual'
+
+# Registered HDF5 filter codes, by the names accepted in schemas
+FILTERS = {
+    'gzip': 1,
+    'deflate': 1,
+    'shuffle': 2,
+    'fletcher32': 3,
+    'szip': 4,
+    'nbit': 5,
+    'scaleoffset': 6,
+    'lzf': 32000,
+    'blosc': 32001,
+    'bitshuffle': 32008,
+    'zstd': 32015,
+    'vbz': 32020,
+}
+
+
+def filter_code(filter):
+    """
+    Find the HDF5 filter code of a filter given in a schema.
+
+    :param filter: A filter name from FILTERS, or a filter code
+    :return: The filter code, as an int
+    """
+    if isinstance(filter, int) and not isinstance(filter, bool):
+        return filter
+    if filter not in FILTERS:
+        raise Exception("Unknown filter {}, expected a filter code or one "
+                        "of {}".format(filter, ", ".join(sorted(FILTERS))))
+    return FILTERS[filter]
+
+
+def _filter_name(code):
+    names = [name for name, c in sorted(FILTERS.items()) if c == code]
+    return names[0] if names else str(code)
+
+
+def check_storage(rules, dataset):
+    """
+    Check the storage properties of [dataset] against [rules].
+
+    Only the dataset's creation property list is read, never its data.
+    Rules are given under 'storage' in a dataset schema:
+        layout: compact, contiguous, chunked or virtual
+        chunks: {minimum: [...], maximum: [...]}, bounds of each chunk
+                dimension, null for no bound
+        filters: filter names or codes which must all be applied
+        shuffle: if the shuffle filter must, or must not, be applied
+
+    :param rules: The 'storage' dictionary of a dataset schema
+    :param dataset: The HDF5 dataset to check
+    :return: Generator of failures, as tuples of (kind, message, expected,
+             actual)
+    """
+    unknown = set(rules) - set(STORAGE_RULES)
+    if unknown:
+        raise Exception("Unknown storage rules {}, expected {}".format(
+            ", ".join(sorted(unknown)), ", ".join(STORAGE_RULES)))
+
+    plist = dataset.id.get_create_plist()
+    layout = LAYOUTS.get(plist.get_layout(), 'unknown')
+    if 'layout' in rules and rules['layout'] != layout:
+        yield ("storage_layout", "Invalid storage layout", rules['layout'],
+               layout)
+
+    if 'chunks' in rules:
+        chunks = dataset.chunks
+        if chunks is None:
+            yield ("storage_chunks", "Dataset is not chunked", "chunked",
+                   layout)
+        else:
+            for bound, outside in (('minimum', lambda c, b: c < b),
+                                   ('maximum', lambda c, b: c > b)):
+                limits = rules['chunks'].get(bound)
+                if limits is None:
+                    continue
+                if len(limits) != len(chunks) or any(
+                        b is not None and outside(c, b)
+                        for c, b in zip(chunks, limits)):
+                    yield ("storage_chunks",
+                           "Chunk shape outside {}".format(bound), limits,
+                           chunks)
+
+    codes = [code for code, values in filter_pipeline(dataset)]
+    if 'filters' in rules:
+        missing = [f for f in rules['filters']
+                   if filter_code(f) not in codes]
+        if missing:
+            yield ("storage_filters", "Missing filters {}".format(
+                ", ".join(str(f) for f in missing)), rules['filters'],
+                [_filter_name(code) for code in codes])
+
+    if 'shuffle' in rules and rules['shuffle'] != (FILTER_SHUFFLE in codes):
+        yield ("storage_shuffle", "Shuffle filter {}".format(
+            "missing" if rules['shuffle'] else "applied"), rules['shuffle'],
+            FILTER_SHUFFLE in codes)
+
+
+def _ratio(logical, stored):
+    return round(logical / stored, 3) if stored else None
+
+
+class StorageSummary():
+    """
+    Logical and stored bytes of the datasets validated in a file.
+
+    Totals are kept for each schema path, so the datasets of every read
+    in a multi-read file are summarised together. Sizes come from the
+    dataset's metadata, without reading any data.
+    """
+
+    def __init__(self):
+        """Create an empty summary."""
+        # Schema path: [datasets, logical bytes, stored bytes]
+        self.paths = collections.OrderedDict()
+
+    def add(self, schema_path, dataset):
+        """
+        Include a dataset in the summary.
+
+        :param schema_path: Where in the schema the dataset was matched
+        :param dataset: The HDF5 dataset
+        """
+        totals = self.paths.setdefault(schema_path, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += dataset.size * dataset.id.get_type().get_size()
+        totals[2] += dataset.id.get_storage_size()
+
+    def to_dict(self):
+        """
+        Convert this summary to plain data.
+
+        :return: Dictionary with 'datasets', 'logical_bytes',
+                 'stored_bytes' and 'ratio' keys, the ratio being logical
+                 over stored bytes, and the same for each schema path
+                 under 'paths'
+        """
+        paths = collections.OrderedDict()
+        for path, (count, logical, stored) in self.paths.items():
+            paths[path] = {
+                'datasets': count,
+                'logical_bytes': logical,
+                'stored_bytes': stored,
+                'ratio': _ratio(logical, stored),
+            }
+        logical = sum(p['logical_bytes'] for p in paths.values())
+        stored = sum(p['stored_bytes'] for p in paths.values())
+        return {
+            'datasets': sum(p['datasets'] for p in paths.values()),
+            'logical_bytes': logical,
+            'stored_bytes': stored,
+            'ratio': _ratio(logical, stored),
+            'paths': paths,
+        }
+
+    def __str__(self):
+        """Format this summary for reading."""
+        summary = self.to_dict()
+        lines = ["Stored {stored_bytes} bytes for {logical_bytes} bytes of "
+                 "data in {datasets} datasets, ratio {ratio}".format(
+                     **summary)]
+        for path, totals in summary['paths'].items():
+            lines.append("    {}: {stored_bytes} of {logical_bytes} bytes, "
+                         "ratio {ratio}".format(path, **totals))
+        return "\n".join(lines) + "\n"
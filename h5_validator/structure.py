@@ -0,0 +1,199 @@
+"""Group files by the structure of their HDF5 tree."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import collections
+import hashlib
+import logging
+
+import h5py
+
+from h5py import h5a, h5i, h5o
+
+from h5_validator.matcher import NameClassifier, build_key_matchers
+
+logger = logging.getLogger("h5_validate.structure")
+
+# Error kinds decided only by names, kinds, dataset datatypes and ranks,
+# which are the same for every file of a structure
+STRUCTURE_KINDS = frozenset(['missing_path', 'unexpected_member',
+                             'unexpected_attribute', 'unsatisfied_matcher',
+                             'unexpected_field', 'missing_field',
+                             'dimensions'])
+
+DEFAULT_MAX_CLASSES = 256
+
+
+def _dtype_key(dtype):
+    return repr((dtype.descr, h5py.check_string_dtype(dtype),
+                 h5py.check_vlen_dtype(dtype) is not None))
+
+
+def _member_key(level, name, classifiers):
+    # The key a member is hashed by, and the schema level it is matched
+    # against. Names only accepted by regex matchers, such as read_<uuid>,
+    # are hashed by the patterns accepting them, so files differing only
+    # in those names share a structure
+    if not isinstance(level, dict):
+        return name, None
+    cached = classifiers.get(id(level))
+    if cached is None or cached[0] is not level:
+        matchers = [m for m in build_key_matchers(level)
+                    if m.data["type"] != "attribute"]
+        cached = (level, matchers, NameClassifier(matchers))
+        classifiers[id(level)] = cached
+    _, matchers, classifier = cached
+
+    accepted = [matchers[i] for i in classifier.classify(
+        name.decode("utf-8", "surrogateescape"))]
+    if not accepted:
+        return name, None
+    if any(m.data.get("name_type", "exact") == "exact" for m in accepted):
+        key = name
+    else:
+        key = b"\0" + b"\0".join(m.data["name"].encode("utf-8")
+                                 for m in accepted)
+    # The last matcher accepting a member is used, as in validate_group
+    return key, accepted[-1].source
+
+
+def _object_digest(oid, path, level, classifiers):
+    # A node's digest covers its kind, attribute names and, for groups,
+    # the keys and digests of its members, so equal digests mean equal
+    # trees. Members are sorted by key and digest, and the paths of the
+    # subtree listed in the same order, so the objects at one index of
+    # two files of a structure correspond
+    h = hashlib.sha1()
+    names = []
+    h5a.iterate(oid, names.append)
+    h.update(b"@" + b"@".join(names) + b"\n")
+
+    paths = [path]
+    kind = h5i.get_type(oid)
+    if kind == h5i.DATASET:
+        h.update("dataset:{}:{}\n".format(_dtype_key(oid.dtype),
+                                          oid.rank).encode("utf-8"))
+    elif kind == h5i.GROUP:
+        h.update(b"group\n")
+        members = []
+        for name in oid:
+            key, child = _member_key(level, name, classifiers)
+            child_path = path.rstrip("/") + "/" + \
+                name.decode("utf-8", "surrogateescape")
+            try:
+                digest, child_paths = _object_digest(
+                    h5o.open(oid, name), child_path, child, classifiers)
+            except KeyError:
+                # A dangling link
+                digest, child_paths = b"missing", []
+            members.append((key, digest, name, child_paths))
+        members.sort()
+        for key, digest, name, child_paths in members:
+            h.update(key + b"\n" + digest)
+            paths.extend(child_paths)
+    else:
+        h.update("type:{}\n".format(kind).encode("utf-8"))
+    return h.digest(), paths
+
+
+def _structure(file, schema=None):
+    # The structure hash of [file], and the paths of its objects in the
+    # order of the hash
+    digest, paths = _object_digest(
+        h5o.open(file.id, b"/"), "/",
+        schema.data["file"] if schema is not None else None, {})
+    return hashlib.sha1(digest).hexdigest()[:16], paths
+
+
+def structure_hash(file, schema=None):
+    """
+    Find a hash of the structure of an HDF5 file, without its values.
+
+    The hash is a Merkle tree over the names and kinds of every object,
+    the names of their attributes, and the datatypes and ranks of
+    datasets. Dataset lengths and attribute values are not included.
+    Attribute datatypes are not included either: every attribute is
+    checked by value, and reading each attribute's type would cost as
+    much as the structural checks it saves.
+
+    Given a schema, groups and datasets whose names are only accepted by
+    regex matchers are hashed by those patterns instead of their names,
+    so single-read files with different read numbers, or multi-read files
+    with different read IDs, share a hash.
+
+    :param file: An open HDF5 file
+    :param schema: The Schema the file will be validated against, or None
+                   to hash every name
+    :return: The hash, as a hex string
+    """
+    return _structure(file, schema)[0]
+
+
+# The schema a structure was validated against, its recorded value checks,
+# the structural errors found in its first file, and that file's paths in
+# the order of the hash
+StructureClass = collections.namedtuple(
+    'StructureClass', ['schema', 'checks', 'errors', 'paths'])
+
+
+class StructureClasses():
+    """
+    Validate one file per structure in full, and the rest by value only.
+
+    Files are grouped by structure_hash. The first file of each structure
+    is validated in full, recording its value checks. Every later file of
+    the same structure is given that file's structural errors, and only
+    has its attribute values, dataset shapes, storage and contents and
+    constraints checked. Both are moved to the later file's objects, found
+    at the same place in the order of the hash. The classes seen are
+    kept, least recently used first, up to [max_classes].
+    """
+
+    def __init__(self, max_classes=DEFAULT_MAX_CLASSES):
+        """
+        Create an empty set of classes.
+
+        :param max_classes: Maximum number of structures remembered
+        """
+        self.max_classes = max_classes
+        self._classes = collections.OrderedDict()
+        self.full = 0
+        self.by_value = 0
+
+    def __len__(self):
+        """Count the structures remembered."""
+        return len(self._classes)
+
+    def validate(self, v, schema, file):
+        """
+        Validate a file, by value only if its structure was seen before.
+
+        :param v: A new Validator, created with record_values
+        :param schema: The schema to validate against
+        :param file: The HDF5 file to validate
+        :return: Tuple of the file's structure hash, its error dicts and
+                 its error count
+        """
+        key, paths = _structure(file, schema)
+        known = self._classes.pop(key, None)
+        if known is None or known.schema is not schema:
+            logger.debug("Validating structure %s in full", key)
+            self.full += 1
+            v.validate_file(schema, file)
+            known = StructureClass(
+                schema, v.value_checks,
+                [e for e in v.reported if e.kind in STRUCTURE_KINDS], paths)
+            self._classes[key] = known
+            while len(self._classes) > self.max_classes:
+                self._classes.popitem(last=False)
+            return key, v.error_dicts(), v.error_count
+
+        self.by_value += 1
+        self._classes[key] = known
+        moved = dict((a, b) for a, b in zip(known.paths, paths) if a != b)
+        v.replay_errors(known.errors, moved)
+        v.validate_values(known.checks, file, moved)
+        return key, v.error_dicts(), v.error_count
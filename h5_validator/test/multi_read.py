@@ -0,0 +1,69 @@
+"""Write synthetic multi-read fast5 files for tests and benchmarks."""
+import uuid
+import h5py as h5
+import numpy as np
+
+TRACKING_ID = {
+    "asic_id_eeprom": "1234",
+    "device_id": "MN12345",
+    "exp_script_name": "sequencing",
+    "exp_script_purpose": "sequencing_run",
+    "exp_start_time": "2019-01-01T00:00:00Z",
+    "flow_cell_id": "FAK12345",
+    "hostname": "host",
+    "protocol_run_id": "c0ffee",
+    "protocols_version": "4.0.0",
+    "run_id": "abcdef0123456789",
+    "version": "3.4.0",
+}
+
+
+def write_multi_read_file(path, reads=10, signal_length=1000, seed=0,
+                          file_options=None, **dataset_options):
+    """
+    Write a multi-read file matching schemas/multi_read_fast5.yaml.
+
+    :param path: The file to write
+    :param reads: Number of reads to write
+    :param signal_length: Number of samples in each read's signal
+    :param seed: Seed for read ids and signal values
+    :param file_options: Passed to h5py.File when creating the file
+    :param dataset_options: Passed to create_dataset for each Signal
+    :return: List of the read ids written
+    """
+    rng = np.random.RandomState(seed)
+    read_ids = []
+    with h5.File(path, "w", **(file_options or {})) as f:
+        f.attrs["file_version"] = np.bytes_("2.0")
+        for number in range(reads):
+            read_id = str(uuid.UUID(bytes=rng.bytes(16), version=4))
+            read_ids.append(read_id)
+
+            read = f.create_group("read_" + read_id)
+            read.attrs["run_id"] = np.bytes_(TRACKING_ID["run_id"])
+
+            tracking_id = read.create_group("tracking_id")
+            for key, value in TRACKING_ID.items():
+                tracking_id.attrs[key] = np.bytes_(value)
+            read.create_group("context_tags").attrs["experiment_kit"] = \
+                np.bytes_("genomic_dna")
+
+            channel_id = read.create_group("channel_id")
+            channel_id.attrs["digitisation"] = np.float64(8192)
+            channel_id.attrs["offset"] = np.float64(6)
+            channel_id.attrs["range"] = np.float64(1500.0)
+            channel_id.attrs["sampling_rate"] = np.float64(4000)
+            channel_id.attrs["channel_number"] = np.bytes_(str(number % 512))
+
+            raw = read.create_group("Raw")
+            raw.attrs["start_time"] = np.uint64(number * signal_length)
+            raw.attrs["duration"] = np.uint32(signal_length)
+            raw.attrs["read_number"] = np.int32(number)
+            raw.attrs["start_mux"] = np.uint8(1)
+            raw.attrs["read_id"] = np.bytes_(read_id)
+            raw.attrs["median_before"] = np.float64(200.0)
+            raw.create_dataset(
+                "Signal",
+                data=rng.randint(0, 1000, signal_length).astype(np.int16),
+                **dataset_options)
+    return read_ids
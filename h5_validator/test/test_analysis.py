@@ -0,0 +1,98 @@
+import os
+import unittest
+
+from h5_validator.analysis import analyse_schema
+from h5_validator.matcher import KeyMatcher, NameClassifier, \
+    build_key_matchers, literal_prefix, may_overlap
+from h5_validator.schema import Schema
+
+schemas = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..",
+                       "schemas")
+
+
+def matcher(name, type="group", name_type="exact"):
+    return KeyMatcher({}, name=name, type=type, name_type=name_type,
+                      count={'minimum_count': 0})
+
+
+class AnalysisTest(unittest.TestCase):
+    def test_literal_prefix(self):
+        self.assertEqual(literal_prefix("Segmentation_[0-9]+"),
+                         "Segmentation_")
+        self.assertEqual(literal_prefix("^read_\\d+"), "read_")
+        self.assertEqual(literal_prefix("ab*c"), "a")
+        self.assertEqual(literal_prefix("a\\.b+"), "a.b")
+        self.assertEqual(literal_prefix("Basecall|Segmentation"), "")
+        self.assertEqual(literal_prefix("[a-z]+"), "")
+
+    def test_may_overlap(self):
+        self.assertFalse(may_overlap(matcher("Raw"), matcher("Analyses")))
+        self.assertTrue(may_overlap(matcher("Raw"), matcher("Raw")))
+        self.assertFalse(may_overlap(matcher("Raw"),
+                                     matcher("Raw", type="dataset")))
+        self.assertTrue(may_overlap(
+            matcher("device_id", type="attribute"),
+            matcher("[a-z]+", type="attribute", name_type="regex")))
+        self.assertFalse(may_overlap(
+            matcher("Segmentation_[0-9]+", name_type="regex"),
+            matcher("Basecall_1D_[0-9]+", name_type="regex")))
+        self.assertTrue(may_overlap(
+            matcher("Basecall_[0-9]+", name_type="regex"),
+            matcher("Basecall_1D_[0-9]+", name_type="regex")))
+
+    def test_exclusive_classifier(self):
+        matchers = [matcher("Raw"),
+                    matcher("Segmentation_[0-9]+", name_type="regex"),
+                    matcher("Basecall_1D_[0-9]+", name_type="regex"),
+                    matcher("Raw", type="dataset")]
+        classifier = NameClassifier(matchers)
+        self.assertTrue(classifier.exclusive)
+        self.assertEqual(classifier.classify("Basecall_1D_000"), [2])
+        self.assertEqual(classifier.classify("Segmentation_001"), [1])
+        self.assertEqual(classifier.classify("Raw"), [0, 3])
+        self.assertEqual(classifier.classify("Other"), [])
+
+        self.assertFalse(NameClassifier(
+            matchers + [matcher("[A-Z].*", name_type="regex")]).exclusive)
+
+        # A group and an attribute may share a name, so both are found
+        classifier = NameClassifier([
+            matcher("[a-z]+_[0-9]+", name_type="regex"),
+            matcher("[a-z_0-9]+", type="attribute", name_type="regex")])
+        self.assertTrue(classifier.exclusive)
+        self.assertEqual(classifier.classify("read_1"), [0, 1])
+        self.assertEqual(classifier.classify("read"), [1])
+
+    def test_analyse_schema(self):
+        schema = Schema(os.path.join(schemas, "multi_read_fast5.yaml"))
+        self.assertTrue(schema.warnings)
+        for warning in schema.warnings:
+            self.assertTrue(warning.path.endswith("/tracking_id"))
+            self.assertEqual(warning.matchers[1].data["name"],
+                             "[a-zA-Z0-9]+")
+
+        self.assertEqual(analyse_schema({'file': {'groups': {
+            'Raw': {},
+            'Analyses': {'groups': {
+                'Segmentation_[0-9]+': {'name_type': 'regex'},
+                'Basecall_1D_[0-9]+': {'name_type': 'regex'},
+            }},
+        }}}), [])
+
+        warnings = analyse_schema({'file': {'groups': {
+            'Analyses': {'groups': {
+                'Basecall_[0-9A-Z_]+': {'name_type': 'regex'},
+                'Basecall_1D_[0-9]+': {'name_type': 'regex'},
+            }},
+        }}})
+        self.assertEqual([w.path for w in warnings], ["file/Analyses"])
+
+    def test_build_key_matchers(self):
+        matchers = build_key_matchers({
+            'groups': {'Raw': {}},
+            'attributes': {'run_id': 'S'},
+            'datasets': {'Signal': {'datatype': 'i2'}},
+        })
+        self.assertEqual([(m.data["name"], m.data["type"]) for m in matchers],
+                         [("Raw", "group"), ("run_id", "attribute"),
+                          ("Signal", "dataset")])
@@ -0,0 +1,131 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from h5_validator.archive import close_archives, list_members, \
+    member_name, open_member, split_member
+from h5_validator.batch import check_file, discover_files
+from h5_validator.cli import validate
+from h5_validator.fileobj import FileSection
+from h5_validator.schema import Schema
+
+test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.schema = Schema(os.path.join(test_data, "schema.yml"))
+        self.source = os.path.join(test_data, "test.fast5")
+        with open(self.source, "rb") as fh:
+            self.data = fh.read()
+
+    def tearDown(self):
+        close_archives()
+        shutil.rmtree(self.tmp_dir)
+
+    def _tar(self, name, mode):
+        path = os.path.join(self.tmp_dir, name)
+        with tarfile.open(path, mode) as tf:
+            tf.add(self.source, "reads/a.fast5")
+            tf.add(self.source, "reads/b.fast5")
+            info = tarfile.TarInfo("reads/notes.txt")
+            info.size = 5
+            tf.addfile(info, io.BytesIO(b"notes"))
+        return path
+
+    def _zip(self, name, compression):
+        path = os.path.join(self.tmp_dir, name)
+        with zipfile.ZipFile(path, "w", compression) as zf:
+            zf.write(self.source, "reads/a.fast5")
+            zf.write(self.source, "reads/b.fast5")
+            zf.writestr("reads/notes.txt", "notes")
+        return path
+
+    def _check_archive(self, path, in_place):
+        members = list_members(path)
+        self.assertEqual(members, [member_name(path, "reads/a.fast5"),
+                                   member_name(path, "reads/b.fast5")])
+
+        for member in members:
+            fh = open_member(member)
+            try:
+                self.assertEqual(isinstance(fh, FileSection), in_place)
+                self.assertEqual(fh.read(), self.data)
+            finally:
+                fh.close()
+
+            result = check_file(member, self.schema)
+            self.assertEqual(result['filename'], member)
+            self.assertEqual(result['status'], 'valid')
+
+    def test_split_member(self):
+        self.assertEqual(split_member("run.tar::reads/a.fast5"),
+                         ("run.tar", "reads/a.fast5"))
+        self.assertIsNone(split_member("reads/a.fast5"))
+        self.assertIsNone(split_member("odd::name.fast5"))
+
+    def test_tar(self):
+        self._check_archive(self._tar("reads.tar", "w"), True)
+
+    def test_compressed_tar(self):
+        self._check_archive(self._tar("reads.tar.gz", "w:gz"), False)
+
+    def test_stored_zip(self):
+        self._check_archive(self._zip("reads.zip", zipfile.ZIP_STORED), True)
+
+    def test_deflated_zip(self):
+        self._check_archive(self._zip("reads.zip", zipfile.ZIP_DEFLATED),
+                            False)
+
+    def test_discover_archive_members(self):
+        path = self._tar("reads.tar", "w")
+        self.assertEqual(list(discover_files([self.tmp_dir])),
+                         list_members(path))
+        self.assertEqual(list(discover_files([path])), list_members(path))
+
+    def test_missing_member(self):
+        path = self._tar("reads.tar", "w")
+        result = check_file(member_name(path, "reads/c.fast5"), self.schema)
+        self.assertEqual(result['status'], 'error')
+
+    def test_validate_member(self):
+        member = list_members(self._zip("reads.zip", zipfile.ZIP_STORED))[0]
+        report = io.StringIO()
+        self.assertTrue(validate(member, self.schema, reporter=report))
+        self.assertIn(member, report.getvalue())
+
+    def test_members_out_of_order(self):
+        path = os.path.join(self.tmp_dir, "many.tar")
+        with tarfile.open(path, "w") as tf:
+            for i in range(50):
+                info = tarfile.TarInfo("{:02}.txt".format(i))
+                info.size = 2
+                tf.addfile(info, io.BytesIO("{:02}".format(i).encode()))
+
+        for i in (10, 49, 3, 10, 0):
+            fh = open_member(member_name(path, "{:02}.txt".format(i)))
+            try:
+                self.assertEqual(fh.read(), "{:02}".format(i).encode())
+            finally:
+                fh.close()
+
+    def test_rewritten_archive(self):
+        path = self._tar("reads.tar", "w")
+        member = list_members(path)[0]
+        open_member(member).close()
+
+        with tarfile.open(path, "w") as tf:
+            info = tarfile.TarInfo("reads/a.fast5")
+            info.size = 4
+            tf.addfile(info, io.BytesIO(b"data"))
+        # The index of the previous archive is not reused
+        fh = open_member(member)
+        try:
+            self.assertEqual(fh.read(), b"data")
+        finally:
+            fh.close()
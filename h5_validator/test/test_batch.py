@@ -0,0 +1,198 @@
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from h5_validator import batch
+from h5_validator.batch import Journal, ResultWriter, ValidationPool, \
+    discover_files, in_shard, parse_shard, read_results, run_batch, summarise
+from h5_validator.schema import Schema
+
+test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+
+def misbehaving_check_file(filename, schema):
+    if filename == "hang":
+        time.sleep(60)
+    elif filename == "grow":
+        hog = []
+        while True:
+            hog.append(b"x" * 1024 * 1024)
+    elif filename == "crash":
+        os._exit(3)
+    return {'filename': filename, 'status': 'valid', 'error_count': 0,
+            'errors': []}
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.schema = Schema(os.path.join(test_data, "schema.yml"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _add_file(self, name, valid=True):
+        path = os.path.join(self.tmp_dir, name)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        if valid:
+            shutil.copy(os.path.join(test_data, "test.fast5"), path)
+        else:
+            with open(path, "wb") as fh:
+                fh.write(b"not hdf5")
+        return path
+
+    def _write_results(self, name, results):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as fh:
+            writer = ResultWriter(fh)
+            for result in results:
+                writer.write(result)
+        return path
+
+    def test_discover_files(self):
+        b = self._add_file("run/b.fast5")
+        a = self._add_file("run/a.fast5")
+        c = self._add_file("run/sub/c.fast5")
+        self._add_file("run/notes.txt")
+        explicit = self._add_file("other.h5")
+
+        self.assertEqual(
+            list(discover_files([os.path.join(self.tmp_dir, "run"),
+                                 explicit])),
+            [a, b, c, explicit])
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/8"), (2, 8))
+        for value in ("0/4", "5/4", "1", "a/b"):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_shards_partition_files(self):
+        files = ["/archive/run_{}/read_{}.fast5".format(i % 7, i)
+                 for i in range(500)]
+        shards = [[f for f in files if in_shard(f, k, 4)]
+                  for k in range(1, 5)]
+
+        self.assertEqual(sorted(sum(shards, [])), sorted(files))
+        for shard in shards:
+            self.assertGreater(len(shard), 50)
+
+        # The partition only depends on the path
+        self.assertEqual(in_shard("/archive/x.fast5", 3, 4),
+                         in_shard("/archive//x.fast5", 3, 4))
+
+    def test_run_batch(self):
+        good = self._add_file("good.fast5")
+        bad = self._add_file("bad.fast5", valid=False)
+
+        output = io.StringIO()
+        summary = run_batch([good, bad], self.schema, ResultWriter(output),
+                            jobs=1)
+
+        results = [json.loads(line)
+                   for line in output.getvalue().splitlines()]
+        self.assertEqual({r['filename']: r['status'] for r in results},
+                         {good: 'valid', bad: 'not_hdf5'})
+        self.assertEqual(summary, {
+            'files': 2,
+            'errors': 1,
+            'statuses': {'valid': 1, 'not_hdf5': 1},
+            'error_kinds': {'not_hdf5': 1},
+        })
+
+    def test_merge_results(self):
+        shard1 = self._write_results("shard1.jsonl", [
+            {'filename': 'a', 'status': 'valid', 'error_count': 0,
+             'errors': []},
+            {'filename': 'b', 'status': 'invalid', 'error_count': 2,
+             'errors': [{'kind': 'attribute_type'},
+                        {'kind': 'unexpected_member'}]},
+        ])
+        shard2 = self._write_results("shard2.jsonl", [
+            {'filename': 'c', 'status': 'invalid', 'error_count': 1,
+             'errors': [{'kind': 'attribute_type'}]},
+        ])
+
+        self.assertEqual(summarise(read_results([shard1, shard2])), {
+            'files': 3,
+            'errors': 3,
+            'statuses': {'valid': 1, 'invalid': 2},
+            'error_kinds': {'attribute_type': 2, 'unexpected_member': 1},
+        })
+
+    def test_summary_counts_aggregated_errors(self):
+        self.assertEqual(summarise([
+            {'filename': 'a', 'status': 'invalid', 'error_count': 7,
+             'errors': [{'kind': 'unexpected_attribute', 'count': 5},
+                        {'kind': 'attribute_type', 'count': 2}]},
+        ])['error_kinds'], {'unexpected_attribute': 5, 'attribute_type': 2})
+
+    def test_read_results_skips_incomplete_lines(self):
+        path = self._write_results("results.jsonl", [
+            {'filename': 'a', 'status': 'valid', 'error_count': 0,
+             'errors': []},
+        ])
+        with open(path, "a") as fh:
+            fh.write('{"filename": "b", "sta')
+
+        self.assertEqual([r['filename'] for r in read_results([path])],
+                         ['a'])
+
+    def test_journal_resume(self):
+        first = self._add_file("first.fast5")
+        second = self._add_file("second.fast5", valid=False)
+        path = os.path.join(self.tmp_dir, "journal.jsonl")
+
+        self.assertEqual(Journal.completed(path), set())
+
+        with Journal(path, sync_every=1000, sync_interval=1000) as journal:
+            run_batch([first], self.schema, ResultWriter(io.StringIO()),
+                      jobs=1, journal=journal)
+        self.assertEqual(Journal.completed(path), {first})
+
+        # Resuming only validates the remaining files, but the summary
+        # covers everything recorded in the journal
+        remaining = [f for f in [first, second]
+                     if f not in Journal.completed(path)]
+        output = io.StringIO()
+        with Journal(path) as journal:
+            summary = run_batch(remaining, self.schema, ResultWriter(output),
+                                jobs=1, journal=journal)
+
+        self.assertEqual([json.loads(line)['filename']
+                          for line in output.getvalue().splitlines()],
+                         [second])
+        self.assertEqual(summary['files'], 2)
+        self.assertEqual(summary['statuses'], {'valid': 1, 'not_hdf5': 1})
+        self.assertEqual(Journal.completed(path), {first, second})
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                         "Requires forked workers")
+    def test_pool_isolates_failures(self):
+        results = {}
+        original = batch.check_file
+        batch.check_file = misbehaving_check_file
+        try:
+            with ValidationPool(self.schema,
+                                lambda r: results.update(
+                                    {r['filename']: r['status']}),
+                                jobs=2, timeout=2,
+                                max_rss=512 * 1024 * 1024) as pool:
+                for filename in ("hang", "ok1", "grow", "crash", "ok2"):
+                    pool.submit(filename)
+        finally:
+            batch.check_file = original
+
+        self.assertEqual(results, {
+            'hang': 'timeout',
+            'grow': 'oom',
+            'crash': 'crashed',
+            'ok1': 'valid',
+            'ok2': 'valid',
+        })
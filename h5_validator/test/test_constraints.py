@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+import h5py as h5
+import numpy as np
+import yaml
+
+from h5_validator.constraints import ConstraintSet, Selector
+from h5_validator.schema import Schema
+from h5_validator.test.multi_read import write_multi_read_file
+from h5_validator.validator import Validator
+
+schemas = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..",
+                       "schemas")
+
+READ_CONSTRAINTS = [
+    {'equal': ["Raw@duration", "len(Raw/Signal)"]},
+    {'equal': ["$name", "read_{Raw@read_id}"]},
+    {'unique': "Raw@read_id"},
+    {'same': "@run_id"},
+]
+
+
+class ConstraintsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "reads.fast5")
+        self.read_ids = write_multi_read_file(self.path, reads=10,
+                                              signal_length=100)
+
+        with open(os.path.join(schemas, "multi_read_fast5.yaml")) as fh:
+            data = yaml.safe_load(fh)
+        reads = data['file']['groups']
+        (read_level,) = reads.values()
+        read_level['constraints'] = READ_CONSTRAINTS
+        self.schema = Schema(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _errors(self):
+        with h5.File(self.path, "r") as f:
+            v = Validator()
+            v.validate_file(self.schema, f)
+            return sorted((e.kind, e.object_name) for e in v.errors)
+
+    def test_selector(self):
+        with h5.File(self.path, "r") as f:
+            read = f["read_" + self.read_ids[0]]
+            self.assertEqual(Selector("$name").select(read),
+                             "read_" + self.read_ids[0])
+            self.assertEqual(Selector("Raw@duration").select(read), 100)
+            self.assertEqual(Selector("len(Raw/Signal)").select(read), 100)
+            self.assertEqual(Selector("{Raw@read_number}/{@run_id}")
+                             .select(read), "0/abcdef0123456789")
+            self.assertIsNone(Selector("Raw@missing").select(read))
+
+        with self.assertRaises(Exception):
+            Selector("Raw/duration")
+        with self.assertRaises(Exception):
+            ConstraintSet([{'sorted': "Raw@read_number"}])
+        with self.assertRaises(Exception):
+            ConstraintSet([{'equal': ["Raw@duration"]}])
+
+    def test_consistent_file(self):
+        self.assertEqual(self._errors(), [])
+
+    def test_inconsistent_file(self):
+        first, second, third = ["/read_" + r for r in self.read_ids[:3]]
+        with h5.File(self.path, "r+") as f:
+            f[first + "/Raw"].attrs["duration"] = np.uint32(99)
+            f[second + "/Raw"].attrs["read_id"] = \
+                np.bytes_(self.read_ids[2])
+            f[third].attrs["run_id"] = np.bytes_("another_run")
+
+        self.assertEqual(self._errors(), sorted([
+            ("constraint_equal", first),
+            ("constraint_equal", second),
+            ("constraint_same", third),
+            ("constraint_unique", second),
+            ("constraint_unique", third),
+        ]))
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+import h5py as h5
+import numpy as np
+
+from h5_validator.content import ContentScanner
+from h5_validator.schema import Schema
+from h5_validator.validator import Validator
+
+
+class ContentTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.f = h5.File(os.path.join(self.tmp_dir, "content.h5"), "w")
+
+    def tearDown(self):
+        self.f.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _kinds(self, rules, dataset, buffer_size=1024):
+        return [failure[0] for failure in
+                ContentScanner(buffer_size).check(rules, dataset)]
+
+    def test_blocks_follow_chunks(self):
+        data = np.arange(10000, dtype=np.int16)
+        signal = self.f.create_dataset("signal", data=data, chunks=(300,))
+
+        scanner = ContentScanner(buffer_size=1000)
+        blocks = [block.copy() for block in scanner.blocks(signal)]
+        # One chunk of 600 bytes fits in the buffer, two do not
+        self.assertEqual({len(b) for b in blocks[:-1]}, {300})
+        self.assertEqual(len(blocks), 34)
+        np.testing.assert_array_equal(np.concatenate(blocks), data)
+
+        contiguous = self.f.create_dataset("contiguous", data=data)
+        blocks = list(scanner.blocks(contiguous))
+        self.assertEqual(len(blocks[0]), 500)
+
+    def test_rules(self):
+        data = np.arange(10000, dtype=np.float64)
+        signal = self.f.create_dataset("signal", data=data, chunks=(256,))
+
+        rules = {'minimum': 0, 'maximum': 9999, 'no_nan': True,
+                 'non_empty': True, 'monotonic': 'strictly_increasing'}
+        self.assertEqual(self._kinds(rules, signal), [])
+
+        signal[5000] = np.nan
+        signal[20] = -1
+        signal[9999] = 10000
+        self.assertEqual(self._kinds(rules, signal),
+                         ["value_range", "value_range", "nan", "monotonic"])
+
+        # Order is also checked across block boundaries
+        ordered = self.f.create_dataset("ordered", data=data, chunks=(128,))
+        ordered[128] = 126.5
+        self.assertEqual(self._kinds({'monotonic': 'increasing'}, ordered),
+                         ["monotonic"])
+
+    def test_allowed_values(self):
+        mux = self.f.create_dataset("mux", data=[1, 2, 3, 4, 1, 0])
+        failures = ContentScanner().check({'allowed_values': [1, 2, 3, 4]},
+                                          mux)
+        self.assertEqual([(f[0], f[3]) for f in failures],
+                         [("allowed_values", 0)])
+
+    def test_empty_and_scalar(self):
+        empty = self.f.create_dataset("empty", shape=(0,), dtype=np.int16)
+        self.assertEqual(self._kinds({'non_empty': True}, empty), ["empty"])
+        self.assertEqual(self._kinds({'minimum': 0}, empty), [])
+
+        scalar = self.f.create_dataset("scalar", data=-3)
+        self.assertEqual(self._kinds({'minimum': 0}, scalar),
+                         ["value_range"])
+
+        text = self.f.create_dataset("text", data=np.bytes_("abc"))
+        self.assertEqual(self._kinds({'minimum': 0}, text), ["content"])
+        self.assertEqual(self._kinds({'non_empty': True}, text), [])
+
+    def test_validate_dataset_content(self):
+        schema = Schema({'file': {'datasets': {
+            'Signal': {'datatype': 'i2', 'minimum': 0, 'maximum': 2047},
+        }}})
+        self.f.create_dataset("Signal", data=np.arange(-2, 3000,
+                                                       dtype=np.int16),
+                              chunks=(100,))
+
+        v = Validator()
+        self.assertFalse(v.validate_file(schema, self.f))
+        self.assertEqual([(e.kind, e.schema_path) for e in v.errors],
+                         [("value_range", "file/Signal")] * 2)
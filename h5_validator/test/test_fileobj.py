@@ -0,0 +1,140 @@
+import functools
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+from h5_validator.batch import check_file
+from h5_validator.cli import validate
+from h5_validator.fileobj import BlockCache, HTTPRangeFile, open_url
+from h5_validator.schema import Schema
+from h5_validator.test.multi_read import write_multi_read_file
+
+test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Serve files from a directory, honouring Range headers."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        match = re.match(r"bytes=(\d+)-(\d+)",
+                         self.headers.get("Range", ""))
+        if not match:
+            return SimpleHTTPRequestHandler.do_GET(self)
+
+        with open(self.translate_path(self.path), "rb") as fh:
+            start, end = int(match.group(1)), int(match.group(2))
+            fh.seek(start)
+            data = fh.read(end - start + 1)
+        self.send_response(206)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FileObjTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.multi_read = os.path.join(cls.tmp_dir, "multi_read.fast5")
+        write_multi_read_file(cls.multi_read, reads=20,
+                              signal_length=50000)
+
+        handler = functools.partial(RangeRequestHandler,
+                                    directory=cls.tmp_dir)
+        cls.server = HTTPServer(("127.0.0.1", 0), handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.url = "http://127.0.0.1:{}/multi_read.fast5".format(
+            cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_block_cache_reads(self):
+        data = bytes(bytearray(range(256))) * 40
+        cache = BlockCache(io.BytesIO(data), block_size=100, capacity=4,
+                           readahead=1)
+
+        cache.seek(250)
+        self.assertEqual(cache.read(100), data[250:350])
+        # Block 2 missed, block 3 read ahead in the same fetch
+        self.assertEqual((cache.fetches, cache.misses, cache.hits),
+                         (1, 1, 1))
+        self.assertEqual(cache.bytes_fetched, 200)
+
+        cache.seek(310)
+        self.assertEqual(cache.read(20), data[310:330])
+        self.assertEqual((cache.fetches, cache.hits), (1, 2))
+
+        cache.seek(-5, io.SEEK_END)
+        self.assertEqual(cache.read(), data[-5:])
+        self.assertEqual(cache.read(), b"")
+
+        # Capacity is respected, evicting the least recently used blocks
+        for offset in range(0, len(data), 100):
+            cache.seek(offset)
+            self.assertEqual(cache.read(1), data[offset:offset + 1])
+        self.assertLessEqual(len(cache._blocks), 4)
+
+    def test_block_cache_small_capacity(self):
+        data = bytes(bytearray(range(256))) * 4
+        # Readahead beyond the capacity is limited to what the cache holds
+        cache = BlockCache(io.BytesIO(data), block_size=100, capacity=1,
+                           readahead=1)
+        self.assertEqual(cache.read(50), data[:50])
+        self.assertEqual(cache.bytes_fetched, 100)
+
+        with open(os.path.join(test_data, "test.fast5"), "rb") as fh:
+            self.assertTrue(validate(fh,
+                                     os.path.join(test_data, "schema.yml"),
+                                     reporter=io.StringIO(),
+                                     cache_options={'capacity': 2,
+                                                    'readahead': 4}))
+
+    def test_validate_file_object(self):
+        with open(os.path.join(test_data, "test.fast5"), "rb") as fh:
+            report = io.StringIO()
+            self.assertTrue(validate(fh,
+                                     os.path.join(test_data, "schema.yml"),
+                                     reporter=report))
+        self.assertIn("cache hit rate", report.getvalue())
+
+    def test_http_range_file(self):
+        remote = HTTPRangeFile(self.url)
+        self.assertEqual(remote.size, os.path.getsize(self.multi_read))
+        remote.seek(100)
+        with open(self.multi_read, "rb") as fh:
+            fh.seek(100)
+            self.assertEqual(remote.read(50), fh.read(50))
+        self.assertEqual(remote.requests, 1)
+
+    def test_validate_url_fetches_metadata_only(self):
+        cache = open_url(self.url, block_size=16 * 1024)
+        with open(os.devnull, 'w') as devnull:
+            self.assertTrue(validate(cache, "multi_read_fast5.yaml",
+                                     reporter=devnull))
+
+        stats = cache.stats()
+        self.assertLess(stats['bytes_fetched'], stats['size'] / 2)
+        self.assertGreater(stats['hit_rate'], 0.5)
+
+    def test_check_file_url(self):
+        result = check_file(self.url, Schema(os.path.join(
+            os.path.dirname(test_data), "..", "schemas",
+            "multi_read_fast5.yaml")))
+        self.assertEqual(result['status'], 'valid')
+        self.assertEqual(result['io']['size'],
+                         os.path.getsize(self.multi_read))
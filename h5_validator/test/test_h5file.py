@@ -0,0 +1,95 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import h5py as h5
+
+from h5_validator.cli import validate
+from h5_validator.h5file import IO_PROFILES, TUNED_METADATA_CACHE, \
+    FilePool, choose_profile, open_file
+from h5_validator.metrics import open_objects
+from h5_validator.schema import Schema
+from h5_validator.test.multi_read import write_multi_read_file
+
+test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+test_file = os.path.join(test_data, "test.fast5")
+schemas = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..",
+                       "schemas")
+
+
+class H5FileTest(unittest.TestCase):
+    def test_profiles_validate(self):
+        for profile in IO_PROFILES:
+            with open(os.devnull, 'w') as devnull:
+                self.assertTrue(validate(
+                    test_file,
+                    os.path.join(test_data, "schema.yml"),
+                    reporter=devnull,
+                    io_profile=profile
+                ), profile)
+
+    def test_core_profile(self):
+        with open_file(test_file, 'core') as f:
+            self.assertEqual(f.driver, 'core')
+            self.assertEqual(f["Raw/Reads/Read_7/Signal"].shape, (20246,))
+
+    def test_tuned_profile(self):
+        with open_file(test_file, 'tuned') as f:
+            config = f.id.get_mdc_config()
+            self.assertEqual(config.initial_size, TUNED_METADATA_CACHE)
+            self.assertEqual(f["Raw/Reads/Read_7/Signal"].shape, (20246,))
+
+    def test_auto_profile(self):
+        self.assertEqual(choose_profile(test_file), 'core')
+        with open(test_file, "rb") as fh:
+            self.assertEqual(choose_profile(fh), 'core')
+            self.assertEqual(fh.tell(), 0)
+
+    def test_file_objects(self):
+        with open(test_file, "rb") as fh:
+            for profile in IO_PROFILES:
+                with open_file(fh, profile) as f:
+                    self.assertIsInstance(f, h5.File)
+                    self.assertIn("Raw", f)
+
+        with open(test_file, "rb") as fh:
+            with open_file(io.BytesIO(fh.read()), 'core') as f:
+                self.assertIn("Raw", f)
+
+    def test_validate_closes_files(self):
+        for profile in IO_PROFILES:
+            report = io.StringIO()
+            self.assertFalse(validate(test_file, "multi_read_fast5.yaml",
+                                      reporter=report, io_profile=profile))
+            self.assertIn("Error at /", report.getvalue())
+            self.assertEqual(open_objects(), 0, profile)
+
+    def test_file_pool(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        schema = Schema(os.path.join(schemas, "multi_read_fast5.yaml"))
+        files = [os.path.join(tmp_dir, "{}.fast5".format(i))
+                 for i in range(3)]
+        for path in files:
+            write_multi_read_file(path, reads=2, signal_length=10)
+
+        with FilePool(capacity=2) as pool:
+            for _ in range(2):
+                self.assertTrue(validate(files[0], schema,
+                                         reporter=io.StringIO(), pool=pool))
+            self.assertEqual((pool.hits, pool.misses), (1, 1))
+            first = pool.open(files[0])
+
+            pool.open(files[1])
+            pool.open(files[2])
+            self.assertEqual(len(pool), 2)
+            self.assertNotIn(files[0], pool)
+            self.assertFalse(first.id.valid)
+            self.assertEqual(h5.h5f.get_obj_count(h5.h5f.OBJ_ALL,
+                                                  h5.h5f.OBJ_FILE), 2)
+        self.assertEqual(open_objects(), 0)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            open_file(test_file, 'fast')
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+import h5py as h5
+import numpy as np
+
+from h5_validator.integrity import ChunkScanner, _thread_pool, chunk_infos, \
+    fletcher32
+from h5_validator.schema import Schema
+from h5_validator.validator import Validator
+
+
+class IntegrityTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "integrity.h5")
+        data = np.arange(20000, dtype=np.int16) % 1000
+        with h5.File(self.path, "w") as f:
+            f.create_dataset("Signal", data=data, chunks=(1000,),
+                             compression="gzip", shuffle=True,
+                             fletcher32=True)
+            f.create_dataset("Plain", data=data, chunks=(1000,),
+                             fletcher32=True)
+            f.create_dataset("Contiguous", data=data)
+            # Read through HDF5 when the lzf module is not installed
+            f.create_dataset("Lzf", data=data, chunks=(1000,),
+                             compression="lzf")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _corrupt(self, name, index):
+        with h5.File(self.path, "r") as f:
+            info = chunk_infos(f[name])[index]
+        with open(self.path, "r+b") as f:
+            f.seek(info.byte_offset + info.size // 2)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xff]))
+        return tuple(info.chunk_offset)
+
+    def test_fletcher32(self):
+        self.assertEqual(fletcher32(b""), 0)
+        self.assertEqual(fletcher32(b"\x01\x02"), 0x01020102)
+        # An odd byte is the high byte of a last word
+        self.assertEqual(fletcher32(b"\x01\x02\x03"),
+                         fletcher32(b"\x01\x02\x03\x00"))
+        self.assertEqual(fletcher32(b"\xff\xff"), 0xffffffff)
+        self.assertEqual(fletcher32(bytes(range(256)) * 3, block=5),
+                         fletcher32(bytes(range(256)) * 3))
+
+    def test_thread_pool_replaced(self):
+        first = _thread_pool(1)
+        self.assertIs(_thread_pool(1), first)
+        second = _thread_pool(3)
+        # The previous pool's threads are stopped, not leaked
+        with self.assertRaises(ValueError):
+            first.apply(len, ("",))
+        self.assertEqual(second.apply(len, ("abc",)), 3)
+
+    def test_intact_file(self):
+        scanner = ChunkScanner(threads=2)
+        with h5.File(self.path, "r") as f:
+            for name in ("Signal", "Plain", "Contiguous", "Lzf"):
+                self.assertEqual(scanner.scan(f[name]), [])
+        self.assertEqual(scanner.chunks_read, 60)
+
+    def test_corrupt_chunks(self):
+        compressed = self._corrupt("Signal", 3)
+        checksummed = self._corrupt("Plain", 7)
+
+        # A small max_pending keeps few chunks waiting for the threads
+        scanner = ChunkScanner(threads=2, max_pending=1024)
+        with h5.File(self.path, "r") as f:
+            failures = scanner.scan(f["Signal"])
+            self.assertEqual([offset for offset, error in failures],
+                             [compressed])
+
+            failures = scanner.scan(f["Plain"])
+            self.assertEqual([offset for offset, error in failures],
+                             [checksummed])
+            self.assertIn("Checksum mismatch", failures[0][1])
+
+    def test_validate_integrity(self):
+        offset = self._corrupt("Signal", 0)
+        schema = Schema({'file': {'datasets': {
+            'Signal': {'datatype': 'i2'},
+            'Plain': {'datatype': 'i2'},
+            'Contiguous': {'datatype': 'i2'},
+            'Lzf': {'datatype': 'i2'},
+        }}})
+
+        with h5.File(self.path, "r") as f:
+            self.assertTrue(Validator().validate_file(schema, f))
+
+            v = Validator(integrity=True)
+            self.assertFalse(v.validate_file(schema, f))
+            self.assertEqual([(e.kind, e.schema_path, e.object_name)
+                              for e in v.errors],
+                             [("chunk", "file/Signal", "/Signal")])
+            self.assertIn(str(offset), v.errors[0].to_dict()['error'])
@@ -0,0 +1,55 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from h5_validator.batch import check_file
+from h5_validator.inventory import INVENTORY_COLUMNS, write_inventory_table
+from h5_validator.schema import Schema
+from h5_validator.test.multi_read import write_multi_read_file
+
+schemas = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..",
+                       "schemas")
+
+
+class InventoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "reads.fast5")
+        write_multi_read_file(self.path, reads=6, signal_length=250)
+        self.schema = Schema(os.path.join(schemas, "multi_read_fast5.yaml"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_inventory(self):
+        result = check_file(self.path, self.schema,
+                            inventory=["run_id", "flow_cell_id"])
+        self.assertEqual(result['status'], 'valid')
+        inventory = result['inventory']
+
+        (read_path,) = [path for path in inventory['nodes']
+                        if path.count("/") == 1]
+        self.assertEqual(inventory['nodes'][read_path]['matched'], 6)
+        signal = inventory['nodes'][read_path + "/Raw/Signal"]
+        self.assertEqual(signal, {'matched': 6, 'elements': 1500,
+                                  'bytes': 3000, 'min_length': 250,
+                                  'max_length': 250})
+        self.assertEqual(
+            inventory['attributes'][read_path + "/tracking_id@flow_cell_id"],
+            {"FAK12345": 6})
+
+        self.assertNotIn('inventory', check_file(self.path, self.schema))
+
+    def test_inventory_table(self):
+        result = check_file(self.path, self.schema, inventory=["run_id"])
+        output = io.StringIO()
+        rows = write_inventory_table([result], output)
+
+        lines = [line.split("\t")
+                 for line in output.getvalue().splitlines()]
+        self.assertEqual(tuple(lines[0]), INVENTORY_COLUMNS)
+        self.assertEqual(len(lines), rows + 1)
+        self.assertIn([self.path, lines[-1][1], "value:abcdef0123456789",
+                       "6"], lines)
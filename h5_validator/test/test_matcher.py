@@ -5,8 +5,10 @@ import unittest
 import logging
 import sys
 import h5py as h5
+import numpy as np
 
-from h5_validator.matcher import KeyMatcher
+from h5_validator.matcher import FieldMatcher, FieldTable, KeyMatcher, \
+    NameClassifier, dtype_fields
 
 logger = logging.getLogger()
 logger.level = logging.DEBUG
@@ -196,3 +198,86 @@ class MatcherTest(unittest.TestCase):
         )
 
         self.assertTrue(m.is_satisfied)
+
+    def test_name_classifier(self):
+        matchers = [
+            KeyMatcher({}, name="Raw", name_type="exact",
+                       count={'minimum_count': 0}),
+            KeyMatcher({}, name="[a-zA-Z0-9]+", name_type="regex",
+                       count={'minimum_count': 0}),
+            KeyMatcher({}, name="Segmentation_[0-9]+", name_type="regex",
+                       count={'minimum_count': 0}),
+            KeyMatcher({}, name="(a)\\1", name_type="regex",
+                       count={'minimum_count': 0}),
+            KeyMatcher({}, name="(?i)raw", name_type="regex",
+                       count={'minimum_count': 0}),
+            KeyMatcher({}, name="Raw", name_type="exact",
+                       count={'minimum_count': 0}),
+            KeyMatcher({}, name="x*", name_type="regex",
+                       count={'minimum_count': 0}),
+        ]
+        classifier = NameClassifier(matchers)
+
+        # A name is classified against every matcher it could satisfy
+        self.assertEqual(classifier.classify("Raw"), [0, 1, 4, 5, 6])
+        self.assertEqual(classifier.classify("Segmentation_000"),
+                         [1, 2, 6])
+        self.assertEqual(classifier.classify("aa"), [1, 3, 6])
+        self.assertEqual(classifier.classify("_"), [6])
+        # Inline flags are kept out of the merged expression, so they do
+        # not apply to the other patterns on any python version
+        self.assertEqual([index for index, regex in classifier._separate],
+                         [3, 4])
+        self.assertEqual(classifier.classify("segmentation_000"), [1, 6])
+
+        # Matching the classified names gives the same results as trying
+        # every matcher
+        for name in ("Raw", "raw", "aa", "Segmentation_1",
+                     "segmentation_1", "_"):
+            self.assertEqual(
+                classifier.classify(name),
+                [i for i, m in enumerate(matchers)
+                 if m.try_match(None, name=name, type="group")])
+
+    def test_name_classifier_unknown_name_type(self):
+        with self.assertRaises(Exception):
+            NameClassifier([KeyMatcher({}, name="a", name_type="glob")])
+
+    def test_field_table(self):
+        datatype = {
+            'start': 'u8',
+            'length': 'u4',
+            'model_state': 'S',
+            'weights': {'datatype': 'f4', 'optional': True},
+            'move': 'i4',
+        }
+        dtypes = [
+            np.dtype([('start', '<u8'), ('length', '<u4'),
+                      ('model_state', 'S5'), ('move', '<i4')]),
+            np.dtype([('start', '<u8'), ('length', '<i4'),
+                      ('model_state', h5.string_dtype()), ('extra', '<f8')]),
+            np.dtype('<i2'),
+        ]
+
+        table = FieldTable(datatype)
+        for dtype in dtypes:
+            # The same outcome as trying every FieldMatcher on each field
+            matchers = FieldMatcher.expand_field_matchers(datatype)
+            unexpected = [field for field in dtype_fields(dtype)
+                          if not [m for m in matchers
+                                  if m.can_accept_more and m.try_match(field)]]
+            unsatisfied = [str(m) for m in matchers if not m.is_satisfied]
+
+            fields, missing = table.check(dtype)
+            self.assertEqual(list(fields), unexpected)
+            self.assertEqual([str(m) for m in missing], unsatisfied)
+
+        self.assertEqual(table.check(dtypes[1])[0],
+                         (('length', '<i4'), ('extra', '<f8')))
+        # Verdicts are memoised for each dtype
+        self.assertIs(table.check(np.dtype(dtypes[0].descr)),
+                      table.check(dtypes[0]))
+
+        unnamed = FieldTable('i2')
+        self.assertEqual(unnamed.check(np.dtype('<i2')), ((), ()))
+        self.assertEqual(len(unnamed.check(np.dtype('<f4'))[1]), 1)
@@ -0,0 +1,130 @@
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+from h5_validator.batch import ResultWriter, check_file, run_batch
+from h5_validator.metrics import Metrics, PrometheusTextfile, \
+    StatsdExporter
+from h5_validator.schema import Schema
+from h5_validator.test.multi_read import write_multi_read_file
+
+schemas = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..",
+                       "schemas")
+
+
+def _samples(text):
+    return dict(line.rsplit(" ", 1) for line in text.splitlines()
+                if not line.startswith("#"))
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.schema = Schema(os.path.join(schemas, "multi_read_fast5.yaml"))
+        self.path = os.path.join(self.tmp_dir, "reads.fast5")
+        write_multi_read_file(self.path, reads=3, signal_length=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_check_file_metrics(self):
+        result = check_file(self.path, self.schema, metrics=True)
+        metrics = result['metrics']
+        self.assertEqual(metrics['reads'], 3)
+        self.assertGreater(metrics['metadata_bytes'], 0)
+        self.assertGreater(metrics['elapsed'], 0)
+        self.assertEqual(metrics['open_objects'], 0)
+
+        self.assertNotIn('metrics', check_file(self.path, self.schema))
+
+    def test_prometheus(self):
+        metrics = Metrics([])
+        metrics.gauges['queue_depth'] = lambda: 7
+        metrics.observe({'status': 'valid', 'errors': [],
+                         'metrics': {'elapsed': 0.2, 'reads': 4}})
+        metrics.observe({'status': 'invalid',
+                         'errors': [{'kind': 'missing_path'},
+                                    {'kind': 'wrong_type', 'count': 3}],
+                         'metrics': {'elapsed': 20.0, 'reads': 1}})
+
+        samples = _samples(metrics.prometheus())
+        self.assertEqual(samples['h5_validate_files_total{status="valid"}'],
+                         "1")
+        self.assertEqual(
+            samples['h5_validate_errors_total{kind="wrong_type"}'], "3")
+        self.assertEqual(samples['h5_validate_reads_total'], "5")
+        self.assertEqual(
+            samples['h5_validate_file_duration_seconds_bucket{le="0.25"}'],
+            "1")
+        self.assertEqual(
+            samples['h5_validate_file_duration_seconds_bucket{le="+Inf"}'],
+            "2")
+        self.assertEqual(samples['h5_validate_queue_depth'], "7")
+
+    def test_batch_metrics(self):
+        output = io.StringIO()
+        path = os.path.join(self.tmp_dir, "validate.prom")
+        metrics = Metrics([PrometheusTextfile(path)], interval=60)
+        run_batch([self.path, self.path + ".missing"], self.schema,
+                  ResultWriter(output), jobs=1, metrics=metrics)
+
+        for line in output.getvalue().splitlines():
+            self.assertNotIn('metrics', json.loads(line))
+        with open(path) as fh:
+            samples = _samples(fh.read())
+        self.assertEqual(samples['h5_validate_files_total{status="valid"}'],
+                         "1")
+        self.assertEqual(samples['h5_validate_reads_total'], "3")
+        self.assertEqual(samples['h5_validate_busy_workers'], "0")
+        self.assertEqual(os.listdir(self.tmp_dir).count("validate.prom"), 1)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+
+    def test_statsd(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(5)
+        try:
+            exporter = StatsdExporter("127.0.0.1:{}"
+                                      "".format(server.getsockname()[1]))
+            metrics = Metrics([exporter])
+            metrics.observe({'status': 'invalid',
+                             'errors': [{'kind': 'missing_path'}],
+                             'metrics': {'elapsed': 0.5, 'reads': 2}})
+            lines = server.recv(65536).decode("utf-8").splitlines()
+            metrics.close()
+            gauges = server.recv(65536).decode("utf-8").splitlines()
+        finally:
+            server.close()
+
+        self.assertEqual(lines, ["h5_validate.files.invalid:1|c",
+                                 "h5_validate.errors.missing_path:1|c",
+                                 "h5_validate.reads:2|c",
+                                 "h5_validate.file_duration:500.000|ms"])
+        self.assertIn("h5_validate.open_hdf5_objects:0|g", gauges)
+
+    def test_both_exporters(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(5)
+        path = os.path.join(self.tmp_dir, "validate.prom")
+        try:
+            metrics = Metrics([PrometheusTextfile(path),
+                               StatsdExporter("127.0.0.1:{}".format(
+                                   server.getsockname()[1]))])
+            metrics.observe({'status': 'valid', 'errors': []})
+            server.recv(65536)
+            metrics.close()
+            gauges = server.recv(65536).decode("utf-8").splitlines()
+        finally:
+            server.close()
+
+        with open(path) as fh:
+            rate = _samples(fh.read())['h5_validate_files_per_second']
+        # Both exporters are given the same sample of the rates
+        self.assertGreater(float(rate), 0)
+        self.assertIn("h5_validate.files_per_second:{}|g".format(rate),
+                      gauges)
@@ -0,0 +1,76 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import h5py as h5
+
+from h5_validator.cli import validate
+from h5_validator.precheck import FileCheckError, check_superblock
+
+test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+
+class PrecheckTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        with open(os.path.join(test_data, "test.fast5"), "rb") as fh:
+            self.contents = fh.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, contents):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "wb") as fh:
+            fh.write(contents)
+        return path
+
+    def assertCheckFails(self, path, kind):
+        with self.assertRaises(FileCheckError) as ctx:
+            check_superblock(path)
+        self.assertEqual(ctx.exception.kind, kind)
+
+    def test_valid_files(self):
+        check_superblock(os.path.join(test_data, "test.fast5"))
+
+        for libver in ("earliest", "latest"):
+            path = os.path.join(self.tmp_dir, libver + ".h5")
+            with h5.File(path, "w", libver=libver) as f:
+                f.create_dataset("data", data=range(100))
+            check_superblock(path)
+
+    def test_user_block(self):
+        path = os.path.join(self.tmp_dir, "userblock.h5")
+        with h5.File(path, "w", userblock_size=1024) as f:
+            f.create_dataset("data", data=range(100))
+        check_superblock(path)
+
+        with open(path, "rb") as fh:
+            contents = fh.read()
+        self.assertCheckFails(self._write("short.h5", contents[:-10]),
+                              "truncated")
+
+    def test_truncated(self):
+        self.assertCheckFails(self._write("empty.fast5", b""), "truncated")
+        self.assertCheckFails(self._write("tiny.fast5", self.contents[:4]),
+                              "truncated")
+        self.assertCheckFails(self._write("header.fast5",
+                                          self.contents[:20]),
+                              "truncated")
+        self.assertCheckFails(
+            self._write("half.fast5",
+                        self.contents[:len(self.contents) // 2]),
+            "truncated")
+
+    def test_not_hdf5(self):
+        self.assertCheckFails(self._write("text.fast5", b"hello" * 200),
+                              "not_hdf5")
+
+    def test_validate_reports_failed_check(self):
+        path = self._write("half.fast5",
+                           self.contents[:len(self.contents) // 2])
+        report = io.StringIO()
+        self.assertFalse(validate(path, os.path.join(test_data, "schema.yml"),
+                                  reporter=report))
+        self.assertIn("truncated", report.getvalue())
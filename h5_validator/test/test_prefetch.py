@@ -0,0 +1,97 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from h5_validator.batch import ResultWriter, read_file_list, run_batch
+from h5_validator.prefetch import Prefetcher, warm_file
+from h5_validator.schema import Schema
+
+test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+
+class TrickleStream():
+    """A binary stream returning at most a few bytes from each read."""
+
+    def __init__(self, data, size=3):
+        self.data = data
+        self.size = size
+
+    def read1(self, n):
+        chunk, self.data = self.data[:min(n, self.size)], \
+            self.data[min(n, self.size):]
+        return chunk
+
+
+class PrefetchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read_file_list(self):
+        self.assertEqual(list(read_file_list(io.BytesIO(b"a.fast5\nb c\n\n"))),
+                         ["a.fast5", "b c"])
+        self.assertEqual(list(read_file_list(io.BytesIO(b"a\nb\0c\0"))),
+                         ["a\nb", "c"])
+        self.assertEqual(list(read_file_list(io.BytesIO(b"last"))), ["last"])
+        self.assertEqual(list(read_file_list(TrickleStream(
+            b"dir/one.fast5\ndir/two.fast5\n"))),
+            ["dir/one.fast5", "dir/two.fast5"])
+
+    def test_warm_file(self):
+        path = os.path.join(self.tmp_dir, "a.fast5")
+        shutil.copy(os.path.join(test_data, "test.fast5"), path)
+        self.assertTrue(warm_file(path))
+        self.assertFalse(warm_file("http://example.com/a.fast5"))
+        self.assertFalse(warm_file(path + ".tar::a.fast5"))
+        self.assertFalse(warm_file(self.tmp_dir))
+
+    def test_prefetcher_bounds_read_ahead(self):
+        warmed = []
+        warmed_enough = threading.Event()
+
+        def warm(filename):
+            warmed.append(filename)
+            if len(warmed) == 3:
+                warmed_enough.set()
+
+        names = iter(["f{}".format(i) for i in range(10)])
+        prefetched = iter(Prefetcher(names, 2, warm=warm))
+        self.assertEqual(next(prefetched), "f0")
+
+        # One file handed out, two queued and one waiting for space
+        self.assertTrue(warmed_enough.wait(5))
+        self.assertLessEqual(len(warmed), 4)
+
+        self.assertEqual(list(prefetched), ["f{}".format(i)
+                                            for i in range(1, 10)])
+        self.assertEqual(len(warmed), 10)
+
+    def test_prefetcher_reports_errors(self):
+        def names():
+            yield "a"
+            raise RuntimeError("listing failed")
+
+        with self.assertRaises(RuntimeError):
+            list(Prefetcher(names(), 2, warm=lambda filename: None))
+
+    def test_run_batch_with_prefetch(self):
+        paths = []
+        for name in ("a.fast5", "b.fast5", "c.fast5"):
+            paths.append(os.path.join(self.tmp_dir, name))
+            shutil.copy(os.path.join(test_data, "test.fast5"), paths[-1])
+
+        output = io.StringIO()
+        summary = run_batch(paths, Schema(os.path.join(test_data,
+                                                       "schema.yml")),
+                            ResultWriter(output), jobs=1, prefetch=2)
+
+        self.assertEqual(sorted(json.loads(line)['filename']
+                                for line in output.getvalue().splitlines()),
+                         paths)
+        self.assertEqual(summary['statuses'], {'valid': 3})
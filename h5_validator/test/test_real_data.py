@@ -4,9 +4,12 @@ test_real_data.py verifying real files.
 
 import unittest
 import logging
+import shutil
 import sys
 import os.path
+import tempfile
 from h5_validator.cli import validate
+from h5_validator.test.multi_read import write_multi_read_file
 
 logger = logging.getLogger()
 logger.level = logging.ERROR
@@ -31,3 +34,16 @@ class RealDataTest(unittest.TestCase):
                 os.path.join(test_data, "schema.yml"),
                 reporter=devnull
             ))
+
+    def test_multi_read_validate(self):
+        """
+        Test generated multi-read files validate against the packaged schema
+        """
+        path = os.path.join(tempfile.mkdtemp(), "multi_read.fast5")
+        try:
+            write_multi_read_file(path, reads=5)
+            with open(os.devnull, 'w') as devnull:
+                self.assertTrue(validate(path, "multi_read_fast5.yaml",
+                                         reporter=devnull))
+        finally:
+            shutil.rmtree(os.path.dirname(path))
@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import h5py as h5
+import numpy as np
+
+from h5_validator.batch import ResultWriter, check_file, failed_result, \
+    run_batch
+from h5_validator.schedule import Task, merge_results, plan
+from h5_validator.schema import Schema
+from h5_validator.test.multi_read import write_multi_read_file
+
+schemas = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..",
+                       "schemas")
+
+
+class ScheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.schema = Schema(os.path.join(schemas, "multi_read_fast5.yaml"))
+
+        self.large = os.path.join(self.tmp_dir, "large.fast5")
+        read_ids = write_multi_read_file(self.large, reads=12,
+                                         signal_length=2000)
+        with h5.File(self.large, "r+") as f:
+            for read_id in read_ids[::5]:
+                f["read_" + read_id]["Raw"].attrs["read_number"] = \
+                    np.bytes_("one")
+            f.create_group("extra")
+            # Sorts after the reads, so falls in the last part's range
+            f.create_group("zzz_extra")
+        self.small = os.path.join(self.tmp_dir, "small.fast5")
+        write_multi_read_file(self.small, reads=2, signal_length=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_plan(self):
+        size = os.path.getsize(self.large)
+        tasks = plan([self.small, self.large], self.schema,
+                     split_size=size // 4 + 1)
+        self.assertEqual([task.part for task in tasks],
+                         [(0, 4), (1, 4), (2, 4), (3, 4), None])
+        self.assertEqual(tasks[-1], Task(self.small, None,
+                                         os.path.getsize(self.small)))
+
+        tasks = plan([self.small, self.large], self.schema, split_size=None)
+        self.assertEqual([task.filename for task in tasks],
+                         [self.large, self.small])
+
+    def test_parts_match_whole_file(self):
+        for options in ({}, {'aggregate': True}):
+            whole = check_file(self.large, self.schema, **options)
+            merged = merge_results([check_file(self.large, self.schema,
+                                               part=(index, 5), **options)
+                                    for index in range(5)])
+
+            self.assertEqual(merged['status'], 'invalid')
+            self.assertEqual(merged['error_count'], whole['error_count'])
+            self.assertEqual(
+                sorted(json.dumps(e, sort_keys=True)
+                       for e in merged['errors']),
+                sorted(json.dumps(e, sort_keys=True)
+                       for e in whole['errors']))
+
+    def test_merge_failed_part(self):
+        parts = [check_file(self.large, self.schema, part=(0, 2)),
+                 failed_result(self.large, 'timeout', "Timed out after 5s")]
+        parts[1]['part'] = [1, 2]
+
+        merged = merge_results(parts)
+        self.assertEqual(merged['status'], 'timeout')
+        self.assertNotIn('part', merged)
+        self.assertNotIn('message', merged)
+        self.assertEqual(merged['errors'], [{
+            'kind': 'timeout', 'object': '/',
+            'error': "Part 2 of 2: Timed out after 5s"}])
+        # The part's own result is not changed
+        self.assertEqual(parts[1]['errors'][0]['error'],
+                         "Timed out after 5s")
+
+    def test_scheduled_batch(self):
+        output = io.StringIO()
+        summary = run_batch([self.small, self.large], self.schema,
+                            ResultWriter(output), jobs=2, schedule=True,
+                            split_size=os.path.getsize(self.large) // 4 + 1,
+                            check_options={'storage_summary': True})
+
+        results = [json.loads(line)
+                   for line in output.getvalue().splitlines()]
+        self.assertEqual(sorted(r['filename'] for r in results),
+                         [self.large, self.small])
+        large, = [r for r in results if r['filename'] == self.large]
+        self.assertNotIn('part', large)
+        self.assertEqual(large['error_count'], 5)
+        self.assertEqual(large['storage']['datasets'], 12)
+
+        self.assertEqual(summary['files'], 2)
+        scheduler = summary['scheduler']
+        self.assertEqual((scheduler['workers'], scheduler['tasks']), (2, 5))
+        self.assertTrue(0 < scheduler['utilisation'] <= 1)
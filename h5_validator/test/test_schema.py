@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py as h5
+import numpy as np
+
+from h5_validator.schema import Schema
+from h5_validator.validator import Validator
+
+SCHEMA = {
+    "definitions": {
+        "summary": {
+            "attributes": {"return_status": "S"},
+        },
+        "analysis": {
+            "count": {"minimum_count": 0},
+            "name_type": "regex",
+            "attributes": {"name": "S", "version": "S"},
+            "groups": {"Summary": {"$ref": "#/definitions/summary"}},
+        },
+    },
+    "file": {
+        "groups": {
+            "Segmentation_[0-9]+": {"$ref": "#/definitions/analysis"},
+            "Basecall_1D_[0-9]+": {"$ref": "#/definitions/analysis",
+                                   "count": {"maximum_count": 1}},
+            "Copied_[0-9]+": {
+                "count": {"minimum_count": 0},
+                "name_type": "regex",
+                "attributes": {"name": "S", "version": "S"},
+                "groups": {"Summary": {"attributes":
+                                       {"return_status": "S"}}},
+            },
+        },
+    },
+}
+
+
+class SchemaTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_refs(self):
+        groups = Schema(SCHEMA).data["file"]["groups"]
+        self.assertNotIn("definitions", Schema(SCHEMA).data)
+        self.assertEqual(groups["Segmentation_[0-9]+"]["groups"],
+                         {"Summary": {"attributes": {"return_status": "S"}}})
+        self.assertEqual(groups["Basecall_1D_[0-9]+"]["count"],
+                         {"maximum_count": 1})
+        self.assertEqual(groups["Basecall_1D_[0-9]+"]["name_type"], "regex")
+
+        # The copied block is the same node as the referenced one
+        self.assertIs(groups["Copied_[0-9]+"], groups["Segmentation_[0-9]+"])
+        self.assertIs(groups["Basecall_1D_[0-9]+"]["groups"],
+                      groups["Segmentation_[0-9]+"]["groups"])
+        self.assertNotIn("$ref", str(groups))
+
+    def test_invalid_refs(self):
+        for ref in ("#/definitions/missing", "other.yaml#/summary"):
+            with self.assertRaises(Exception):
+                Schema({"file": {"groups": {"a": {"$ref": ref}}}})
+
+        cyclic = {
+            "definitions": {
+                "a": {"groups": {"b": {"$ref": "#/definitions/a"}}},
+            },
+            "file": {"groups": {"a": {"$ref": "#/definitions/a"}}},
+        }
+        with self.assertRaisesRegex(Exception, "refers to itself"):
+            Schema(cyclic)
+
+    def test_shared_nodes_validate(self):
+        path = os.path.join(self.tmp_dir, "analyses.h5")
+        with h5.File(path, "w") as f:
+            for name in ("Segmentation_000", "Copied_000", "Copied_001",
+                         "Basecall_1D_000"):
+                group = f.create_group(name)
+                group.attrs["name"] = np.bytes_(name)
+                group.attrs["version"] = np.bytes_("1.0")
+                group.create_group("Summary").attrs["return_status"] = \
+                    np.bytes_("ok")
+            del f["Copied_001"].attrs["version"]
+
+        v = Validator()
+        with h5.File(path, "r") as f:
+            v.validate_file(Schema(SCHEMA), f)
+        self.assertEqual([e['object'] for e in v.error_dicts()],
+                         ["/Copied_001"])
+        # The root, the analysis level shared by Segmentation and Copied,
+        # Basecall with its own count, and one Summary level for all three
+        self.assertEqual(len(v._classifiers), 4)
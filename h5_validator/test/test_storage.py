@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+import h5py as h5
+import numpy as np
+
+from h5_validator.batch import summarise
+from h5_validator.schema import Schema
+from h5_validator.storage import StorageSummary, check_storage
+from h5_validator.validator import Validator
+
+
+class StorageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.f = h5.File(os.path.join(self.tmp_dir, "storage.h5"), "w")
+        data = np.zeros(10000, dtype=np.int16)
+        self.compressed = self.f.create_dataset(
+            "compressed", data=data, chunks=(1000,), compression="gzip",
+            shuffle=True)
+        self.contiguous = self.f.create_dataset("contiguous", data=data)
+
+    def tearDown(self):
+        self.f.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _kinds(self, rules, dataset):
+        return [failure[0] for failure in check_storage(rules, dataset)]
+
+    def test_layout_and_filters(self):
+        rules = {'layout': 'chunked', 'filters': ['gzip'], 'shuffle': True}
+        self.assertEqual(self._kinds(rules, self.compressed), [])
+        self.assertEqual(self._kinds(rules, self.contiguous),
+                         ["storage_layout", "storage_filters",
+                          "storage_shuffle"])
+
+        self.assertEqual(self._kinds({'filters': [1, 'shuffle']},
+                                     self.compressed), [])
+        self.assertEqual(self._kinds({'filters': ['vbz']}, self.compressed),
+                         ["storage_filters"])
+        self.assertEqual(self._kinds({'shuffle': False}, self.compressed),
+                         ["storage_shuffle"])
+
+        with self.assertRaises(Exception):
+            list(check_storage({'filters': ['unknown']}, self.compressed))
+        with self.assertRaises(Exception):
+            list(check_storage({'compression': 'gzip'}, self.compressed))
+
+    def test_chunk_bounds(self):
+        self.assertEqual(self._kinds({'chunks': {'minimum': [1000],
+                                                 'maximum': [None]}},
+                                     self.compressed), [])
+        self.assertEqual(self._kinds({'chunks': {'minimum': [4096]}},
+                                     self.compressed), ["storage_chunks"])
+        self.assertEqual(self._kinds({'chunks': {'maximum': [100]}},
+                                     self.compressed), ["storage_chunks"])
+        self.assertEqual(self._kinds({'chunks': {'minimum': [1]}},
+                                     self.contiguous), ["storage_chunks"])
+
+    def test_summary(self):
+        summary = StorageSummary()
+        summary.add("file/compressed", self.compressed)
+        summary.add("file/contiguous", self.contiguous)
+        totals = summary.to_dict()
+
+        self.assertEqual(totals['datasets'], 2)
+        self.assertEqual(totals['logical_bytes'], 40000)
+        self.assertLess(totals['paths']['file/compressed']['stored_bytes'],
+                        20000)
+        self.assertEqual(totals['paths']['file/contiguous']['ratio'], 1.0)
+        self.assertIn("file/compressed", str(summary))
+
+    def test_validate_storage(self):
+        schema = Schema({'file': {'datasets': {
+            'compressed': {'datatype': 'i2',
+                           'storage': {'filters': ['gzip']}},
+            'contiguous': {'datatype': 'i2',
+                           'storage': {'layout': 'chunked'}},
+        }}})
+
+        v = Validator(storage_summary=True)
+        self.assertFalse(v.validate_file(schema, self.f))
+        self.assertEqual([(e.kind, e.schema_path) for e in v.errors],
+                         [("storage_layout", "file/contiguous")])
+        self.assertEqual(v.storage.to_dict()['datasets'], 2)
+
+        results = [{'filename': name, 'status': 'valid', 'error_count': 0,
+                    'errors': [], 'storage': v.storage.to_dict()}
+                   for name in ("a", "b")]
+        self.assertEqual(summarise(results)['storage']['datasets'], 4)
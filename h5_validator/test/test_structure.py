@@ -0,0 +1,140 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import h5py as h5
+import numpy as np
+
+from h5_validator.batch import ResultWriter, check_file, run_batch
+from h5_validator.schema import Schema
+from h5_validator.structure import StructureClasses, structure_hash
+from h5_validator.test.multi_read import write_multi_read_file
+from h5_validator.validator import Validator
+
+schemas = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..",
+                       "schemas")
+test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+
+def _sorted_errors(result):
+    return sorted(json.dumps(e, sort_keys=True) for e in result['errors'])
+
+
+class StructureTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.schema = Schema(os.path.join(schemas, "multi_read_fast5.yaml"))
+
+        def write(name, seed, signal_length, digitisation=None,
+                  extra=False):
+            path = os.path.join(self.tmp_dir, name + ".fast5")
+            # Each file has its own read IDs
+            read_ids = write_multi_read_file(path, reads=2, seed=seed,
+                                             signal_length=signal_length)
+            with h5.File(path, "r+") as f:
+                if digitisation is not None:
+                    channel_id = f["read_" + read_ids[1]]["channel_id"]
+                    channel_id.attrs["digitisation"] = \
+                        np.bytes_(digitisation)
+                if extra:
+                    f.create_group("extra")
+                    f["read_" + read_ids[0]].create_group("extra")
+            return path
+
+        self.plain = write("plain", 1, 100)
+        self.numeric = write("numeric", 2, 300, digitisation="8192")
+        self.invalid = write("invalid", 3, 200, digitisation="oops")
+        self.extra = write("extra", 4, 100, extra=True)
+        self.extra_long = write("extra_long", 5, 400, extra=True)
+        self.files = [self.plain, self.numeric, self.invalid, self.extra,
+                      self.extra_long]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_structure_hash(self):
+        hashes = []
+        for path in self.files:
+            with h5.File(path, "r") as f:
+                hashes.append(structure_hash(f, self.schema))
+                # Without a schema, read IDs are part of the structure
+                self.assertNotEqual(structure_hash(f), hashes[-1])
+        plain, numeric, invalid, extra, extra_long = hashes
+        # Attribute types are checked by value, so not part of the hash
+        self.assertEqual(plain, numeric)
+        self.assertEqual(numeric, invalid)
+        self.assertEqual(extra, extra_long)
+        self.assertNotEqual(plain, extra)
+
+    def test_matches_full_validation(self):
+        for options in ({}, {'aggregate': True}, {'columnar': True}):
+            classes = StructureClasses()
+            for path in self.files:
+                result = check_file(path, self.schema,
+                                    structure_classes=classes, **options)
+                whole = check_file(path, self.schema, **options)
+                self.assertEqual(result['status'], whole['status'])
+                self.assertEqual(result['error_count'],
+                                 whole['error_count'])
+                self.assertEqual(_sorted_errors(result),
+                                 _sorted_errors(whole))
+            self.assertEqual((classes.full, classes.by_value), (2, 3))
+            self.assertEqual(len(classes), 2)
+
+    def test_single_read_files(self):
+        schema = Schema(os.path.join(test_data, "schema.yml"))
+        paths = []
+        for number in (7, 8, 9):
+            path = os.path.join(self.tmp_dir, "{}.fast5".format(number))
+            shutil.copy(os.path.join(test_data, "test.fast5"), path)
+            with h5.File(path, "r+") as f:
+                for reads in ("Raw/Reads",
+                              "Analyses/EventDetection_000/Reads"):
+                    f[reads].move("Read_7", "Read_{}".format(number))
+                if number != 7:
+                    f["Raw/Reads/Read_{}".format(number)] \
+                        .create_group("extra")
+            paths.append(path)
+
+        for options in ({}, {'aggregate': True}):
+            classes = StructureClasses()
+            for path in paths:
+                result = check_file(path, schema, structure_classes=classes,
+                                    **options)
+                whole = check_file(path, schema, **options)
+                self.assertEqual(result['error_count'],
+                                 whole['error_count'])
+                self.assertEqual(_sorted_errors(result),
+                                 _sorted_errors(whole))
+            # Read_9's unexpected member is moved from Read_8's
+            self.assertEqual((classes.full, classes.by_value), (2, 1))
+
+    def test_batch_structures(self):
+        output = io.StringIO()
+        summary = run_batch(
+            self.files, self.schema, ResultWriter(output), jobs=1,
+            check_options={'structure_classes': StructureClasses()})
+
+        self.assertEqual(sorted(summary['structures'].values()), [2, 3])
+        self.assertEqual(summary['statuses'], {'valid': 2, 'invalid': 3})
+
+    def test_copied_errors_name_file(self):
+        schema = Schema({'file': {'groups': {'required': {}}}})
+        classes = StructureClasses()
+        messages = []
+        for name in ("first", "second"):
+            path = os.path.join(self.tmp_dir, name + ".h5")
+            with h5.File(path, "w") as f:
+                f.create_group("other")
+            with h5.File(path, "r") as f:
+                _, errors, _ = classes.validate(
+                    Validator(record_values=True), schema, f)
+            messages.append(" ".join(e['error'] for e in errors
+                                     if e['kind'] == 'unsatisfied_matcher'))
+
+        self.assertEqual(classes.by_value, 1)
+        self.assertEqual(messages[0], messages[1])
+        self.assertIn("required", messages[1])
+        self.assertNotIn("first", messages[1])
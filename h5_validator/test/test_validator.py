@@ -7,6 +7,7 @@ import unittest
 import h5py as h5
 import numpy as np
 
+from h5_validator.schema import Schema
 from h5_validator.validator import Validator
 
 logger = logging.getLogger()
@@ -113,3 +114,169 @@ class ValidatorTest(unittest.TestCase):
             self.test_file,
             "test_flt"
         ))
+
+    def test_aggregate_errors(self):
+        schema = Schema({'file': {'groups': {
+            'read_[0-9]+': {
+                'name_type': 'regex',
+                'count': {'minimum_count': 0},
+                'attributes': {'read_number': 'i4'},
+            },
+        }}})
+        for i in range(20):
+            read = self.test_file.create_group("read_{}".format(i))
+            read.attrs["read_number"] = np.bytes_("abc")
+            read.attrs["new_attr"] = i
+        self.test_file.create_group("extra")
+
+        plain = Validator()
+        plain.validate_file(schema, self.test_file)
+        self.assertEqual(len(plain.errors), 41)
+        self.assertEqual(plain.errors[0].schema_path, "file/extra")
+
+        v = Validator(aggregate=True, max_examples=3)
+        self.assertFalse(v.validate_file(schema, self.test_file))
+        self.assertEqual(v.errors, [])
+        self.assertEqual(v.error_count, 41)
+
+        groups = {(e['schema_path'], e['kind']): e for e in v.error_dicts()}
+        self.assertEqual(sorted(groups), [
+            ("file/extra", "unexpected_member"),
+            ("file/read_[0-9]+/new_attr", "unexpected_attribute"),
+            ("file/read_[0-9]+/read_number", "attribute_type"),
+        ])
+        type_errors = groups[("file/read_[0-9]+/read_number",
+                              "attribute_type")]
+        self.assertEqual(type_errors['count'], 20)
+        self.assertEqual(len(type_errors['examples']), 3)
+        self.assertTrue(type_errors['examples'][0].endswith("@read_number"))
+        self.assertEqual(type_errors['expected'], "<type=i4>")
+
+    def test_columnar_attributes(self):
+        schema = Schema({'file': {'groups': {
+            'read_[0-9]+': {
+                'name_type': 'regex',
+                'count': {'minimum_count': 0},
+                'attributes': {
+                    'read_number': {'datatype': 'i4', 'minimum': 0},
+                    'median_before': 'f8',
+                    'offsets': 'i4',
+                },
+            },
+        }}})
+        for i in range(10):
+            read = self.test_file.create_group("read_{}".format(i))
+            read.attrs["read_number"] = i - 2
+            read.attrs["median_before"] = \
+                np.bytes_("high") if i == 7 else 200.0
+            read.attrs["offsets"] = [i, i + 1]
+
+        def errors(v):
+            v.validate_file(schema, self.test_file)
+            return sorted((e.kind, e.object_name) for e in v.errors)
+
+        expected = [
+            ("attribute_range", "/read_0@read_number"),
+            ("attribute_range", "/read_1@read_number"),
+            ("attribute_type", "/read_7@median_before"),
+        ]
+        self.assertEqual(errors(Validator()), expected)
+        self.assertEqual(errors(Validator(columnar=True)), expected)
+
+        # Gathered values do not keep their objects open until checked
+        v = Validator(columnar=True)
+        v.validate_attribute({'datatype': 'i4', 'minimum': 0},
+                             self.test_file["read_0"], "read_number")
+        column, = v._columns.values()
+        self.assertEqual(column.object_names, ["/read_0"])
+        self.assertFalse(v.check_columns())
+        self.assertEqual([e.object_name for e in v.errors],
+                         ["/read_0@read_number"])
+
+    def test_validate_paths(self):
+        schema = Schema({'file': {'groups': {
+            'read_[0-9]+': {
+                'name_type': 'regex',
+                'count': {'minimum_count': 5},
+                'attributes': {'read_number': 'i4'},
+                'datasets': {'Signal': 'i2'},
+            },
+        }}})
+        for i in range(3):
+            read = self.test_file.create_group("read_{}".format(i))
+            read.attrs["read_number"] = np.bytes_("abc") if i == 1 else i
+            read.create_dataset("Signal", data=np.zeros(10, dtype=np.int16))
+        self.test_file.create_group("extra")
+
+        def errors(paths):
+            v = Validator()
+            v.validate_paths(schema, self.test_file, paths)
+            return [(e.kind, e.schema_path, e.object_name) for e in v.errors]
+
+        # Counts of the file level are not checked, nor other members
+        self.assertEqual(errors(["/read_0"]), [])
+        self.assertEqual(errors(["/read_0/Signal", "read_2/Signal"]), [])
+        self.assertEqual(errors(["/read_1"]), [
+            ("attribute_type", "file/read_[0-9]+/read_number",
+             "/read_1@read_number")])
+        self.assertEqual(errors(["/read_7", "/read_0/Signal/x"]), [
+            ("missing_path", "file", "/"),
+            ("missing_path", "file/read_[0-9]+/Signal", "/read_0/Signal")])
+        self.assertEqual(errors(["/extra"]), [
+            ("unexpected_member", "file/extra", "/extra")])
+        self.assertEqual(len(errors(["/"])), 3)
+
+    def test_validate_paths_extra_members(self):
+        schema = Schema({'file': {'extra_members': 'ignore',
+                                  'groups': {'a': {}}}})
+        self.test_file.create_group("a")
+        self.test_file.create_group("extra")
+
+        v = Validator()
+        v.validate_file(schema, self.test_file)
+        self.assertEqual(v.errors, [])
+
+        v = Validator()
+        v.validate_paths(schema, self.test_file, ["/extra"])
+        self.assertEqual(v.errors, [])
+
+        # Parts other than the first validate their members by path
+        v = Validator()
+        v.validate_part(schema, self.test_file, 1, 2)
+        self.assertEqual(v.errors, [])
+
+    def test_nested_classifiers_cached(self):
+        schema = Schema({'file': {'groups': {
+            'read_[0-9]+': {
+                'name_type': 'regex',
+                'count': {'minimum_count': 1},
+                'groups': {'Raw': {'datasets': {'Signal': 'i2'}}},
+            },
+        }}})
+        for i in range(5):
+            raw = self.test_file.create_group("read_{}/Raw".format(i))
+            raw.create_dataset("Signal", data=np.zeros(10, dtype=np.int16))
+
+        v = Validator()
+        v.validate_file(schema, self.test_file)
+        self.assertEqual(v.errors, [])
+        # One classifier for the root, the reads and Raw, not one per read
+        self.assertEqual(len(v._classifiers), 3)
+
+    def test_group_and_attribute_share_name(self):
+        schema = Schema({'file': {
+            'groups': {'[a-z]+_[0-9]+': {'name_type': 'regex',
+                                         'count': {'minimum_count': 0}}},
+            'attributes': {'[a-z_0-9]+': {'name_type': 'regex',
+                                          'datatype': 'S',
+                                          'count': {'minimum_count': 0}}},
+        }})
+        self.test_file.create_group("read_1")
+        self.test_file.attrs["read_1"] = np.bytes_("abc")
+
+        v = Validator()
+        v.validate_file(schema, self.test_file)
+        self.assertEqual(v.errors, [])
+        v = Validator()
+        v.validate_paths(schema, self.test_file, ["/read_1"])
+        self.assertEqual(v.errors, [])
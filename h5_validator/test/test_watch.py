@@ -0,0 +1,80 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from h5_validator.batch import ResultWriter
+from h5_validator.schema import Schema
+from h5_validator.watch import DirectoryWatcher, SeenFiles, watch
+
+test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+
+class WatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.schema = Schema(os.path.join(test_data, "schema.yml"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _add_file(self, name):
+        path = os.path.join(self.tmp_dir, name)
+        shutil.copy(os.path.join(test_data, "test.fast5"), path)
+        return path
+
+    def test_watcher_waits_for_stable_files(self):
+        watcher = DirectoryWatcher([self.tmp_dir], settle_time=5)
+        path = self._add_file("a.fast5")
+        self._add_file("ignored.txt")
+
+        self.assertEqual(watcher.poll(now=100), [])
+        self.assertEqual(watcher.poll(now=102), [])
+
+        with open(path, "ab") as fh:
+            fh.write(b"\0")
+        self.assertEqual(watcher.poll(now=104), [])
+        self.assertEqual(watcher.poll(now=110), [path])
+
+        # Files are only reported once
+        self.assertEqual(watcher.poll(now=120), [])
+
+    def test_seen_files_persist(self):
+        state = os.path.join(self.tmp_dir, "state")
+        seen = SeenFiles(state)
+        seen.add("/data/a.fast5")
+        seen.close()
+
+        seen = SeenFiles(state)
+        self.assertIn("/data/a.fast5", seen)
+        self.assertNotIn("/data/b.fast5", seen)
+        seen.close()
+
+    def test_watch_validates_new_files_once(self):
+        data_dir = os.path.join(self.tmp_dir, "run")
+        os.makedirs(os.path.join(data_dir, "nested"))
+        valid = os.path.join(data_dir, "nested", "good.fast5")
+        shutil.copy(os.path.join(test_data, "test.fast5"), valid)
+        invalid = os.path.join(data_dir, "bad.fast5")
+        with open(invalid, "wb") as fh:
+            fh.write(b"not hdf5")
+
+        state = os.path.join(self.tmp_dir, "state")
+        output = io.StringIO()
+        watch([data_dir], self.schema, ResultWriter(output), jobs=1,
+              interval=0, settle_time=0, state_file=state, max_polls=2)
+
+        results = {r['filename']: r for r in
+                   (json.loads(line) for line in
+                    output.getvalue().splitlines())}
+        self.assertEqual(set(results), {valid, invalid})
+        self.assertEqual(results[valid]['status'], 'valid')
+        self.assertEqual(results[invalid]['status'], 'not_hdf5')
+
+        # A restarted watcher does not validate the same files again
+        output = io.StringIO()
+        watch([data_dir], self.schema, ResultWriter(output), jobs=1,
+              interval=0, settle_time=0, state_file=state, max_polls=2)
+        self.assertEqual(output.getvalue(), "")
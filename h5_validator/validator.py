@@ -5,16 +5,31 @@ from __future__ import \
     print_function, \
     absolute_import, \
     division
-from h5_validator.matcher import KeyMatcher, FieldMatcher, AttributeMatcher
+import collections
+import numpy
+from h5_validator.constraints import ConstraintSet
+from h5_validator.content import ContentScanner, has_content_rules
+from h5_validator.integrity import ChunkScanner
+from h5_validator.inventory import Inventory
+from h5_validator.storage import StorageSummary, check_storage
+from h5_validator.matcher import AttributeMatcher, FieldTable, \
+    NameClassifier, build_key_matchers
 import h5py
 
 
 class SchemaError(Exception):
-    """An error which occured during validation."""
+    """
+    An error which occured during validation.
+
+    The object is kept by name, so errors do not hold the file's groups
+    and datasets open, and can still be reported once it is closed.
+    """
 
     def __init__(self, **kwargs):
-        """Create new error."""
+        """Create new error, about an HDF5 object or the name of one."""
         self._data = kwargs
+        self._data["object"] = getattr(kwargs["object"], "name",
+                                       kwargs["object"])
 
     def __str__(self):
         """
@@ -22,21 +37,198 @@ class SchemaError(Exception):
 
         Should provide useful data to consumers of validations reports
         """
-        return "Error at {}: \n    {}\n".format(self._data["object"].name,
+        return "Error at {}: \n    {}\n".format(self._data["object"],
                                                 self._data["error"])
 
+    @property
+    def schema_path(self):
+        """
+        Find where in the schema this error occurred.
+
+        :return: Schema names from the root, ie: 'file/read_.*/Raw', or ''
+        """
+        return self._data.get("schema_path", "")
+
+    @property
+    def object_name(self):
+        """
+        Find the HDF5 path of the object this error is about.
+
+        :return: The object's path, with '@attribute' for attributes
+        """
+        name = self._data["object"]
+        if "attribute" in self._data:
+            name += "@" + str(self._data["attribute"])
+        return name
+
+    @property
+    def kind(self):
+        """
+        Find the kind of this error.
+
+        :return: A short identifier for the check which failed
+        """
+        return self._data.get("kind", "error")
+
+    def to_dict(self):
+        """
+        Convert this error to plain data.
+
+        :return: A dictionary of strings suitable for serialising as JSON
+        """
+        data = {
+            'kind': self.kind,
+            'object': self._data["object"],
+            'error': self._data["error"],
+        }
+        if self.schema_path:
+            data['schema_path'] = self.schema_path
+        for key in ('attribute', 'expected', 'actual'):
+            if key in self._data:
+                data[key] = str(self._data[key])
+        return data
+
+
+class ErrorGroup():
+    """
+    Errors of the same kind, at the same place in the schema.
+
+    Multi-read files repeat the same structure for every read, so one
+    problem is usually reported once per read. A group keeps a count and
+    the first few HDF5 paths instead of every error.
+    """
+
+    def __init__(self, error, max_examples=5):
+        """
+        Create a new group from its first error.
+
+        :param error: The first SchemaError in the group
+        :param max_examples: Number of HDF5 paths to keep as examples
+        """
+        self.kind = error.kind
+        self.schema_path = error.schema_path
+        self.error = error.to_dict()
+        self.error.pop('object')
+        self.max_examples = max_examples
+        self.count = 0
+        self.examples = []
+        self.add(error)
+
+    @staticmethod
+    def key(error):
+        """
+        Find the group [error] belongs to.
+
+        :param error: A SchemaError
+        :return: Tuple of (schema path, kind, expected, actual)
+        """
+        data = error.to_dict()
+        return (error.schema_path, error.kind, data.get('expected'),
+                data.get('actual'))
+
+    def add(self, error):
+        """
+        Count another error in this group.
+
+        :param error: A SchemaError with the same key as this group
+        """
+        self.count += 1
+        if len(self.examples) < self.max_examples:
+            self.examples.append(error.object_name)
+
+    def __str__(self):
+        """Print report for this group."""
+        return "{} errors at {}: \n    {}\n    e.g. {}\n".format(
+            self.count, self.schema_path, self.error['error'],
+            ", ".join(self.examples))
+
+    def to_dict(self):
+        """
+        Convert this group to plain data.
+
+        :return: The first error's dictionary without its object, with
+                 'count' and 'examples' keys added
+        """
+        data = dict(self.error)
+        data['count'] = self.count
+        data['examples'] = list(self.examples)
+        return data
+
+
+class _AttributeColumn():
+    """The values of one schema attribute, gathered across objects."""
+
+    def __init__(self, attribute, schema_path):
+        self.attribute = attribute
+        self.matcher = AttributeMatcher(attribute)
+        self.schema_path = schema_path
+        self.values = []
+        # Objects are kept by name, so the column does not hold them open
+        self.object_names = []
+        self.names = []
+
+    def add(self, value, object, name):
+        self.values.append(value)
+        self.object_names.append(object.name)
+        self.names.append(name)
+
 
 class Validator():
     """Validator provides top level access to validate HDF5 object trees."""
 
-    def __init__(self):
+    def __init__(self, aggregate=False, max_examples=5, columnar=False,
+                 integrity=False, integrity_threads=None,
+                 storage_summary=False, inventory=None, record_values=False):
         """
         Create a new validator.
 
         Users should now call validate_* functions to check
         validity of hdf objects.
+
+        :param aggregate: Keep only an ErrorGroup for each distinct problem
+                          instead of every error, so memory use does not
+                          grow with the number of reads
+        :param max_examples: HDF5 paths kept by each ErrorGroup
+        :param columnar: Gather scalar attributes into a column for each
+                         schema attribute, and check each column at once
+                         when validate_file finishes
+        :param integrity: Check every stored chunk of each matched dataset
+                          decodes, see ChunkScanner
+        :param integrity_threads: Threads decoding chunks for integrity
+                                  checks
+        :param storage_summary: Total the logical and stored bytes of the
+                                datasets validated, in self.storage
+        :param inventory: Names of attributes to collect into an Inventory
+                          of the objects validated, in self.inventory, or
+                          None for no inventory
+        :param record_values: Record the checks which depend on values
+                              rather than structure in self.value_checks,
+                              and every error in self.reported, to
+                              repeat on files of the same structure with
+                              validate_values and replay_errors
         """
         self.errors = []
+        self.groups = collections.OrderedDict()
+        self.error_count = 0
+        self.aggregate = aggregate
+        self.max_examples = max_examples
+        self.columnar = columnar
+        self._schema_path = []
+        self._columns = collections.OrderedDict()
+        self._constraints = collections.OrderedDict()
+        self._content = None
+        self._integrity = ChunkScanner(integrity_threads) if integrity \
+            else None
+        self.storage = StorageSummary() if storage_summary else None
+        self.inventory = Inventory(inventory) if inventory is not None \
+            else None
+        # (kind, schema_path, schema node, HDF5 path, attribute name)
+        self.value_checks = [] if record_values else None
+        self.reported = [] if record_values else None
+        # Name classifiers compiled for each schema level, by id(level)
+        self._classifiers = {}
+        # Field tables compiled for each dataset schema, by id(dataset)
+        self._field_tables = {}
 
     @property
     def is_valid(self):
@@ -45,23 +237,59 @@ class Validator():
 
         :return: Is this validator error free?
         """
-        return len(self.errors) == 0
+        return self.error_count == 0
 
-    def print_report(self, outputter, f, verbose=False):
+    def error_dicts(self):
+        """
+        Convert the errors found to plain data.
+
+        :return: List of dictionaries, one per error or, when aggregating,
+                 one per ErrorGroup
+        """
+        if self.aggregate:
+            return [group.to_dict() for group in self.groups.values()]
+        return [err.to_dict() for err in self.errors]
+
+    def _report(self, subject=None, schema_path=None, **kwargs):
+        # Record an error at the current schema path, or at [subject]
+        # below it for children which no matcher accepted
+        if schema_path is None:
+            path = self._schema_path + [subject] if subject else \
+                self._schema_path
+            schema_path = "/".join(path)
+        error = SchemaError(schema_path=schema_path, **kwargs)
+        self.error_count += 1
+        if self.reported is not None:
+            self.reported.append(error)
+        if not self.aggregate:
+            self.errors.append(error)
+            return
+
+        key = ErrorGroup.key(error)
+        group = self.groups.get(key)
+        if group is None:
+            self.groups[key] = ErrorGroup(error, self.max_examples)
+        else:
+            group.add(error)
+
+    def print_report(self, outputter, f, verbose=False, filename=None):
         """
         Print a full report on errors this validator has encountered.
 
         Should provide useful data to users about why
         the file failed to validate.
+
+        :param filename: Name to report for the file, defaults to f.filename
         """
-        if not self.errors:
+        filename = filename or f.filename
+        if self.is_valid:
             outputter.write("HDF5 file validated successfully: {}"
-                            .format(f.filename))
+                            .format(filename))
         else:
             outputter.write("Validation encountered {} errors in {}\n\n"
-                            .format(len(self.errors), f.filename))
+                            .format(self.error_count, filename))
             if verbose:
-                for err in self.errors:
+                for err in self.errors or self.groups.values():
                     outputter.write(str(err))
 
     def validate_file(self, schema, file):
@@ -72,88 +300,247 @@ class Validator():
         :param file: The HDF5 file to validate
         :return: If the validation was error free
         """
-        return self.validate_group(schema.data["file"], file)
+        self._schema_path.append("file")
+        try:
+            self.validate_group(schema.data["file"], file)
+        finally:
+            self._schema_path.pop()
+        self.check_columns()
+        return self.check_constraints()
+
+    def validate_paths(self, schema, file, paths):
+        """
+        Validate only the objects at [paths] in a file against [schema].
 
-    def validate_group(self, level, object):
+        The schema node for each object is found by matching the names
+        along its path, level by level, without listing any other members
+        of the groups on the way. Each object is then validated as
+        validate_group would, including everything below it. Counts and
+        constraints of the levels above the objects are not checked, as
+        they depend on the rest of the file.
+
+        :param schema: The schema to validate against
+        :param file: The HDF5 file holding the objects
+        :param paths: HDF5 paths of the objects, ie: ['/read_<uuid>']
+        :return: If the validation was error free
+        """
+        for path in paths:
+            self._validate_path(schema.data["file"], file, path)
+        self.check_columns()
+        return self.check_constraints()
+
+    def _validate_path(self, level, object, path, root_members=True):
+        # [root_members] is False when unexpected members of the root
+        # group are reported elsewhere, as by part 0 of a split file
+        names = [name for name in path.split("/") if name]
+        if not names:
+            self._schema_path.append("file")
+            try:
+                self.validate_group(level, object)
+            finally:
+                self._schema_path.pop()
+            return
+
+        schema_path = ["file"]
+        for depth, name in enumerate(names):
+            if not isinstance(object, h5py.Group) or name not in object:
+                self._report(
+                    schema_path="/".join(schema_path),
+                    kind="missing_path",
+                    error="No object at {}".format(
+                        "/" + "/".join(names[:depth + 1])),
+                    object=object)
+                return
+
+            matchers = self._build_matchers(level)
+            classifier = self._classifier(level, matchers)
+            parent, child, accepted = object, object[name], None
+            for i in classifier.classify(name):
+                if matchers[i].try_match(child, name_matched=True):
+                    # The last matcher accepting a child is used, as in
+                    # validate_group
+                    accepted = matchers[i]
+                    if classifier.exclusive:
+                        break
+
+            if accepted is None:
+                if level.get('extra_members', 'fail') != 'fail' or \
+                        (depth == 0 and not root_members):
+                    return
+                self._report(
+                    schema_path="/".join(schema_path + [name]),
+                    kind="unexpected_member",
+                    error="Failed to match {} to item in schema"
+                          "".format(child.name),
+                    object=child,
+                    matchers=matchers)
+                return
+            schema_path.append(accepted.data["name"])
+            level, object = accepted.source, child
+
+        self._schema_path.extend(schema_path)
+        try:
+            self._validate_child(accepted, parent, child, {})
+        finally:
+            del self._schema_path[-len(schema_path):]
+
+    def validate_part(self, schema, file, index, count):
+        """
+        Validate one of [count] parts of a file against [schema].
+
+        The members of the root group are split into [count] ranges of
+        consecutive names, so the reads of a large multi-read file can be
+        validated by several workers at once. Each part validates the
+        members in its range, and part 0 also checks the root group
+        itself: its attributes, unexpected members and the counts of its
+        matchers. Constraints are only checked between the members of
+        one part.
+
+        :param schema: The schema to validate against
+        :param file: The HDF5 file to validate
+        :param index: The part to validate, from 0
+        :param count: The number of parts the file is split into
+        :return: If the validation was error free
+        """
+        names = list(file)
+        start = len(names) * index // count
+        stop = len(names) * (index + 1) // count
+        if index != 0:
+            for name in names[start:stop]:
+                self._validate_path(schema.data["file"], file, "/" + name,
+                                    root_members=False)
+            self.check_columns()
+            return self.check_constraints()
+
+        self._schema_path.append("file")
+        try:
+            self.validate_group(schema.data["file"], file,
+                                members=set(names[start:stop]))
+        finally:
+            self._schema_path.pop()
+        self.check_columns()
+        return self.check_constraints()
+
+    def validate_group(self, level, object, members=None):
         """
         Validate a group against a schema.
 
         :param level: The group schema to validate against
         :param object: The HDF5 object to validate
+        :param members: Names of the members to validate below this
+                        group, or None for all of them
         :return: If the validation was error free
         """
+        if 'constraints' in level:
+            self._record_value_check("constraints", level, object)
+            self._constraint_set(level).add(object)
+
         # Find the matchers available at this level
         matchers = self._build_matchers(level)
+        classifier = self._classifier(level, matchers)
         child_pairs = {}
 
         extra_mode = level.get('extra_members', 'fail')
 
         # Match the matchers against the first level children
-        # (datasets and groups)
+        # (datasets and groups), trying only matchers whose names match
         for k in object:
             found = False
-            for m in matchers:
-                obj = object[k]
-                if m.try_match(obj):
+            obj = object[k]
+            for i in classifier.classify(k):
+                m = matchers[i]
+                if m.try_match(obj, name_matched=True):
                     found = True
                     child_pairs[obj] = m
+                    if classifier.exclusive:
+                        # No other matcher can accept this child
+                        break
 
             if not found:
                 if (extra_mode == 'fail'):
-                    self.errors.append(SchemaError(
+                    self._report(
+                        subject=k,
+                        kind="unexpected_member",
                         error="Failed to match {} to item in schema"
                               "".format(object[k].name),
                         object=object[k],
-                        matchers=matchers))
+                        matchers=matchers)
 
         # Match against attributes
         attrs = dict(object.attrs)
         for k in attrs:
             found = False
-            for m in matchers:
-                if m.try_match(attrs[k], name=k, type="attribute"):
+            for i in classifier.classify(k):
+                m = matchers[i]
+                if m.try_match(attrs[k], name=k, type="attribute",
+                               name_matched=True):
                     child_pairs[k] = m
                     found = True
+                    if classifier.exclusive:
+                        break
 
             if not found:
-                self.errors.append(SchemaError(
+                self._report(
+                    subject=k,
+                    kind="unexpected_attribute",
                     error="Failed to match attribute '{}' in '{}' to schema"
                           "".format(k, object.name),
                     object=object,
                     attribute=k,
-                    matchers=matchers))
+                    matchers=matchers)
 
         # Verify all matchers are satisfied completely
         for m in matchers:
             if not m.is_satisfied:
-                self.errors.append(SchemaError(
+                self._report(
+                    subject=m.data["name"],
+                    kind="unsatisfied_matcher",
                     error="Matcher {} was not satisfied after matching {}"
-                          "".format(m, object),
+                          "".format(m, object.name),
                     object=object,
-                    matchers=matchers))
+                    matchers=matchers)
+
+        if self.inventory is not None:
+            path = "/".join(self._schema_path)
+            for m in matchers:
+                if m.data["type"] != "attribute":
+                    self.inventory.count(path + "/" + m.data["name"],
+                                         m.accepted_count)
+            self.inventory.add_attributes(path, attrs)
 
         # Verify any child pairs which we discovered
         for child in child_pairs:
+            if members is not None and not isinstance(child, str) and \
+                    child.name.rsplit("/", 1)[1] not in members:
+                continue
             matcher = child_pairs[child]
-
-            if isinstance(child, h5py.Group):
-                self.validate_group(matcher.data, child)
-            elif isinstance(child, h5py._hl.dataset.Dataset):
-                self.validate_dataset(matcher.source, child)
-            elif isinstance(child, str):
-                self.validate_attribute(matcher.source, object, child)
-            else:
-                try:
-                    # HDF strings in python2 can be unicode
-                    if isinstance(child, unicode):
-                        self.validate_attribute(matcher.source, object, child)
-                    else:
-                        raise Exception("Unknown data type {}".format(child))
-                except NameError:
-                    pass
+            self._schema_path.append(matcher.data["name"])
+            try:
+                self._validate_child(matcher, object, child, attrs)
+            finally:
+                self._schema_path.pop()
 
         return self.is_valid
 
+    def _validate_child(self, matcher, object, child, attrs):
+        if isinstance(child, h5py.Group):
+            # The schema's own dict, so classifiers cached by level are reused
+            self.validate_group(matcher.source, child)
+        elif isinstance(child, h5py._hl.dataset.Dataset):
+            self.validate_dataset(matcher.source, child)
+        elif isinstance(child, str):
+            self.validate_attribute(matcher.source, object, child,
+                                    attrs[child])
+        else:
+            try:
+                # HDF strings in python2 can be unicode
+                if isinstance(child, unicode):
+                    self.validate_attribute(matcher.source, object, child)
+                else:
+                    raise Exception("Unknown data type {}".format(child))
+            except NameError:
+                pass
+
     def validate_dataset(self, dataset, object):
         """
         Validate a dataset against a schema.
@@ -162,108 +549,268 @@ class Validator():
         :param object: The HDF5 object to validate
         :return: If the validation was error free
         """
+        # Tables are cached by the schema's own object, as expanding a
+        # string creates a new dictionary each time
+        table = self._field_table(dataset)
         dataset = self._expand_dataset(dataset)
-
-        matchers = FieldMatcher.expand_field_matchers(dataset['datatype'])
-
-        actual_dtype = object.dtype
-        if actual_dtype.fields is not None:
-            fields = [(name, dtype.str)
-                      for name, (dtype, size) in actual_dtype.fields.items()]
-        else:
-            fields = [('', actual_dtype.str)]
-
-        for field in fields:
-            found = False
-            for m in matchers:
-                if m.can_accept_more and m.try_match(field):
-                    found = True
-
-            if not found:
-                self.errors.append(SchemaError(
-                    error="Failed to match field {} to schema".format(field),
-                    matchers=matchers,
-                    object=object,
-                    dataset=dataset))
-
-        for m in matchers:
-            if not m.is_satisfied:
-                self.errors.append(SchemaError(
-                    error="Failed to satisfy matcher {} to dataset".format(m),
-                    matchers=matchers,
-                    object=object,
-                    dataset=dataset))
+        unexpected, unsatisfied = table.check(object.dtype)
+        for field in unexpected:
+            self._report(
+                kind="unexpected_field",
+                error="Failed to match field {} to schema".format(field),
+                matchers=table.matchers,
+                object=object,
+                dataset=dataset)
+
+        for m in unsatisfied:
+            self._report(
+                kind="missing_field",
+                error="Failed to satisfy matcher {} to dataset".format(m),
+                matchers=table.matchers,
+                object=object,
+                dataset=dataset)
 
         if 'dimensions' in dataset:
             shape = object.shape
             if len(shape) != dataset['dimensions']:
-                self.errors.append(SchemaError(
+                self._report(
+                    kind="dimensions",
                     error="Invalid dimensions",
                     expected=dataset['dimensions'],
                     actual=len(shape),
-                    object=object))
+                    object=object)
+
+        self._record_value_check("dataset", dataset, object)
+        self._check_dataset_values(dataset, object)
+        return self.is_valid
 
+    def _check_dataset_values(self, dataset, object):
+        # Checks of a dataset's shape, storage and contents, which can
+        # differ between datasets of the same structure
         if 'size' in dataset:
             shape = object.shape
             size = dataset['size']
             if len(shape) == len(size):
                 for i in range(0, len(size)):
                     if shape[i] != size[i]:
-                        self.errors.append(SchemaError(
+                        self._report(
+                            kind="shape",
                             error="Invalid shape dimension {}".format(i),
                             expected=size[i],
                             actual=shape[i],
-                            object=object))
+                            object=object)
             else:
-                self.errors.append(SchemaError(
+                self._report(
+                    kind="shape",
                     error="Invalid shape dimensions",
                     expected=size,
                     actual=shape,
-                    object=object))
-
-        return self.is_valid
-
-    def validate_attribute(self, attribute, object, name):
+                    object=object)
+
+        if 'storage' in dataset:
+            for kind, error, expected, actual in \
+                    check_storage(dataset['storage'], object):
+                self._report(kind=kind, error=error, expected=expected,
+                             actual=actual, object=object)
+        if self.storage is not None:
+            self.storage.add("/".join(self._schema_path), object)
+        if self.inventory is not None:
+            self.inventory.add_dataset("/".join(self._schema_path), object)
+
+        if has_content_rules(dataset):
+            if self._content is None:
+                self._content = ContentScanner()
+            for kind, error, expected, actual in \
+                    self._content.check(dataset, object):
+                self._report(kind=kind, error=error, expected=expected,
+                             actual=actual, object=object)
+
+        if self._integrity is not None:
+            for offset, error in self._integrity.scan(object):
+                self._report(kind="chunk",
+                             error="Chunk at {}: {}".format(offset, error),
+                             object=object)
+
+    def validate_attribute(self, attribute, object, name, value=None):
         """
         Validate an attribute against a schema.
 
+        In columnar mode scalar attributes are only gathered here, and are
+        checked when validate_file finishes.
+
         :param attribute: The parent schema to validate against
         :param object: The HDF5 object to validate
         :param name: The name of the attribute (on [object]) to validate
+        :param value: The attribute's value, if already read
         :return: If the validation was error free
         """
-        m = AttributeMatcher(attribute)
-        value = object.attrs[name]
+        self._record_value_check("attribute", attribute, object, name)
+        if value is None:
+            value = object.attrs[name]
+
+        if self.columnar and numpy.ndim(value) == 0:
+            self._column(attribute).add(value, object, name)
+            return self.is_valid
 
+        m = AttributeMatcher(attribute)
         if not m.try_match(value):
-            self.errors.append(SchemaError(
-                error="Failed to match attribute",
-                expected=m,
-                actual=value,
-                object=object))
+            self._attribute_error("attribute_type", m, value, object, name)
+        elif m.has_range and not m.in_range(value):
+            self._attribute_error("attribute_range", m, value, object, name)
 
         return self.is_valid
 
-    def _build_matchers(self, level):
-        types = {
-            "groups": "group",
-            "attributes": "attribute",
-            "datasets": "dataset",
-        }
+    def _attribute_error(self, kind, matcher, value, object, name,
+                         schema_path=None):
+        # [object] is the HDF5 object holding the attribute, or its name
+        self._report(
+            schema_path=schema_path,
+            kind=kind,
+            error="Failed to match attribute" if kind == "attribute_type"
+            else "Attribute out of range",
+            expected=matcher,
+            actual=value,
+            object=object,
+            attribute=name)
+
+    def _column(self, attribute):
+        path = "/".join(self._schema_path)
+        column = self._columns.get((path, id(attribute)))
+        if column is None:
+            column = _AttributeColumn(attribute, path)
+            self._columns[(path, id(attribute))] = column
+        return column
+
+    def _constraint_set(self, level):
+        path = "/".join(self._schema_path)
+        cached = self._constraints.get((path, id(level)))
+        if cached is None:
+            cached = (path, ConstraintSet(level['constraints']))
+            self._constraints[(path, id(level))] = cached
+        return cached[1]
+
+    def check_constraints(self):
+        """
+        Check the constraints between objects gathered during validation.
+
+        Each schema level's constraints are evaluated over the values
+        gathered from every group it matched. Called by validate_file.
+
+        :return: If the validation was error free
+        """
+        for path, constraints in self._constraints.values():
+            for kind, message, group in constraints.check():
+                self._report(schema_path=path, kind=kind, error=message,
+                             object=group)
+        self._constraints.clear()
+        return self.is_valid
+
+    def check_columns(self):
+        """
+        Check the attributes gathered in columnar mode.
+
+        Each column is cast and range checked with single vectorised
+        operations, and any failures are reported against the objects the
+        values came from. Called by validate_file.
+
+        :return: If the validation was error free
+        """
+        for column in self._columns.values():
+            matched, in_range = column.matcher.match_column(column.values)
+            for kind, failed in (("attribute_type", ~matched),
+                                 ("attribute_range", matched & ~in_range)):
+                for i in numpy.flatnonzero(failed):
+                    self._attribute_error(kind, column.matcher,
+                                          column.values[i],
+                                          column.object_names[i],
+                                          column.names[i],
+                                          schema_path=column.schema_path)
+        self._columns.clear()
+        return self.is_valid
+
+    def _record_value_check(self, kind, node, object, name=None):
+        if self.value_checks is not None:
+            self.value_checks.append((kind, tuple(self._schema_path), node,
+                                      object.name, name))
 
-        matchers = []
-        for type in types:
-            items = level.get(type, {})
-            for k in items:
-                data = {}
-                if items[k] is None:
-                    raise Exception("Found empty element at {}".format(k))
-                if isinstance(items[k], dict):
-                    data = dict(items[k])
-                data["name"] = k
-                data["type"] = types[type]
-                matchers.append(KeyMatcher(items[k], **data))
-        return matchers
+    def replay_errors(self, errors, paths=None):
+        """
+        Report errors found in another file, moved to this file's objects.
+
+        :param errors: SchemaErrors from the reported list of a Validator
+                       created with record_values
+        :param paths: Dictionary of the HDF5 paths in [errors] to those of
+                      the objects they correspond to, where they differ
+        """
+        for error in errors:
+            data = dict(error._data)
+            old = data["object"]
+            new = (paths or {}).get(old, old)
+            if new != old:
+                data["object"] = new
+                data["error"] = data["error"].replace(old, new)
+                if data.get("kind") == "unexpected_member":
+                    # Named by the member, not a matcher
+                    data["schema_path"] = "{}/{}".format(
+                        data["schema_path"].rsplit("/", 1)[0],
+                        new.rsplit("/", 1)[1])
+            self._report(**data)
+
+    def validate_values(self, checks, file, paths=None):
+        """
+        Repeat only the value checks recorded while validating another file.
+
+        Files with the same structure (see structure.structure_hash) match
+        the schema in the same way, so their structural errors are the
+        same. Only attribute values, dataset shapes, storage and contents
+        and constraints are checked again.
+
+        :param checks: The value_checks of a Validator created with
+                       record_values, after validating a file of the same
+                       structure as [file]
+        :param file: The HDF5 file to validate
+        :param paths: Dictionary of the HDF5 paths in [checks] to those of
+                      the objects in [file], where they differ
+        :return: If the value checks were error free
+        """
+        objects = {}
+        for kind, schema_path, node, path, name in checks:
+            path = (paths or {}).get(path, path)
+            cached = objects.get(path)
+            if cached is None:
+                object = file[path]
+                cached = objects[path] = (object, object.attrs)
+            object, attrs = cached
+            self._schema_path = list(schema_path)
+            if kind == "attribute":
+                self.validate_attribute(node, object, name, attrs[name])
+            elif kind == "dataset":
+                self._check_dataset_values(node, object)
+            else:
+                self._constraint_set(node).add(object)
+        self._schema_path = []
+        self.check_columns()
+        return self.check_constraints()
+
+    def _build_matchers(self, level):
+        return build_key_matchers(level)
+
+    def _classifier(self, level, matchers):
+        cached = self._classifiers.get(id(level))
+        if cached is None or cached[0] is not level:
+            # Keep a reference to [level] so its id is not reused
+            cached = (level, NameClassifier(matchers))
+            self._classifiers[id(level)] = cached
+        return cached[1]
+
+    def _field_table(self, dataset):
+        cached = self._field_tables.get(id(dataset))
+        if cached is None or cached[0] is not dataset:
+            # Keep a reference to [dataset] so its id is not reused
+            cached = (dataset,
+                      FieldTable(self._expand_dataset(dataset)['datatype']))
+            self._field_tables[id(dataset)] = cached
+        return cached[1]
 
     def _expand_dataset(self, dataset):
         object = dataset
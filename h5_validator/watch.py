@@ -0,0 +1,186 @@
+"""Continuously validate new files as they appear in directories."""
+from __future__ import \
+    unicode_literals, \
+    print_function, \
+    absolute_import, \
+    division
+
+import logging
+import os
+import time
+
+from h5_validator.batch import ValidationPool
+
+logger = logging.getLogger("h5_validate.watch")
+
+
+class SeenFiles():
+    """
+    Restart-safe record of files which have already been validated.
+
+    Filenames are appended to a state file, one per line, and synced to disk
+    as each result is recorded, so a restarted watcher skips everything that
+    completed before it stopped.
+    """
+
+    def __init__(self, path=None):
+        """
+        Load (or create) a record of seen files.
+
+        :param path: The state file to use, or None to keep the record
+                     in memory only
+        """
+        self._seen = set()
+        self._fh = None
+        if path is None:
+            return
+
+        if os.path.exists(path):
+            with open(path, "r") as fh:
+                self._seen.update(line.rstrip("\n") for line in fh
+                                  if line.strip())
+        self._fh = open(path, "a")
+
+    def __contains__(self, filename):
+        """Find if [filename] has already been validated."""
+        return filename in self._seen
+
+    def __len__(self):
+        """Find how many files have been validated."""
+        return len(self._seen)
+
+    def add(self, filename):
+        """
+        Record [filename] as validated.
+
+        :param filename: The file to record
+        """
+        if filename in self._seen:
+            return
+        self._seen.add(filename)
+        if self._fh:
+            self._fh.write(filename + "\n")
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def close(self):
+        """Close the state file."""
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+
+class DirectoryWatcher():
+    """
+    Poll directory trees for new files which have finished being written.
+
+    A file is considered complete once its size and modification time are
+    unchanged between two polls at least settle_time seconds apart.
+    """
+
+    def __init__(self, directories, extension=".fast5", settle_time=10.0):
+        """
+        Create a new watcher.
+
+        :param directories: The directories to watch (recursively)
+        :param extension: Only files with this extension are reported
+        :param settle_time: Seconds a file must be unchanged before it is
+                            reported
+        """
+        self.directories = list(directories)
+        self.extension = extension
+        self.settle_time = settle_time
+        self._pending = {}
+        self._reported = set()
+
+    def _scan(self, directory):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            logger.warning("Unable to scan %s: %s", directory, e)
+            return
+
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    for found in self._scan(entry.path):
+                        yield found
+                elif entry.is_file() and \
+                        entry.name.endswith(self.extension):
+                    st = entry.stat()
+                    yield entry.path, (st.st_size, st.st_mtime)
+            except OSError:
+                # File removed between listing and stat
+                continue
+
+    def poll(self, now=None):
+        """
+        Scan the watched directories once.
+
+        :param now: The current time, defaults to time.time()
+        :return: List of files which became complete since the last poll
+        """
+        now = time.time() if now is None else now
+        ready = []
+        present = set()
+        for directory in self.directories:
+            for path, signature in self._scan(directory):
+                if path in self._reported:
+                    continue
+                present.add(path)
+
+                previous = self._pending.get(path)
+                if previous is None or previous[0] != signature:
+                    self._pending[path] = (signature, now)
+                elif now - previous[1] >= self.settle_time:
+                    del self._pending[path]
+                    self._reported.add(path)
+                    ready.append(path)
+
+        for path in set(self._pending) - present:
+            del self._pending[path]
+
+        return sorted(ready)
+
+
+def watch(directories, schema, writer, interval=5.0, settle_time=10.0,
+          state_file=None, max_polls=None, metrics=None, **options):
+    """
+    Validate files as they appear in [directories] until interrupted.
+
+    :param directories: The directories to watch
+    :param schema: The loaded Schema to validate against
+    :param writer: A ResultWriter to report results to
+    :param interval: Seconds between directory scans
+    :param settle_time: Seconds a file must be unchanged before validation
+    :param state_file: File recording which files have been validated
+    :param max_polls: Stop after this many scans, or None to run forever
+    :param metrics: Metrics to observe each file's result in, or None
+    :param options: Options for the ValidationPool, such as jobs, timeout
+                    and max_rss
+    """
+    seen = SeenFiles(state_file)
+    watcher = DirectoryWatcher(directories, settle_time=settle_time)
+
+    def record(result):
+        if metrics is not None:
+            metrics.observe(result)
+            result.pop('metrics', None)
+        writer.write(result)
+        seen.add(result['filename'])
+
+    polls = 0
+    try:
+        with ValidationPool(schema, record, metrics=metrics,
+                            **options) as pool:
+            while max_polls is None or polls < max_polls:
+                for filename in watcher.poll():
+                    if filename not in seen:
+                        pool.submit(filename)
+                polls += 1
+                if max_polls is None or polls < max_polls:
+                    time.sleep(interval)
+    except KeyboardInterrupt:
+        logger.info("Stopping watch")
+    finally:
+        seen.close()
@@ -31,6 +31,7 @@ setup(
     long_description=DOCUMENTATION,
     zip_safe=True,
     packages=find_packages(),
+    python_requires='>=3.7',
     install_requires=['numpy', 'h5py', 'PyYAML>=3.11'],
     package_data={__pkg_name__: ["schemas/*.yaml"]},
     entry_points={'console_scripts': [